@@ -0,0 +1,130 @@
+import math
+import os
+import time
+from typing import Dict
+
+class DecayingRate:
+    """Tasa de eventos por segundo con decaimiento exponencial"""
+    __slots__ = ("tau", "value", "updated_at")
+
+    def __init__(self, tau: float):
+        self.tau = tau
+        self.value = 0.0
+        self.updated_at = time.monotonic()
+
+    def _decay(self, now: float) -> float:
+        return self.value * math.exp(-(now - self.updated_at) / self.tau)
+
+    def add(self):
+        now = time.monotonic()
+        self.value = self._decay(now) + 1.0 / self.tau
+        self.updated_at = now
+
+    def current(self) -> float:
+        return self._decay(time.monotonic())
+
+class NamespaceStats:
+    """Lecturas, escrituras y límites de TTL de un namespace de cache"""
+    __slots__ = (
+        "base_ttl", "min_ttl", "max_ttl", "hits", "misses", "writes",
+        "read_rate", "write_rate", "created_at"
+    )
+
+    def __init__(self, base_ttl: int, min_ttl: int, max_ttl: int, tau: float):
+        self.base_ttl = base_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.read_rate = DecayingRate(tau)
+        self.write_rate = DecayingRate(tau)
+        self.created_at = time.monotonic()
+
+    @property
+    def hit_ratio(self) -> float:
+        reads = self.hits + self.misses
+        return self.hits / reads if reads else 0.0
+
+class AdaptiveTTLPolicy:
+    """
+    Elige el TTL de cada namespace según su tasa de escrituras.
+
+    Modelando las escrituras como un proceso de Poisson de tasa λ, la
+    probabilidad de que una entrada vea un cambio durante su vida es
+    1 - exp(-λ·ttl). El TTL elegido es el mayor que mantiene esa
+    probabilidad por debajo del presupuesto de obsolescencia, acotado por
+    los límites del namespace: los datos que casi no cambian viven más y
+    los que cambian mucho se renuevan antes.
+    """
+
+    def __init__(self, staleness_budget: float = None, tau: float = None):
+        self.staleness_budget = (
+            staleness_budget if staleness_budget is not None
+            else float(os.getenv("CACHE_STALENESS_BUDGET", "0.1"))
+        )
+        if not 0 < self.staleness_budget < 1:
+            raise ValueError(f"El presupuesto de obsolescencia debe estar en (0, 1): {self.staleness_budget}")
+        self.tau = tau or float(os.getenv("CACHE_RATE_WINDOW", "300"))
+        self.default_min_ttl = int(os.getenv("CACHE_TTL_MIN", "15"))
+        self.default_max_ttl = int(os.getenv("CACHE_TTL_MAX", "1800"))
+        self.namespaces: Dict[str, NamespaceStats] = {}
+
+    def configure(self, namespace: str, base_ttl: int, min_ttl: int = None, max_ttl: int = None):
+        """Registrar un namespace con su TTL base y sus límites"""
+        min_ttl = min(min_ttl or self.default_min_ttl, base_ttl)
+        max_ttl = max(max_ttl or self.default_max_ttl, base_ttl)
+        self.namespaces[namespace] = NamespaceStats(base_ttl, min_ttl, max_ttl, self.tau)
+
+    def _stats(self, namespace: str) -> NamespaceStats:
+        stats = self.namespaces.get(namespace)
+        if stats is None:
+            self.configure(namespace, 300)
+            stats = self.namespaces[namespace]
+        return stats
+
+    def record_hit(self, namespace: str):
+        stats = self._stats(namespace)
+        stats.hits += 1
+        stats.read_rate.add()
+
+    def record_miss(self, namespace: str):
+        stats = self._stats(namespace)
+        stats.misses += 1
+        stats.read_rate.add()
+
+    def record_write(self, namespace: str):
+        stats = self.namespaces.get(namespace)
+        if stats is not None:
+            stats.writes += 1
+            stats.write_rate.add()
+
+    def ttl_for(self, namespace: str) -> int:
+        """TTL a usar para la próxima entrada del namespace"""
+        stats = self._stats(namespace)
+        if stats.writes == 0 and time.monotonic() - stats.created_at < self.tau:
+            return stats.base_ttl
+
+        write_rate = stats.write_rate.current()
+        if write_rate <= 0:
+            return stats.max_ttl
+        ttl = -math.log(1 - self.staleness_budget) / write_rate
+        return int(min(max(ttl, stats.min_ttl), stats.max_ttl))
+
+    def snapshot(self) -> Dict:
+        """TTL elegido y ratio de aciertos por namespace"""
+        return {
+            namespace: {
+                "ttl": self.ttl_for(namespace),
+                "base_ttl": stats.base_ttl,
+                "min_ttl": stats.min_ttl,
+                "max_ttl": stats.max_ttl,
+                "hit_ratio": round(stats.hit_ratio, 3),
+                "hits": stats.hits,
+                "misses": stats.misses,
+                "writes": stats.writes,
+                "reads_per_second": round(stats.read_rate.current(), 4),
+                "writes_per_second": round(stats.write_rate.current(), 4)
+            }
+            for namespace, stats in self.namespaces.items()
+        }
\ No newline at end of file
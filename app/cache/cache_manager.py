@@ -1,71 +1,295 @@
-from typing import Optional, Any, Callable
-import hashlib
+from typing import Optional, Any, Callable, Dict, Iterable, List, Tuple
+from collections import OrderedDict
 import json
+import time
 from cache.redis_client import redis_client
+from cache.adaptive_ttl import AdaptiveTTLPolicy
+from cache.keys import KeyBuilder, fast_hash
+from cache.compression import ENCODINGS, client_encoding, is_compressible, precompress_async
+from monitoring.tracing import span
 import logging
 from functools import wraps
+from starlette.responses import Response
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_MARKER = "__response__"
+IDENTITY = "identity"
+
+def variant_key(cache_key: str, encoding: str) -> str:
+    """Clave del cuerpo en una codificación; los patrones de invalidación `...*` también la cubren"""
+    return f"{cache_key}:enc={encoding}"
+
+async def to_cacheable(result: Any) -> Tuple[Any, Dict[str, bytes]]:
+    """
+    Valor para la clave principal y variantes en bytes para guardar aparte.
+    Una respuesta ya serializada se guarda como cuerpo listo para enviar; si
+    conviene comprimirla, cada codificación (y el cuerpo sin comprimir) va
+    en su propia clave y la principal solo dice cuáles hay.
+    """
+    if not isinstance(result, Response):
+        return result, {}
+    stored = {"status_code": result.status_code, "media_type": result.media_type}
+    variants = await precompress_async(result.body) if is_compressible(result.media_type) else {}
+    if variants:
+        stored["encodings"] = list(variants)
+        variants[IDENTITY] = result.body
+    else:
+        stored["body"] = result.body.decode("utf-8")
+    return {RESPONSE_MARKER: stored}, variants
+
+def from_cacheable(value: Any, encoding: Optional[str] = None, content: Optional[bytes] = None) -> Any:
+    """Reconstruir la respuesta guardada, con el cuerpo de la variante `encoding` ya leído"""
+    if isinstance(value, dict) and RESPONSE_MARKER in value:
+        stored = value[RESPONSE_MARKER]
+        if not stored.get("encodings"):
+            return Response(
+                content=stored["body"],
+                status_code=stored["status_code"],
+                media_type=stored["media_type"]
+            )
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(
+            content=content,
+            status_code=stored["status_code"],
+            media_type=stored["media_type"],
+            headers=headers
+        )
+    return value
+
+def _encodings(value: Any) -> Optional[List[str]]:
+    if isinstance(value, dict) and RESPONSE_MARKER in value:
+        return value[RESPONSE_MARKER].get("encodings")
+    return None
+
+class CacheEntry:
+    """Cómo recalcular una clave cacheada y cuánto se está usando"""
+    __slots__ = ("func", "args", "kwargs", "namespace", "expires_at", "hits")
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, namespace: str, expire: int):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.namespace = namespace
+        self.expires_at = time.monotonic() + expire
+        self.hits = 0
+
 class CacheManager:
-    def __init__(self):
-        self.prefix = "yoga_"
+    def __init__(self, max_tracked_entries: int = 1000):
+        self.prefix = "yoga:"
+        self.max_tracked_entries = max_tracked_entries
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self.ttl_policy = AdaptiveTTLPolicy()
+        # Sube con cada invalidación del namespace; el refresh-ahead no guarda
+        # un valor calculado antes de una invalidación que llegó mientras tanto
+        self.generations: Dict[str, int] = {}
 
     def _generate_key(self, func_name: str, *args, **kwargs) -> str:
-        """Generar clave única para cache basada en parámetros"""
-        key_data = f"{func_name}:{args}:{kwargs}"
-        return f"{self.prefix}{hashlib.md5(key_data.encode()).hexdigest()}"
+        """Generar clave ad hoc (sin firma compilada) para un nombre y parámetros"""
+        key_data = f"{args}:{sorted(kwargs.items())}"
+        return f"{self.prefix}{func_name}:{fast_hash(key_data)}"
 
-    async def cached(
+    def cached(
         self, 
         expire: int = 300, 
-        key_prefix: str = None
+        key_prefix: str = None,
+        min_expire: int = None,
+        max_expire: int = None,
+        version: int = 1
     ) -> Callable:
         """
-        Decorador para cachear resultados de funciones
+        Decorador para cachear resultados de funciones.
+        `expire` es el TTL inicial; luego se ajusta entre `min_expire` y
+        `max_expire` según la tasa de escrituras del namespace. Subir
+        `version` descarta las claves anteriores si cambia el formato.
         """
         def decorator(func: Callable) -> Callable:
+            prefix = key_prefix or func.__name__
+            self.ttl_policy.configure(prefix, expire, min_expire, max_expire)
+            key_builder = KeyBuilder(func, prefix, version, self.prefix)
+
             @wraps(func)
             async def wrapper(*args, **kwargs):
-                cache_args = args[1:] if args and hasattr(args[0], '__class__') else args
-                
-                prefix = key_prefix or func.__name__
-                cache_key = self._generate_key(prefix, *cache_args, **kwargs)
+                cache_key = key_builder.build(args, kwargs)
                 
-                cached_result = await redis_client.get(cache_key)
+                with span("cache", namespace=prefix) as lookup:
+                    cached_result = await self._lookup(cache_key)
+                if lookup is not None:
+                    lookup.attributes["desc"] = "miss" if cached_result is None else "hit"
                 if cached_result is not None:
-                    logger.debug(f"Cache hit para {cache_key}")
+                    self.ttl_policy.record_hit(prefix)
+                    entry = self.entries.get(cache_key)
+                    if entry is not None:
+                        entry.hits += 1
+                    logger.debug("Cache hit para %s", cache_key)
                     return cached_result
 
+                self.ttl_policy.record_miss(prefix)
                 result = await func(*args, **kwargs)
-                await redis_client.set(cache_key, result, expire)
-                logger.debug(f"Cache miss, guardado para {cache_key}")
-                
-                return result
+                ttl = self.ttl_policy.ttl_for(prefix)
+                cacheable, variants = await self._store(cache_key, result, ttl)
+                self._track(cache_key, CacheEntry(func, args, kwargs, prefix, ttl))
+                logger.debug("Cache miss, guardado para %s", cache_key)
+
+                encoding = client_encoding(tuple(variants)) if variants else None
+                return from_cacheable(cacheable, encoding, variants.get(encoding or IDENTITY))
+
+            wrapper.cache_key = lambda *args, **kwargs: key_builder.build(args, kwargs)
+            wrapper.cache_pattern = lambda **fixed: key_builder.pattern(fixed)
             return wrapper
         return decorator
 
+    async def _lookup(self, cache_key: str) -> Optional[Any]:
+        """
+        Leer la clave y, en el mismo MGET, solo la variante que negocia el
+        cliente. Si esa codificación no se guardó (no achicaba el cuerpo) se
+        lee el cuerpo sin comprimir; si falta la variante, cuenta como miss.
+        """
+        encoding = client_encoding(ENCODINGS)
+        raw, content = await redis_client.mget_raw([cache_key, variant_key(cache_key, encoding or IDENTITY)])
+        if raw is None:
+            return None
+        value = json.loads(raw) if isinstance(raw, bytes) else raw
+        encodings = _encodings(value)
+        if not encodings:
+            return from_cacheable(value)
+        if encoding not in encodings:
+            encoding = None
+            content, = await redis_client.mget_raw([variant_key(cache_key, IDENTITY)])
+        if content is None:
+            return None
+        return from_cacheable(value, encoding, content)
+
+    async def _store(self, cache_key: str, result: Any, ttl: int) -> Tuple[Any, Dict[str, bytes]]:
+        """Guardar el resultado y sus variantes comprimidas en un solo round trip"""
+        cacheable, variants = await to_cacheable(result)
+        await self._write(cache_key, cacheable, variants, ttl)
+        return cacheable, variants
+
+    async def _write(self, cache_key: str, cacheable: Any, variants: Dict[str, bytes], ttl: int):
+        if variants:
+            await redis_client.mset_with_ttl({
+                cache_key: cacheable,
+                **{variant_key(cache_key, encoding): data for encoding, data in variants.items()}
+            }, ttl)
+        else:
+            await redis_client.set(cache_key, cacheable, ttl)
+
+    def _track(self, cache_key: str, entry: CacheEntry):
+        """Recordar cómo recalcular la clave, acotando el número de entradas"""
+        previous = self.entries.pop(cache_key, None)
+        if previous is not None:
+            entry.hits = previous.hits
+        self.entries[cache_key] = entry
+        while len(self.entries) > self.max_tracked_entries:
+            self.entries.popitem(last=False)
+
+    def hot_entries(self, expiring_within: float, min_hits: int = 1, limit: int = 50) -> List[str]:
+        """Claves más usadas que expiran dentro de la ventana indicada"""
+        deadline = time.monotonic() + expiring_within
+        candidates = [
+            (entry.hits, key) for key, entry in self.entries.items()
+            if entry.hits >= min_hits and entry.expires_at <= deadline
+        ]
+        candidates.sort(reverse=True)
+        return [key for _, key in candidates[:limit]]
+
+    async def refresh(self, cache_key: str) -> bool:
+        """
+        Recalcular una clave antes de que expire (refresh-ahead). Si el
+        namespace se invalidó mientras se recalculaba, el resultado puede ser
+        anterior a la mutación y no se guarda.
+        """
+        entry = self.entries.get(cache_key)
+        if entry is None:
+            return False
+        generation = self.generations.get(entry.namespace, 0)
+        try:
+            result = await entry.func(*entry.args, **entry.kwargs)
+            cacheable, variants = await to_cacheable(result)
+        except Exception as e:
+            logger.error("Error refrescando %s: %s", cache_key, e)
+            return False
+        if self.generations.get(entry.namespace, 0) != generation or self.entries.get(cache_key) is not entry:
+            return False
+        ttl = self.ttl_policy.ttl_for(entry.namespace)
+        await self._write(cache_key, cacheable, variants, ttl)
+        entry.expires_at = time.monotonic() + ttl
+        entry.hits = 0
+        return True
+
     async def invalidate_pattern(self, pattern: str):
         """Invalidar cache por patrón"""
+        await self.invalidate_patterns(pattern)
+
+    async def invalidate_patterns(self, *patterns: str):
+        """Invalidar namespaces completos con un único DELETE"""
+        await self.invalidate_matching(*(f"{self.prefix}{pattern}:*" for pattern in patterns))
+
+    async def invalidate_matching(self, *patterns: str):
+        """Invalidar las claves que coinciden con patrones glob completos"""
+        await self.invalidate(patterns=patterns)
+
+    async def invalidate_keys(self, *keys: str):
+        """Invalidar claves exactas sin recorrer Redis"""
+        await self.invalidate(keys=keys)
+
+    async def invalidate(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """
+        Invalidar claves exactas y patrones glob de una misma mutación. Cada
+        namespace afectado cuenta una sola escritura para el TTL adaptativo,
+        sin importar cuántas claves o patrones suyos se borren.
+        """
+        keys, patterns = list(keys), list(patterns)
+        for namespace in {self._namespace(item) for item in (*keys, *patterns)}:
+            self._record_write(namespace)
         try:
-            keys = await redis_client.connection.keys(f"{self.prefix}{pattern}*")
-            if keys:
-                await redis_client.connection.delete(*keys)
-                logger.info(f"Invalidadas {len(keys)} claves con patrón {pattern}")
+            for pattern in patterns:
+                keys.extend(await redis_client.scan_keys(pattern))
+            await self._delete(keys)
         except Exception as e:
-            logger.error(f"Error invalidando cache: {e}")
+            logger.error("Error invalidando cache: %s", e)
+
+    async def _delete(self, keys):
+        if not keys:
+            return
+        keys = set(keys)
+        for key in list(keys):
+            self.entries.pop(key, None)
+            if ":enc=" not in key:
+                keys.update(variant_key(key, encoding) for encoding in (*ENCODINGS, IDENTITY))
+        deleted = await redis_client.delete_many(keys)
+        if deleted:
+            logger.info("Invalidadas %d claves de cache", deleted)
+
+    def _record_write(self, namespace: str):
+        self.ttl_policy.record_write(namespace)
+        self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+    def _namespace(self, key: str) -> str:
+        return key[len(self.prefix):].split(":", 1)[0]
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Obtener varias entradas del cache en un solo round trip"""
+        values = await redis_client.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
 
     async def get_stats(self) -> dict:
         """Obtener estadísticas del cache"""
         try:
-            keys = await redis_client.connection.keys(f"{self.prefix}*")
+            keys = await redis_client.scan_keys(f"{self.prefix}*")
+            redis_status = redis_client.get_status()
             return {
                 "total_keys": len(keys),
                 "prefix": self.prefix,
-                "status": "active"
+                "status": "degraded" if redis_status["circuit_breaker"]["state"] != "closed" else "active",
+                "redis": redis_status,
+                "ttl_policy": self.ttl_policy.snapshot()
             }
         except Exception as e:
-            logger.error(f"Error obteniendo stats del cache: {e}")
+            logger.error("Error obteniendo stats del cache: %s", e)
             return {"error": str(e)}
 
 cache_manager = CacheManager()
\ No newline at end of file
@@ -0,0 +1,181 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """El circuito está abierto: la llamada se rechaza sin tocar la red"""
+
+class SlowCallProbe:
+    """
+    Detecta si una llamada tuvo algún round trip lento. Cada round trip arma
+    un timer al umbral y lo desarma al llegar la respuesta: si el timer corre
+    a tiempo, Redis todavía no había respondido y la llamada es lenta. Si
+    corre con más de `tolerance` de atraso, el retraso es del event loop (la
+    respuesta pudo llegar antes y esperar su turno) y no se cuenta. El tiempo
+    entre round trips, como el de iterar un SCAN o esperar una conexión del
+    pool, tampoco.
+    """
+    __slots__ = ("threshold", "tolerance", "slow")
+
+    def __init__(self, threshold: float, tolerance: float = None):
+        self.threshold = threshold
+        self.tolerance = tolerance if tolerance is not None else threshold / 4
+        self.slow = False
+
+    def arm(self) -> asyncio.TimerHandle:
+        loop = asyncio.get_running_loop()
+        due = loop.time() + self.threshold
+        return loop.call_at(due, self._expired, loop, due)
+
+    def _expired(self, loop: asyncio.AbstractEventLoop, due: float):
+        if loop.time() - due <= self.tolerance:
+            self.slow = True
+
+current_probe: ContextVar[Optional[SlowCallProbe]] = ContextVar("redis_slow_call_probe", default=None)
+
+@contextmanager
+def round_trip() -> Iterator[None]:
+    """Cronometrar un round trip de la llamada en curso, si tiene sonda"""
+    probe = current_probe.get()
+    handle = probe.arm() if probe is not None else None
+    try:
+        yield
+    finally:
+        if handle is not None:
+            handle.cancel()
+
+class CircuitBreaker:
+    """
+    Circuit breaker por tasa de error y latencia sobre una ventana deslizante
+    de las últimas llamadas. Quién llama decide si una llamada fue lenta,
+    normalmente con un SlowCallProbe a `slow_call_threshold`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_threshold: float = 0.1,
+        slow_call_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_timeout: float = 5.0,
+        half_open_max_calls: int = 3
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CircuitState.CLOSED
+        self.window = deque(maxlen=window_size)
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_successes = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+    def allow_request(self) -> bool:
+        """Decidir si una llamada puede salir hacia el recurso protegido"""
+        if self.state is CircuitState.CLOSED:
+            return True
+
+        if self.state is CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_timeout:
+                self.rejected_calls += 1
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+
+        if self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            return True
+        self.rejected_calls += 1
+        return False
+
+    def record_success(self, slow: bool = False):
+        """Registrar una llamada exitosa y si fue lenta"""
+        if self.state is CircuitState.HALF_OPEN:
+            if slow:
+                self._open()
+                return
+            self.half_open_successes += 1
+            if self.half_open_successes >= self.half_open_max_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+
+        self.window.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self, slow: bool = False):
+        """Registrar una llamada fallida"""
+        if self.state is CircuitState.HALF_OPEN:
+            self._open()
+            return
+
+        self.window.append((True, slow))
+        self._evaluate()
+
+    def trip(self):
+        """Abrir el circuito de inmediato, sin esperar a llenar la ventana"""
+        self._open()
+
+    def reset(self):
+        """Cerrar el circuito y empezar con la ventana vacía"""
+        self._transition(CircuitState.CLOSED)
+        self.window.clear()
+
+    def _evaluate(self):
+        calls = len(self.window)
+        if self.state is not CircuitState.CLOSED or calls < self.min_calls:
+            return
+
+        failures = sum(1 for failed, _ in self.window if failed)
+        slow_calls = sum(1 for _, slow in self.window if slow)
+        if (failures / calls >= self.failure_rate_threshold or
+                slow_calls / calls >= self.slow_call_rate_threshold):
+            self._open()
+
+    def _open(self):
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState):
+        if state is self.state:
+            return
+        logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state.value, state.value)
+        self.state = state
+        self.half_open_calls = 0
+        self.half_open_successes = 0
+        if state is CircuitState.CLOSED:
+            self.window.clear()
+
+    def snapshot(self) -> Dict:
+        """Estado actual del circuito para /status y métricas"""
+        calls = len(self.window)
+        failures = sum(1 for failed, _ in self.window if failed)
+        slow_calls = sum(1 for _, slow in self.window if slow)
+        return {
+            "name": self.name,
+            "state": self.state.value,
+            "window_calls": calls,
+            "failure_rate": round(failures / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(slow_calls / calls, 3) if calls else 0.0,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls
+        }
\ No newline at end of file
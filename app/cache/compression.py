@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import os
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Desde este tamaño se comprime en un hilo: zlib, brotli y zstd sueltan el GIL
+OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", "32768"))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+_accept_encoding: ContextVar[Optional[str]] = ContextVar("accept_encoding", default=None)
+
+# Codificaciones en orden de preferencia del servidor; cada una con un nivel
+# para los cuerpos que se comprimen una vez al guardarse en cache y uno
+# rápido para las respuestas que se comprimen al vuelo. El de cache es
+# moderado: por encima de estos niveles el tamaño apenas baja y el tiempo
+# de cada miss se multiplica.
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+
+try:
+    import brotli
+
+    CODECS["br"] = (
+        lambda data: brotli.compress(data, quality=6),
+        lambda data: brotli.compress(data, quality=4)
+    )
+except ImportError:
+    pass
+
+try:
+    import zstandard
+
+    _zstd_stored = zstandard.ZstdCompressor(level=6)
+    _zstd_dynamic = zstandard.ZstdCompressor(level=3)
+    CODECS["zstd"] = (_zstd_stored.compress, _zstd_dynamic.compress)
+except ImportError:
+    pass
+
+CODECS["gzip"] = (
+    lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+    lambda data: gzip.compress(data, compresslevel=5, mtime=0)
+)
+
+ENCODINGS = tuple(CODECS)
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    return bool(media_type) and media_type.startswith(COMPRESSIBLE_TYPES)
+
+def precompress(body: bytes) -> Dict[str, bytes]:
+    """Cuerpo comprimido con cada codificación disponible; nada si es chico o no achica"""
+    if len(body) < MIN_SIZE:
+        return {}
+    variants = {}
+    for encoding, (stored, _) in CODECS.items():
+        data = stored(body)
+        if len(data) < len(body):
+            variants[encoding] = data
+    return variants
+
+async def precompress_async(body: bytes) -> Dict[str, bytes]:
+    """precompress sin bloquear el event loop con los cuerpos grandes"""
+    if len(body) < OFFLOAD_SIZE:
+        return precompress(body)
+    return await asyncio.to_thread(precompress, body)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compresión al vuelo con el nivel rápido de la codificación"""
+    return CODECS[encoding][1](body)
+
+async def compress_async(body: bytes, encoding: str) -> bytes:
+    """compress en un hilo si el cuerpo es grande"""
+    if len(body) < OFFLOAD_SIZE:
+        return compress(body, encoding)
+    return await asyncio.to_thread(compress, body, encoding)
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: Optional[str], available: Tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """La codificación disponible con mayor q en Accept-Encoding; None si no hay que comprimir"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def set_accept_encoding(value: Optional[str]):
+    """Recordar el Accept-Encoding de la petición en curso; devuelve el token para restaurarlo"""
+    return _accept_encoding.set(value)
+
+def reset_accept_encoding(token):
+    _accept_encoding.reset(token)
+
+def client_encoding(available: Tuple[str, ...] = ENCODINGS) -> Optional[str]:
+    """Codificación a usar para la petición en curso entre las disponibles"""
+    return negotiate(_accept_encoding.get(), available)
\ No newline at end of file
@@ -0,0 +1,682 @@
+import asyncio
+import fnmatch
+import random
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from redis.exceptions import ResponseError
+from cache.circuit_breaker import round_trip
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+MAX_OPEN_SCANS = 100
+
+Score = Union[float, str]
+
+def _parse_bound(value: Score) -> Tuple[float, bool]:
+    """Límite de ZRANGEBYSCORE: número, "-inf"/"+inf" o "(x" exclusivo"""
+    if isinstance(value, str) and value.startswith("("):
+        return float(value[1:]), True
+    return float(value), False
+
+class SortedSet:
+    """Miembros con puntaje; la lista ordenada de (score, member) resuelve rangos con bisect"""
+    __slots__ = ("scores", "ordered")
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.ordered: List[Tuple[float, str]] = []
+
+    def add(self, member: str, score: float):
+        previous = self.scores.get(member)
+        if previous is not None:
+            del self.ordered[bisect_left(self.ordered, (previous, member))]
+        self.scores[member] = score
+        insort(self.ordered, (score, member))
+
+    def remove(self, member: str) -> bool:
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        del self.ordered[bisect_left(self.ordered, (score, member))]
+        return True
+
+    def by_score(self, low: Score, high: Score) -> List[Tuple[float, str]]:
+        low_value, low_open = _parse_bound(low)
+        high_value, high_open = _parse_bound(high)
+        start = bisect_right(self.ordered, (low_value, "\U0010ffff")) if low_open else bisect_left(self.ordered, (low_value, ""))
+        end = bisect_left(self.ordered, (high_value, "")) if high_open else bisect_right(self.ordered, (high_value, "\U0010ffff"))
+        return self.ordered[start:end]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+class FakeRedisServer:
+    """
+    Estado de un Redis en memoria con semántica de decode_responses=True;
+    los valores bytes se guardan tal cual, como un cuerpo binario en Redis.
+    Cada comando es síncrono, así que corre atómico dentro del event loop;
+    varios FakeRedis pueden compartir un server para simular workers.
+    Los vencimientos se aplican al acceder a la clave, como el borrado
+    perezoso de Redis.
+    """
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.expires: Dict[str, float] = {}
+        self.subscribers: Dict[str, Set["FakePubSub"]] = {}
+        self.pattern_subscribers: Dict[str, Set["FakePubSub"]] = {}
+        self.scripts: Dict[str, Callable] = {}
+        self._last_stream_id: Dict[str, Tuple[int, int]] = {}
+        self._scans: Dict[int, List[str]] = {}
+        self._scan_seq = 0
+
+    def _alive(self, key: str) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return key in self.data
+
+    def _get(self, key: str, kind: type) -> Any:
+        if not self._alive(key):
+            return None
+        value = self.data[key]
+        if not isinstance(value, kind):
+            raise ResponseError(WRONGTYPE)
+        return value
+
+    def _live_keys(self) -> List[str]:
+        return [key for key in list(self.data) if self._alive(key)]
+
+    # Claves y strings
+
+    def ping(self) -> bool:
+        return True
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        return self._get(key, (str, bytes))
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ex: Optional[int] = None,
+        px: Optional[int] = None,
+        nx: bool = False,
+        xx: bool = False,
+        keepttl: bool = False
+    ) -> Optional[bool]:
+        exists = self._alive(key)
+        if (nx and exists) or (xx and not exists):
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value)
+        if ex is not None or px is not None:
+            self.expires[key] = time.monotonic() + (ex if ex is not None else px / 1000)
+        elif not keepttl:
+            self.expires.pop(key, None)
+        return True
+
+    def setex(self, key: str, time_seconds: int, value: Any) -> bool:
+        return self.set(key, value, ex=time_seconds)
+
+    def mget(self, keys, *args) -> List[Optional[str]]:
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return [self.get(key) for key in keys + list(args)]
+
+    def mset(self, mapping: Dict[str, Any]) -> bool:
+        for key, value in mapping.items():
+            self.set(key, value)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                self.expires.pop(key, None)
+                deleted += 1
+        return deleted
+
+    unlink = delete
+
+    def exists(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._alive(key))
+
+    def type(self, key: str) -> str:
+        if not self._alive(key):
+            return "none"
+        return {str: "string", SortedSet: "zset", list: "stream"}[type(self.data[key])]
+
+    def incrby(self, key: str, amount: int = 1) -> int:
+        current = self._get(key, str)
+        try:
+            value = int(current or 0) + amount
+        except ValueError:
+            raise ResponseError("value is not an integer or out of range")
+        self.data[key] = str(value)
+        return value
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        return self.incrby(key, -amount)
+
+    def expire(self, key: str, seconds: float) -> bool:
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def pexpire(self, key: str, milliseconds: int) -> bool:
+        return self.expire(key, milliseconds / 1000)
+
+    def persist(self, key: str) -> bool:
+        return self._alive(key) and self.expires.pop(key, None) is not None
+
+    def pttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else max(0, int((deadline - time.monotonic()) * 1000))
+
+    def ttl(self, key: str) -> int:
+        remaining = self.pttl(key)
+        return remaining if remaining < 0 else (remaining + 999) // 1000
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        return [key for key in self._live_keys() if fnmatch.fnmatchcase(key, pattern)]
+
+    def scan(
+        self,
+        cursor: int = 0,
+        match: Optional[str] = None,
+        count: Optional[int] = None,
+        _type: Optional[str] = None
+    ) -> Tuple[int, List[str]]:
+        """
+        Recorrido por lotes. El primer llamado fija una copia de las claves y
+        el cursor codifica (copia, posición): cada llamado cuesta O(count) y
+        las claves que existen durante todo el recorrido salen una vez.
+        """
+        if cursor == 0:
+            self._scan_seq += 1
+            scan_id, position, keys = self._scan_seq, 0, list(self.data)
+            self._scans[scan_id] = keys
+            if len(self._scans) > MAX_OPEN_SCANS:
+                del self._scans[next(iter(self._scans))]
+        else:
+            scan_id, position = divmod(cursor, 1 << 32)
+            keys = self._scans.get(scan_id)
+            if keys is None:
+                return 0, []
+
+        batch = keys[position:position + (count or 10)]
+        position += len(batch)
+        if position >= len(keys):
+            self._scans.pop(scan_id, None)
+            next_cursor = 0
+        else:
+            next_cursor = (scan_id << 32) + position
+        return next_cursor, [
+            key for key in batch
+            if self._alive(key)
+            and (match is None or fnmatch.fnmatchcase(key, match))
+            and (_type is None or self.type(key) == _type)
+        ]
+
+    def dbsize(self) -> int:
+        return len(self._live_keys())
+
+    def flushdb(self) -> bool:
+        self.data.clear()
+        self.expires.clear()
+        self._last_stream_id.clear()
+        self._scans.clear()
+        return True
+
+    flushall = flushdb
+
+    # Sorted sets
+
+    def _zset(self, name: str, create: bool = False) -> Optional[SortedSet]:
+        zset = self._get(name, SortedSet)
+        if zset is None and create:
+            zset = self.data[name] = SortedSet()
+        return zset
+
+    def _zresult(self, items: List[Tuple[float, str]], withscores: bool):
+        return [(member, score) for score, member in items] if withscores else [member for _, member in items]
+
+    def zadd(
+        self,
+        name: str,
+        mapping: Dict[str, float],
+        nx: bool = False,
+        xx: bool = False,
+        ch: bool = False,
+        incr: bool = False,
+        gt: bool = False,
+        lt: bool = False
+    ) -> Union[int, float, None]:
+        zset = self._zset(name, create=True)
+        changed = added = 0
+        result = None
+        for member, score in mapping.items():
+            member = str(member)
+            current = zset.scores.get(member)
+            if (nx and current is not None) or (xx and current is None):
+                continue
+            score = float(score) + (current or 0.0) if incr else float(score)
+            if current is not None and ((gt and score <= current) or (lt and score >= current)):
+                continue
+            if current != score:
+                zset.add(member, score)
+                changed += 1
+                added += current is None
+            result = score
+        if not zset:
+            del self.data[name]
+        if incr:
+            return result
+        return changed if ch else added
+
+    def zincrby(self, name: str, amount: float, value: str) -> float:
+        return self.zadd(name, {value: amount}, incr=True)
+
+    def zrem(self, name: str, *values: str) -> int:
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        removed = sum(zset.remove(str(value)) for value in values)
+        if not zset:
+            self.delete(name)
+        return removed
+
+    def zscore(self, name: str, value: str) -> Optional[float]:
+        zset = self._zset(name)
+        return None if zset is None else zset.scores.get(str(value))
+
+    def zcard(self, name: str) -> int:
+        zset = self._zset(name)
+        return 0 if zset is None else len(zset)
+
+    def zcount(self, name: str, min: Score, max: Score) -> int:
+        zset = self._zset(name)
+        return 0 if zset is None else len(zset.by_score(min, max))
+
+    def zrank(self, name: str, value: str) -> Optional[int]:
+        zset = self._zset(name)
+        score = None if zset is None else zset.scores.get(str(value))
+        return None if score is None else bisect_left(zset.ordered, (score, str(value)))
+
+    def zrange(self, name: str, start: int, end: int, desc: bool = False, withscores: bool = False):
+        zset = self._zset(name)
+        if zset is None:
+            return []
+        items = list(reversed(zset.ordered)) if desc else zset.ordered
+        end = len(items) if end == -1 else end + 1 if end >= 0 else len(items) + end + 1
+        return self._zresult(items[start if start >= 0 else max(len(items) + start, 0):end], withscores)
+
+    def zrevrange(self, name: str, start: int, end: int, withscores: bool = False):
+        return self.zrange(name, start, end, desc=True, withscores=withscores)
+
+    def zrangebyscore(
+        self,
+        name: str,
+        min: Score,
+        max: Score,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False
+    ):
+        zset = self._zset(name)
+        items = [] if zset is None else zset.by_score(min, max)
+        if start is not None:
+            items = items[start:start + num if num is not None and num >= 0 else None]
+        return self._zresult(items, withscores)
+
+    def zrevrangebyscore(
+        self,
+        name: str,
+        max: Score,
+        min: Score,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+        withscores: bool = False
+    ):
+        zset = self._zset(name)
+        items = [] if zset is None else list(reversed(zset.by_score(min, max)))
+        if start is not None:
+            items = items[start:start + num if num is not None and num >= 0 else None]
+        return self._zresult(items, withscores)
+
+    def zremrangebyscore(self, name: str, min: Score, max: Score) -> int:
+        zset = self._zset(name)
+        if zset is None:
+            return 0
+        members = [member for _, member in zset.by_score(min, max)]
+        return self.zrem(name, *members) if members else 0
+
+    # Streams
+
+    def _next_stream_id(self, name: str) -> str:
+        now = int(time.time() * 1000)
+        last_ms, last_seq = self._last_stream_id.get(name, (0, -1))
+        ms, seq = (now, 0) if now > last_ms else (last_ms, last_seq + 1)
+        self._last_stream_id[name] = (ms, seq)
+        return f"{ms}-{seq}"
+
+    def xadd(
+        self,
+        name: str,
+        fields: Dict[str, Any],
+        id: str = "*",
+        maxlen: Optional[int] = None,
+        approximate: bool = True
+    ) -> str:
+        entries = self._get(name, list)
+        if entries is None:
+            entries = self.data[name] = []
+        if id == "*":
+            entry_id = self._next_stream_id(name)
+        else:
+            entry_id = id
+            ms, seq = (int(part) for part in id.split("-"))
+            self._last_stream_id[name] = (ms, seq)
+        entries.append((entry_id, {str(k): str(v) for k, v in fields.items()}))
+        if maxlen is not None and len(entries) > maxlen:
+            del entries[:len(entries) - maxlen]
+        return entry_id
+
+    def xlen(self, name: str) -> int:
+        entries = self._get(name, list)
+        return 0 if entries is None else len(entries)
+
+    @staticmethod
+    def _stream_key(entry_id: str) -> Tuple[int, int]:
+        ms, _, seq = entry_id.partition("-")
+        return int(ms), int(seq or 0)
+
+    def xrange(self, name: str, min: str = "-", max: str = "+", count: Optional[int] = None):
+        entries = self._get(name, list) or []
+        low = (0, 0) if min == "-" else self._stream_key(min)
+        high = None if max == "+" else self._stream_key(max)
+        result = [
+            entry for entry in entries
+            if self._stream_key(entry[0]) >= low and (high is None or self._stream_key(entry[0]) <= high)
+        ]
+        return result[:count] if count else result
+
+    def xread(self, streams: Dict[str, str], count: Optional[int] = None, block: Optional[int] = None):
+        """Entradas posteriores a cada id; "$" no devuelve nada (no hay bloqueo)"""
+        result = []
+        for name, last_id in streams.items():
+            entries = self._get(name, list) or []
+            if last_id == "$" or not entries:
+                continue
+            last = self._stream_key(last_id)
+            newer = [entry for entry in entries if self._stream_key(entry[0]) > last]
+            if count:
+                newer = newer[:count]
+            if newer:
+                result.append([name, newer])
+        return result
+
+    # Pub/sub y scripts
+
+    def publish(self, channel: str, message: Any) -> int:
+        receivers = 0
+        for pubsub in self.subscribers.get(channel, ()):
+            pubsub._deliver({"type": "message", "pattern": None, "channel": channel, "data": str(message)})
+            receivers += 1
+        for pattern, pubsubs in self.pattern_subscribers.items():
+            if fnmatch.fnmatchcase(channel, pattern):
+                for pubsub in pubsubs:
+                    pubsub._deliver({"type": "pmessage", "pattern": pattern, "channel": channel, "data": str(message)})
+                    receivers += 1
+        return receivers
+
+    def script_load(self, script: Callable) -> str:
+        if not callable(script):
+            raise NotImplementedError("FakeRedis no interpreta Lua: registrar el script como función Python")
+        sha = f"{id(script):040x}"
+        self.scripts[sha] = script
+        return sha
+
+    def evalsha(self, sha: str, numkeys: int, *keys_and_args) -> Any:
+        script = self.scripts.get(sha)
+        if script is None:
+            raise ResponseError("NOSCRIPT No matching script. Please use EVAL.")
+        return script(self, list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:]))
+
+    def eval(self, script: Callable, numkeys: int, *keys_and_args) -> Any:
+        return self.evalsha(self.script_load(script), numkeys, *keys_and_args)
+
+COMMANDS = frozenset(
+    name for name in dir(FakeRedisServer)
+    if not name.startswith("_") and callable(getattr(FakeRedisServer, name))
+)
+
+class FakePipeline:
+    """Pipeline de redis.asyncio: encola comandos y los ejecuta juntos en un solo round trip"""
+
+    def __init__(self, client: "FakeRedis", transaction: bool = True):
+        self.client = client
+        self.transaction = transaction
+        self.commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs) -> "FakePipeline":
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def multi(self):
+        self.transaction = True
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        commands, self.commands = self.commands, []
+        await self.client._round_trip(len(commands))
+        results = []
+        for name, args, kwargs in commands:
+            try:
+                results.append(getattr(self.client.server, name)(*args, **kwargs))
+            except ResponseError as e:
+                results.append(e)
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, ResponseError):
+                    raise result
+        return results
+
+    def reset(self):
+        self.commands = []
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.reset()
+
+class FakeScript:
+    """Equivalente de AsyncScript: la función corre atómica con (server, keys, args)"""
+
+    def __init__(self, client: "FakeRedis", script: Callable):
+        self.client = client
+        self.sha = client.server.script_load(script)
+
+    async def __call__(self, keys=(), args=(), client: Optional["FakeRedis"] = None) -> Any:
+        target = client or self.client
+        return await target.evalsha(self.sha, len(keys), *keys, *args)
+
+class FakePubSub:
+    """Suscripción con su propia cola; los mensajes llegan al publicar, sin round trip extra"""
+
+    def __init__(self, client: "FakeRedis", ignore_subscribe_messages: bool = False):
+        self.client = client
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.channels: Set[str] = set()
+        self.patterns: Set[str] = set()
+        self.queue: Deque[Dict] = deque()
+        self._event = asyncio.Event()
+
+    def _deliver(self, message: Dict):
+        self.queue.append(message)
+        self._event.set()
+
+    def _confirm(self, kind: str, name: str):
+        if not self.ignore_subscribe_messages:
+            self._deliver({
+                "type": kind, "pattern": None, "channel": name,
+                "data": len(self.channels) + len(self.patterns)
+            })
+
+    async def subscribe(self, *channels: str):
+        await self.client._round_trip()
+        for channel in channels:
+            self.client.server.subscribers.setdefault(channel, set()).add(self)
+            self.channels.add(channel)
+            self._confirm("subscribe", channel)
+
+    async def psubscribe(self, *patterns: str):
+        await self.client._round_trip()
+        for pattern in patterns:
+            self.client.server.pattern_subscribers.setdefault(pattern, set()).add(self)
+            self.patterns.add(pattern)
+            self._confirm("psubscribe", pattern)
+
+    async def unsubscribe(self, *channels: str):
+        await self.client._round_trip()
+        for channel in channels or tuple(self.channels):
+            subscribers = self.client.server.subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self.client.server.subscribers[channel]
+            self.channels.discard(channel)
+            self._confirm("unsubscribe", channel)
+
+    async def punsubscribe(self, *patterns: str):
+        await self.client._round_trip()
+        for pattern in patterns or tuple(self.patterns):
+            subscribers = self.client.server.pattern_subscribers.get(pattern)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del self.client.server.pattern_subscribers[pattern]
+            self.patterns.discard(pattern)
+            self._confirm("punsubscribe", pattern)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0) -> Optional[Dict]:
+        """Siguiente mensaje o None si no llega ninguno dentro de `timeout` (None espera sin límite)"""
+        while True:
+            if not self.queue:
+                self._event.clear()
+                if timeout is not None and timeout <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self._event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return None
+                continue
+            message = self.queue.popleft()
+            if ignore_subscribe_messages and message["type"] not in ("message", "pmessage"):
+                continue
+            return message
+
+    async def listen(self) -> AsyncIterator[Dict]:
+        while self.channels or self.patterns or self.queue:
+            message = await self.get_message(timeout=None)
+            if message is not None:
+                yield message
+
+    async def reset(self):
+        await self.unsubscribe()
+        await self.punsubscribe()
+        self.queue.clear()
+
+    aclose = reset
+    close = reset
+
+    async def __aenter__(self) -> "FakePubSub":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.reset()
+
+class FakeRedis:
+    """
+    Cliente en proceso con la interfaz de redis.asyncio.Redis que usa este
+    proyecto (strings con TTL, INCR, pipelines, scripts, sorted sets,
+    streams, pub/sub y SCAN). Cada round trip cede el event loop y, si se
+    configura `latency` (más `jitter` aleatorio), duerme ese tiempo, así que
+    el cache y el rate limiter se pueden medir sin un Redis real.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, server: Optional[FakeRedisServer] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.server = server or FakeRedisServer()
+        self.stats = {"round_trips": 0, "commands": 0}
+
+    async def _round_trip(self, commands: int = 1):
+        self.stats["round_trips"] += 1
+        self.stats["commands"] += commands
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        with round_trip():
+            await asyncio.sleep(delay)
+
+    def __getattr__(self, name: str):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+        command = getattr(self.server, name)
+
+        async def call(*args, **kwargs):
+            await self._round_trip()
+            return command(*args, **kwargs)
+        call.__name__ = name
+        return call
+
+    async def execute_command(self, name: str, *args, **options) -> Any:
+        """Comando genérico; con NEVER_DECODE los strings vuelven como bytes"""
+        result = await getattr(self, name.lower())(*args)
+        if "NEVER_DECODE" not in options:
+            return result
+        if isinstance(result, list):
+            return [item.encode() if isinstance(item, str) else item for item in result]
+        return result.encode() if isinstance(result, str) else result
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self, transaction)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:
+        return FakePubSub(self, ignore_subscribe_messages)
+
+    def register_script(self, script: Callable) -> FakeScript:
+        return FakeScript(self, script)
+
+    async def scan_iter(
+        self,
+        match: Optional[str] = None,
+        count: Optional[int] = None,
+        _type: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        cursor = None
+        while cursor != 0:
+            cursor, keys = await self.scan(cursor or 0, match=match, count=count, _type=_type)
+            for key in keys:
+                yield key
+
+    async def close(self):
+        pass
+
+    aclose = close
\ No newline at end of file
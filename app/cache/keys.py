@@ -0,0 +1,144 @@
+import hashlib
+import inspect
+from datetime import date, time
+from enum import Enum
+from typing import Any, Callable, Dict, List, Tuple
+from pydantic import BaseModel
+from pydantic.fields import FieldInfo
+from pydantic_core import PydanticUndefined
+
+try:
+    import xxhash
+
+    def fast_hash(data: str) -> str:
+        return xxhash.xxh3_64_hexdigest(data)
+except ImportError:
+    def fast_hash(data: str) -> str:
+        return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+WILDCARD = "*"
+MAX_VALUE_LENGTH = 64
+
+# El separador y los metacaracteres glob de SCAN MATCH se escapan: un valor
+# con `*` o `[` no debe volverse un comodín en un patrón de invalidación
+_ESCAPES = str.maketrans({
+    "%": "%25", ":": "%3A", "*": "%2A", "?": "%3F", "[": "%5B", "]": "%5D", "\\": "%5C"
+})
+
+def _normalize_scalar(value: Any) -> str:
+    return str(value).translate(_ESCAPES)
+
+def _normalize_sequence(value: Any) -> str:
+    items = sorted(value) if isinstance(value, (set, frozenset)) else value
+    return ",".join(normalize(item) for item in items)
+
+def _normalize_mapping(value: Dict) -> str:
+    return ",".join(f"{k}={normalize(v)}" for k, v in sorted(value.items()))
+
+def _normalizer_for(value_type: type) -> Callable[[Any], str]:
+    if issubclass(value_type, Enum):
+        return lambda value: _normalize_scalar(value.value)
+    if issubclass(value_type, (date, time)):
+        return lambda value: _normalize_scalar(value.isoformat())
+    if issubclass(value_type, bool):
+        return lambda value: "true" if value else "false"
+    if issubclass(value_type, (int, float, str)):
+        return _normalize_scalar
+    if issubclass(value_type, BaseModel):
+        return lambda value: fast_hash(value.model_dump_json())
+    if issubclass(value_type, (list, tuple, set, frozenset)):
+        return _normalize_sequence
+    if issubclass(value_type, dict):
+        return _normalize_mapping
+    return lambda value: fast_hash(repr(value))
+
+_normalizers: Dict[type, Callable[[Any], str]] = {type(None): lambda value: WILDCARD}
+
+def normalize(value: Any) -> str:
+    """Representación canónica y estable de un argumento para la clave"""
+    normalizer = _normalizers.get(type(value))
+    if normalizer is None:
+        normalizer = _normalizers[type(value)] = _normalizer_for(type(value))
+    return normalizer(value)
+
+def _bounded(value: str) -> str:
+    """Un valor muy largo se reemplaza por su hash; build y pattern lo acortan igual"""
+    return value if len(value) <= MAX_VALUE_LENGTH else f"~{fast_hash(value)}"
+
+def _resolve_default(default: Any) -> Any:
+    """Valor por defecto efectivo, resolviendo Query(...)/Path(...) de FastAPI"""
+    if isinstance(default, FieldInfo):
+        default = default.default
+    if default is inspect.Parameter.empty or default is PydanticUndefined:
+        return None
+    return default
+
+class KeyBuilder:
+    """
+    Construye claves legibles como `yoga:listar_clases:v1:tipo=hatha:nivel=*`.
+    La firma de la función se analiza una sola vez al decorarla; por llamada
+    solo se recorren los parámetros ya resueltos. Los valores largos se
+    acortan a un hash por separado, así que un patrón que los fija sigue
+    coincidiendo; si aun así la clave supera `max_length` se conserva el
+    prefijo y se hashean todos los parámetros, y solo la invalidación del
+    namespace completo la alcanza.
+    """
+    __slots__ = ("head", "params", "var_positional", "var_keyword", "max_length")
+
+    def __init__(self, func: Callable, namespace: str, version: int = 1,
+                 prefix: str = "yoga:", max_length: int = 200):
+        self.head = f"{prefix}{namespace}:v{version}"
+        self.max_length = max_length
+        self.params: List[Tuple[str, int, Any, bool]] = []
+        self.var_positional = None
+        self.var_keyword = False
+
+        position = 0
+        for param in inspect.signature(func).parameters.values():
+            if param.kind is param.VAR_POSITIONAL:
+                self.var_positional = (param.name, position)
+                continue
+            if param.kind is param.VAR_KEYWORD:
+                self.var_keyword = True
+                continue
+            index = position if param.kind is not param.KEYWORD_ONLY else -1
+            if index >= 0:
+                position += 1
+            skip = index == 0 and param.name in ("self", "cls")
+            self.params.append((param.name, index, _resolve_default(param.default), skip))
+
+    def pattern(self, fixed: Dict[str, Any]) -> str:
+        """Patrón glob que fija algunos parámetros y deja el resto libre"""
+        parts = [self.head]
+        for name, _, _, skip in self.params:
+            if not skip:
+                parts.append(f"{name}={_bounded(normalize(fixed[name])) if name in fixed else WILDCARD}")
+        return ":".join(parts) + "*"
+
+    def build(self, args: tuple, kwargs: Dict[str, Any]) -> str:
+        """Clave canónica para una llamada concreta"""
+        parts = [self.head]
+        for name, index, default, skip in self.params:
+            if name in kwargs:
+                value = kwargs[name]
+            elif 0 <= index < len(args):
+                value = args[index]
+            else:
+                value = default
+            if not skip:
+                parts.append(f"{name}={_bounded(normalize(value))}")
+
+        if self.var_positional is not None:
+            name, start = self.var_positional
+            if len(args) > start:
+                parts.append(f"{name}={_bounded(normalize(args[start:]))}")
+        if self.var_keyword:
+            known = {name for name, _, _, _ in self.params}
+            extra = {k: v for k, v in kwargs.items() if k not in known}
+            if extra:
+                parts.append(_bounded(normalize(extra)))
+
+        key = ":".join(parts)
+        if len(key) > self.max_length:
+            key = f"{self.head}:~{fast_hash(key)}"
+        return key
\ No newline at end of file
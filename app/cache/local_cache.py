@@ -0,0 +1,72 @@
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Any, Iterable, List, Optional, Tuple
+
+class LocalCache:
+    """
+    Cache LRU en proceso con TTL. Se usa como respaldo cuando Redis no
+    está disponible, por lo que solo guarda datos ya serializables.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Obtener valor si existe y no expiró"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expire: int):
+        """Guardar valor con TTL, desalojando el menos usado si hace falta"""
+        self._data[key] = (time.monotonic() + expire, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, expire: int) -> bool:
+        """Guardar solo si la clave no existe, equivalente a SET NX"""
+        if self.get(key) is not None:
+            return False
+        self.set(key, value, expire)
+        return True
+
+    def delete_many(self, keys: Iterable[str]) -> int:
+        """Eliminar claves, devolviendo cuántas existían"""
+        deleted = 0
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                deleted += 1
+        return deleted
+
+    def keys(self, pattern: str) -> List[str]:
+        """Claves vigentes que coinciden con un patrón estilo Redis"""
+        now = time.monotonic()
+        return [
+            key for key, (expires_at, _) in self._data.items()
+            if expires_at > now and fnmatchcase(key, pattern)
+        ]
+
+    def incr_window(self, key: str, window: int) -> int:
+        """Contador de ventana fija equivalente a SET NX + INCR"""
+        current = self.get(key)
+        if current is None:
+            self.set(key, 1, window)
+            return 1
+        expires_at, _ = self._data[key]
+        self._data[key] = (expires_at, current + 1)
+        return current + 1
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
\ No newline at end of file
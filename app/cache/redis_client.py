@@ -1,70 +1,330 @@
 import redis.asyncio as redis
+from redis.client import NEVER_DECODE
 import json
-from typing import Optional, Any
+import os
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Iterable, Tuple
+from cache.circuit_breaker import CircuitBreaker, CircuitOpenError, SlowCallProbe, current_probe
+from cache.local_cache import LocalCache
+from monitoring.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
+class TimedConnection(redis.Connection):
+    """
+    Conexión que cronometra cada round trip para el circuit breaker: la
+    sonda de la llamada se arma al enviar y se desarma con la primera
+    respuesta (en un pipeline, las demás llegan con ella).
+    """
+
+    _deadline: Optional[Any] = None
+
+    async def send_packed_command(self, command, check_health: bool = True):
+        await super().send_packed_command(command, check_health)
+        probe = current_probe.get()
+        if probe is not None and self._deadline is None:
+            self._deadline = probe.arm()
+
+    async def read_response(self, *args, **kwargs):
+        try:
+            return await super().read_response(*args, **kwargs)
+        finally:
+            if self._deadline is not None:
+                self._deadline.cancel()
+                self._deadline = None
+
 class RedisClient:
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
-        self.host = host
-        self.port = port
-        self.db = db
+    def __init__(
+        self,
+        host: str = None,
+        port: int = None,
+        db: int = None,
+        max_connections: int = None,
+        socket_timeout: float = None,
+        connect_timeout: float = None,
+        health_check_interval: int = None,
+        socket_keepalive: bool = None
+    ):
+        self.host = host or os.getenv("REDIS_HOST", "localhost")
+        self.port = port or int(os.getenv("REDIS_PORT", "6379"))
+        self.db = db if db is not None else int(os.getenv("REDIS_DB", "0"))
+        self.max_connections = max_connections or int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+        self.socket_timeout = socket_timeout or float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+        self.connect_timeout = connect_timeout or float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+        )
+        self.socket_keepalive = (
+            socket_keepalive if socket_keepalive is not None
+            else os.getenv("REDIS_SOCKET_KEEPALIVE", "true") == "true"
+        )
+        self.pool: Optional[redis.ConnectionPool] = None
         self.connection: Optional[redis.Redis] = None
+        self.breaker = CircuitBreaker(
+            "redis",
+            failure_rate_threshold=float(os.getenv("REDIS_BREAKER_FAILURE_RATE", "0.5")),
+            slow_call_threshold=float(os.getenv("REDIS_BREAKER_SLOW_CALL", "0.1")),
+            open_timeout=float(os.getenv("REDIS_BREAKER_OPEN_TIMEOUT", "5"))
+        )
+        self.local_cache = LocalCache(int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "5000")))
 
     async def connect(self):
-        """Establecer conexión con Redis"""
+        """Establecer conexión con Redis usando un pool configurable"""
+        if os.getenv("REDIS_FAKE") == "true":
+            self.use_fake(float(os.getenv("REDIS_FAKE_LATENCY", "0")))
+            return
         try:
-            self.connection = redis.Redis(
+            self.pool = redis.BlockingConnectionPool(
                 host=self.host,
                 port=self.port,
                 db=self.db,
+                max_connections=self.max_connections,
+                timeout=self.connect_timeout,
+                socket_timeout=self.socket_timeout,
+                socket_connect_timeout=self.connect_timeout,
+                socket_keepalive=self.socket_keepalive,
+                health_check_interval=self.health_check_interval,
+                connection_class=TimedConnection,
                 decode_responses=True
             )
+            self.connection = redis.Redis(connection_pool=self.pool)
             await self.connection.ping()
-            logger.info("Conexión Redis establecida exitosamente")
+            logger.info(
+                "Conexión Redis establecida exitosamente (pool=%d, timeout=%ss)",
+                self.max_connections, self.socket_timeout
+            )
         except Exception as e:
-            logger.error(f"Error conectando a Redis: {e}")
+            self.breaker.trip()
+            logger.error("Error conectando a Redis: %s", e)
             raise
 
+    def use_fake(self, latency: float = 0.0, jitter: float = 0.0):
+        """Usar un Redis en proceso (cache.fake_redis) para pruebas y benchmarks sin servidor"""
+        from cache.fake_redis import FakeRedis
+
+        self.pool = None
+        self.connection = FakeRedis(latency=latency, jitter=jitter)
+        self.breaker.reset()
+        logger.info("Usando Redis en proceso (latencia simulada %.1f ms)", latency * 1000)
+
     async def disconnect(self):
         """Cerrar conexión con Redis"""
         if self.connection:
             await self.connection.close()
-            logger.info("Conexión Redis cerrada")
+        if self.pool:
+            await self.pool.disconnect()
+        logger.info("Conexión Redis cerrada")
+
+    async def _execute(
+        self,
+        operation: Callable[[redis.Redis], Awaitable[Any]],
+        count_slow: bool = True
+    ) -> Any:
+        """
+        Ejecutar una operación contra Redis pasando por el circuit breaker.
+        La lentitud se juzga por round trip (SlowCallProbe); con
+        `count_slow=False` la operación solo cuenta por sus errores.
+        """
+        if self.connection is None or not self.breaker.allow_request():
+            raise CircuitOpenError()
+
+        probe = SlowCallProbe(self.breaker.slow_call_threshold) if count_slow else None
+        token = current_probe.set(probe)
+        try:
+            with span("redis"):
+                result = await operation(self.connection)
+        except Exception:
+            self.breaker.record_failure(probe is not None and probe.slow)
+            raise
+        finally:
+            current_probe.reset(token)
+        self.breaker.record_success(probe is not None and probe.slow)
+        return result
 
     async def set(self, key: str, value: Any, expire: int = 3600):
         """Guardar valor en cache"""
         try:
             serialized_value = json.dumps(value)
-            await self.connection.setex(key, expire, serialized_value)
+        except (TypeError, ValueError) as e:
+            logger.error("Error serializando valor para cache: %s", e)
+            return
+        self.local_cache.set(key, value, expire)
+        try:
+            await self._execute(lambda conn: conn.setex(key, expire, serialized_value))
+        except CircuitOpenError:
+            pass
         except Exception as e:
-            logger.error(f"Error guardando en cache: {e}")
+            logger.error("Error guardando en cache: %s", e)
+
+    async def set_nx(self, key: str, value: Any, expire: int) -> bool:
+        """Guardar solo si la clave no existe (lock distribuido con SET NX EX)"""
+        serialized_value = json.dumps(value)
+        try:
+            acquired = await self._execute(
+                lambda conn: conn.set(key, serialized_value, ex=expire, nx=True)
+            )
+            return bool(acquired)
+        except CircuitOpenError:
+            return self.local_cache.add(key, value, expire)
+        except Exception as e:
+            logger.error("Error adquiriendo clave %s: %s", key, e)
+            return self.local_cache.add(key, value, expire)
 
     async def get(self, key: str) -> Optional[Any]:
-        """Obtener valor del cache"""
+        """Obtener valor del cache (respaldo local si Redis no responde)"""
         try:
-            value = await self.connection.get(key)
+            value = await self._execute(lambda conn: conn.get(key))
             if value:
                 return json.loads(value)
             return None
+        except CircuitOpenError:
+            return self.local_cache.get(key)
         except Exception as e:
-            logger.error(f"Error obteniendo del cache: {e}")
-            return None
+            logger.error("Error obteniendo del cache: %s", e)
+            return self.local_cache.get(key)
 
     async def delete(self, key: str):
         """Eliminar clave del cache"""
-        try:
-            await self.connection.delete(key)
-        except Exception as e:
-            logger.error(f"Error eliminando del cache: {e}")
+        await self.delete_many([key])
 
     async def exists(self, key: str) -> bool:
         """Verificar si clave existe"""
         try:
-            return await self.connection.exists(key) == 1
+            return await self._execute(lambda conn: conn.exists(key)) == 1
+        except CircuitOpenError:
+            return self.local_cache.get(key) is not None
         except Exception as e:
-            logger.error(f"Error verificando existencia: {e}")
+            logger.error("Error verificando existencia: %s", e)
             return False
 
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Obtener varias claves en un solo round trip"""
+        if not keys:
+            return []
+        try:
+            values = await self._execute(lambda conn: conn.mget(keys))
+            return [json.loads(v) if v else None for v in values]
+        except CircuitOpenError:
+            return [self.local_cache.get(key) for key in keys]
+        except Exception as e:
+            logger.error("Error obteniendo múltiples claves del cache: %s", e)
+            return [self.local_cache.get(key) for key in keys]
+
+    async def mget_raw(self, keys: List[str]) -> List[Optional[Any]]:
+        """
+        Como mget pero sin decodificar ni deserializar: devuelve los bytes
+        guardados (JSON o cuerpos binarios). Con Redis caído, lo que haya en
+        el respaldo local, que guarda los valores ya deserializados.
+        """
+        if not keys:
+            return []
+        try:
+            return await self._execute(lambda conn: conn.execute_command("MGET", *keys, **{NEVER_DECODE: True}))
+        except CircuitOpenError:
+            return [self.local_cache.get(key) for key in keys]
+        except Exception as e:
+            logger.error("Error obteniendo múltiples claves del cache: %s", e)
+            return [self.local_cache.get(key) for key in keys]
+
+    async def mset_with_ttl(self, mapping: Dict[str, Any], expire: int = 3600):
+        """Guardar varias claves con TTL usando un pipeline; los bytes se guardan tal cual"""
+        if not mapping:
+            return
+        for key, value in mapping.items():
+            self.local_cache.set(key, value, expire)
+
+        async def _pipeline(conn: redis.Redis):
+            async with conn.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, expire, value if isinstance(value, bytes) else json.dumps(value))
+                return await pipe.execute()
+
+        try:
+            await self._execute(_pipeline)
+        except CircuitOpenError:
+            pass
+        except Exception as e:
+            logger.error("Error guardando múltiples claves en cache: %s", e)
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Eliminar varias claves en un solo round trip"""
+        keys = list(keys)
+        if not keys:
+            return 0
+        deleted_local = self.local_cache.delete_many(keys)
+        try:
+            return await self._execute(lambda conn: conn.delete(*keys))
+        except CircuitOpenError:
+            return deleted_local
+        except Exception as e:
+            logger.error("Error eliminando múltiples claves del cache: %s", e)
+            return deleted_local
+
+    async def scan_keys(self, pattern: str, count: int = 500) -> List[str]:
+        """Buscar claves por patrón con SCAN (no bloquea Redis como KEYS)"""
+        local_keys = self.local_cache.keys(pattern)
+
+        async def _scan(conn: redis.Redis):
+            return [key async for key in conn.scan_iter(match=pattern, count=count)]
+
+        try:
+            # Un SCAN son varias vueltas y su costo crece con el keyspace: no cuenta como llamada lenta
+            remote_keys = await self._execute(_scan, count_slow=False)
+        except CircuitOpenError:
+            return local_keys
+        except Exception as e:
+            logger.error("Error buscando claves con patrón %s: %s", pattern, e)
+            return local_keys
+        return list(set(remote_keys).union(local_keys))
+
+    async def incr_window(self, key: str, window: int) -> Optional[int]:
+        """Incrementar un contador de ventana fija en un solo round trip"""
+
+        async def _incr(conn: redis.Redis):
+            async with conn.pipeline(transaction=True) as pipe:
+                pipe.set(key, 0, ex=window, nx=True)
+                pipe.incr(key)
+                _, count = await pipe.execute()
+            return int(count)
+
+        try:
+            return await self._execute(_incr)
+        except CircuitOpenError:
+            return self.local_cache.incr_window(key, window)
+        except Exception as e:
+            logger.error("Error incrementando contador %s: %s", key, e)
+            return self.local_cache.incr_window(key, window)
+
+    async def xadd(self, stream: str, fields: Dict[str, str], maxlen: int = 10000) -> Optional[str]:
+        """Agregar una entrada a un stream acotado; None si Redis no está disponible"""
+        try:
+            return await self._execute(
+                lambda conn: conn.xadd(stream, fields, maxlen=maxlen, approximate=True)
+            )
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            logger.error("Error publicando en stream %s: %s", stream, e)
+            return None
+
+    async def xread(self, stream: str, last_id: str, count: int = 100) -> List[Tuple[str, Dict[str, str]]]:
+        """Leer sin bloquear las entradas posteriores a last_id"""
+        try:
+            result = await self._execute(lambda conn: conn.xread({stream: last_id}, count=count))
+        except CircuitOpenError:
+            return []
+        except Exception as e:
+            logger.error("Error leyendo stream %s: %s", stream, e)
+            return []
+        return [entry for _, entries in result for entry in entries]
+
+    def get_status(self) -> Dict:
+        """Estado de la conexión y del circuit breaker"""
+        return {
+            "connected": self.connection is not None,
+            "circuit_breaker": self.breaker.snapshot(),
+            "local_cache_entries": len(self.local_cache)
+        }
+
 redis_client = RedisClient()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from cache.cache_manager import cache_manager
+
+logger = logging.getLogger(__name__)
+
+WarmupCall = Tuple[Callable, Dict]
+
+class CacheWarmer:
+    """
+    Precalienta el cache al arrancar y refresca por adelantado las claves
+    más consultadas poco antes de que expiren.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = None,
+        refresh_margin: float = None,
+        min_hits: int = None,
+        max_refresh_per_cycle: int = None
+    ):
+        self.refresh_interval = refresh_interval or float(os.getenv("CACHE_REFRESH_INTERVAL", "10"))
+        self.refresh_margin = refresh_margin or float(os.getenv("CACHE_REFRESH_MARGIN", "20"))
+        self.min_hits = min_hits or int(os.getenv("CACHE_REFRESH_MIN_HITS", "2"))
+        self.max_refresh_per_cycle = max_refresh_per_cycle or int(os.getenv("CACHE_REFRESH_MAX_KEYS", "50"))
+        self.is_ready = False
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {
+            "warmed_keys": 0,
+            "warmup_errors": 0,
+            "warmup_seconds": 0.0,
+            "refreshed_keys": 0
+        }
+
+    async def warm_up(self, calls: Iterable[WarmupCall]):
+        """Ejecutar las funciones cacheadas para poblar el cache"""
+        start = time.perf_counter()
+        for func, kwargs in calls:
+            try:
+                await func(**kwargs)
+                self.stats["warmed_keys"] += 1
+            except Exception as e:
+                self.stats["warmup_errors"] += 1
+                logger.error("Error precalentando %s(%s): %s", func.__name__, kwargs, e)
+
+        self.stats["warmup_seconds"] = round(time.perf_counter() - start, 3)
+        self.is_ready = True
+        logger.info(
+            "Cache precalentado: %d claves en %ss",
+            self.stats["warmed_keys"], self.stats["warmup_seconds"]
+        )
+
+    async def start(self):
+        """Iniciar el refresco anticipado en segundo plano"""
+        self.is_running = True
+        self.task = asyncio.create_task(self._refresh_loop())
+        logger.info("Refresco anticipado del cache iniciado")
+
+    async def stop(self):
+        """Detener el refresco anticipado"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+        logger.info("Refresco anticipado del cache detenido")
+
+    async def _refresh_loop(self):
+        while self.is_running:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh_hot_keys()
+
+    async def refresh_hot_keys(self) -> int:
+        """Recalcular las claves calientes que están por expirar"""
+        keys = cache_manager.hot_entries(
+            expiring_within=self.refresh_margin,
+            min_hits=self.min_hits,
+            limit=self.max_refresh_per_cycle
+        )
+        refreshed = 0
+        for key in keys:
+            if await cache_manager.refresh(key):
+                refreshed += 1
+        self.stats["refreshed_keys"] += refreshed
+        return refreshed
+
+    def get_status(self) -> Dict:
+        return {"ready": self.is_ready, "running": self.is_running, **self.stats}
+
+cache_warmer = CacheWarmer()
\ No newline at end of file
@@ -0,0 +1,12 @@
+"""
+Índices en memoria para consultas rápidas
+Índices secundarios sobre las clases de yoga mantenidos de forma incremental
+"""
+
+from .schedule import ScheduleIndex, schedule_index
+from .reservations import ReservationIndex, reservation_index
+from .search import SearchIndex, search_index
+from .availability import AvailabilityIndex, availability_index
+
+__all__ = ['ScheduleIndex', 'schedule_index', 'ReservationIndex', 'reservation_index', 'SearchIndex', 'search_index',
+           'AvailabilityIndex', 'availability_index']
\ No newline at end of file
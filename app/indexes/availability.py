@@ -0,0 +1,78 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+from .schedule import to_minutes
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+def week_minute(day: int, minute: int) -> int:
+    """Minuto de la semana para un día (1=lunes) y un minuto del día"""
+    return (day - 1) * 24 * 60 + minute
+
+class AvailabilityIndex:
+    """
+    Vista materializada de las clases activas con cupos libres, como dos
+    conjuntos ordenados al estilo de un sorted set: por cupos restantes y
+    por minuto de la semana de cada ocurrencia. Se actualiza al cambiar la
+    clase o sus reservas, y "las N próximas" o "las N con más cupos" son
+    una búsqueda binaria más un recorrido de N elementos.
+    """
+
+    def __init__(self):
+        self._by_spots: List[Tuple[int, int]] = []
+        self._by_time: List[Tuple[int, int]] = []
+        self._entries: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+
+    def update(self, clase_id: int, cupos: int, horario: str, dias_semana: Iterable[int]):
+        """Reubicar una clase; sin cupos sale de la vista"""
+        self.remove(clase_id)
+        if cupos <= 0:
+            return
+        minute = to_minutes(horario)
+        slots = tuple(sorted(week_minute(day, minute) for day in set(dias_semana)))
+        insort(self._by_spots, (-cupos, clase_id))
+        for slot in slots:
+            insort(self._by_time, (slot, clase_id))
+        self._entries[clase_id] = (cupos, slots)
+
+    def remove(self, clase_id: int):
+        """Quitar una clase de la vista"""
+        entry = self._entries.pop(clase_id, None)
+        if entry is None:
+            return
+        cupos, slots = entry
+        del self._by_spots[bisect_left(self._by_spots, (-cupos, clase_id))]
+        for slot in slots:
+            del self._by_time[bisect_left(self._by_time, (slot, clase_id))]
+
+    def most_spots(self, limit: int) -> List[Tuple[int, int]]:
+        """(clase_id, cupos) de las clases con más cupos libres"""
+        return [(clase_id, -score) for score, clase_id in self._by_spots[:limit]]
+
+    def soonest(self, from_minute: int, limit: int) -> List[int]:
+        """Clases con cupos por su próxima ocurrencia desde un minuto de la semana, dando la vuelta"""
+        start = bisect_left(self._by_time, (from_minute, -1))
+        seen: Dict[int, None] = {}
+        size = len(self._by_time)
+        for offset in range(size):
+            _, clase_id = self._by_time[(start + offset) % size]
+            seen[clase_id] = None
+            if len(seen) >= limit:
+                break
+        return list(seen)
+
+    def spots(self, clase_id: int) -> int:
+        entry = self._entries.get(clase_id)
+        return entry[0] if entry else 0
+
+    def rebuild(self, clases: Iterable[Tuple[int, int, str, Iterable[int]]]):
+        """Reconstruir la vista desde tuplas (clase_id, cupos, horario, dias_semana)"""
+        self._by_spots = []
+        self._by_time = []
+        self._entries = {}
+        for clase_id, cupos, horario, dias_semana in clases:
+            self.update(clase_id, cupos, horario, dias_semana)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+availability_index = AvailabilityIndex()
\ No newline at end of file
@@ -0,0 +1,45 @@
+from typing import Dict, List
+
+class ReservationIndex:
+    """
+    Índices de reservas por usuario y contadores por clase.
+    Cada operación es síncrona y sin awaits, así que dentro del event loop
+    el cambio de los tres mapas es atómico.
+    """
+
+    def __init__(self):
+        self.por_usuario: Dict[int, Dict[int, None]] = {}
+        self.por_clase: Dict[int, int] = {}
+
+    def add(self, reserva_id: int, usuario_id: int, clase_id: int):
+        self.por_usuario.setdefault(usuario_id, {})[reserva_id] = None
+        self.por_clase[clase_id] = self.por_clase.get(clase_id, 0) + 1
+
+    def remove(self, reserva_id: int, usuario_id: int, clase_id: int):
+        reservas = self.por_usuario.get(usuario_id)
+        if reservas is not None:
+            reservas.pop(reserva_id, None)
+            if not reservas:
+                del self.por_usuario[usuario_id]
+        count = self.por_clase.get(clase_id, 0) - 1
+        if count > 0:
+            self.por_clase[clase_id] = count
+        else:
+            self.por_clase.pop(clase_id, None)
+
+    def count(self, clase_id: int) -> int:
+        """Reservas confirmadas de una clase en O(1)"""
+        return self.por_clase.get(clase_id, 0)
+
+    def of_user(self, usuario_id: int) -> List[int]:
+        """Ids de reserva de un usuario en orden de creación"""
+        return list(self.por_usuario.get(usuario_id, ()))
+
+    def rebuild(self, reservas):
+        """Reconstruir los índices desde los registros de reservas"""
+        self.por_usuario = {}
+        self.por_clase = {}
+        for reserva in reservas:
+            self.add(reserva.id, reserva.usuario_id, reserva.clase_id)
+
+reservation_index = ReservationIndex()
\ No newline at end of file
@@ -0,0 +1,61 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Tuple
+
+def to_minutes(horario: str) -> int:
+    """Minuto del día para un horario "HH:MM[:SS]" """
+    hours, minutes = horario.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+class ScheduleIndex:
+    """
+    Índice de horario por (día de la semana, minuto de inicio).
+    Cada día guarda una lista ordenada de (minuto, clase_id), de modo que
+    una ventana horaria se resuelve con dos búsquedas binarias.
+    """
+
+    def __init__(self):
+        self._days: Dict[int, List[Tuple[int, int]]] = {day: [] for day in range(1, 8)}
+        self._entries: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+
+    def add(self, clase_id: int, horario: str, dias_semana: Iterable[int]):
+        """Indexar (o reindexar) una clase; un día fuera de 1..7 no toca el índice"""
+        minute = to_minutes(horario)
+        dias = tuple(sorted(set(dias_semana)))
+        invalid = [day for day in dias if day not in self._days]
+        if invalid:
+            raise ValueError(f"Días de la semana inválidos: {invalid}")
+        self.remove(clase_id)
+        for day in dias:
+            insort(self._days[day], (minute, clase_id))
+        self._entries[clase_id] = (minute, dias)
+
+    def remove(self, clase_id: int):
+        """Quitar una clase del índice"""
+        entry = self._entries.pop(clase_id, None)
+        if entry is None:
+            return
+        minute, dias = entry
+        for day in dias:
+            slots = self._days[day]
+            index = bisect_left(slots, (minute, clase_id))
+            if index < len(slots) and slots[index] == (minute, clase_id):
+                del slots[index]
+
+    def query(self, day: int, start_minute: int, end_minute: int) -> List[int]:
+        """Clases que empiezan en [start_minute, end_minute] ese día, en orden"""
+        slots = self._days.get(day, [])
+        lo = bisect_left(slots, (start_minute, -1))
+        hi = bisect_right(slots, (end_minute, float("inf")))
+        return [clase_id for _, clase_id in slots[lo:hi]]
+
+    def rebuild(self, clases: Iterable):
+        """Reconstruir el índice completo desde los registros de clases"""
+        self._days = {day: [] for day in range(1, 8)}
+        self._entries = {}
+        for clase in clases:
+            self.add(clase.id, clase.horario, clase.dias_semana)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+schedule_index = ScheduleIndex()
\ No newline at end of file
@@ -0,0 +1,100 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FIELD_WEIGHTS = {"nombre": 3.0, "instructor": 2.0, "descripcion": 1.0}
+PREFIX_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Palabras en minúsculas y sin acentos ("Restaurativo Suave" -> restaurativo, suave)"""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return _TOKEN_RE.findall("".join(c for c in decomposed if not unicodedata.combining(c)))
+
+class SearchIndex:
+    """
+    Índice invertido sobre el texto de las clases. Cada término apunta a
+    {clase_id: peso}, donde el peso suma las apariciones ponderadas por
+    campo. El vocabulario se mantiene ordenado para resolver los prefijos
+    con una búsqueda binaria en vez de recorrer los términos.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._vocabulary: List[str] = []
+        self._terms: Dict[int, Tuple[str, ...]] = {}
+
+    def add(self, clase_id: int, fields: Dict[str, Optional[str]]):
+        """Indexar (o reindexar) una clase con sus campos de texto"""
+        self.remove(clase_id)
+        weights: Dict[str, float] = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + weight
+
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            posting[clase_id] = weight
+        self._terms[clase_id] = tuple(weights)
+
+    def remove(self, clase_id: int):
+        """Quitar una clase del índice"""
+        for term in self._terms.pop(clase_id, ()):
+            posting = self._postings[term]
+            del posting[clase_id]
+            if not posting:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def _matches(self, token: str) -> Dict[int, float]:
+        """Mejor puntaje por clase para un término de la consulta, exacto o como prefijo"""
+        scores: Dict[int, float] = {}
+        index = bisect_left(self._vocabulary, token)
+        while index < len(self._vocabulary) and self._vocabulary[index].startswith(token):
+            term = self._vocabulary[index]
+            factor = 1.0 if term == token else PREFIX_FACTOR
+            for clase_id, weight in self._postings[term].items():
+                score = weight * factor
+                if score > scores.get(clase_id, 0.0):
+                    scores[clase_id] = score
+            index += 1
+        return scores
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Clases que contienen todos los términos de la consulta, de mayor a menor puntaje"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        per_token = sorted((self._matches(token) for token in set(tokens)), key=len)
+        ranked = per_token[0]
+        for scores in per_token[1:]:
+            ranked = {
+                clase_id: score + scores[clase_id]
+                for clase_id, score in ranked.items()
+                if clase_id in scores
+            }
+            if not ranked:
+                break
+        return sorted(ranked.items(), key=lambda item: (-item[1], item[0]))
+
+    def rebuild(self, documents: Iterable[Tuple[int, Dict[str, Optional[str]]]]):
+        """Reconstruir el índice completo desde pares (clase_id, campos)"""
+        self._postings = {}
+        self._vocabulary = []
+        self._terms = {}
+        for clase_id, fields in documents:
+            self.add(clase_id, fields)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+search_index = SearchIndex()
\ No newline at end of file
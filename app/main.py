@@ -1,29 +1,79 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from middleware.rate_limiter import RateLimiterMiddleware
 from middleware.performance import PerformanceMiddleware
 from middleware.monitoring import MonitoringMiddleware
+from middleware.idempotency import IdempotencyMiddleware
+from middleware.admission import AdmissionControlMiddleware, admission_limiter
+from middleware.compression import CompressionMiddleware
 from monitoring.metrics_collector import metrics_collector
 from monitoring.alerts import alert_manager, router as alerts_router
-from routes.optimized_api import router as api_router
+from monitoring.tracing import tracer
+from monitoring.profiling import router as admin_router
+from monitoring.loop_monitor import loop_monitor
+from monitoring.timeseries import metrics_history
+from monitoring.log_pipeline import setup_logging, stop_logging
+from cache.redis_client import redis_client
+from routes.optimized_api import (
+    router as api_router,
+    warmup_calls,
+    promover_lista_espera,
+    aplicar_cambio,
+    aplicar_registro,
+    exportar_estado,
+    cargar_estado
+)
+from cache.warmup import cache_warmer
+from services.waitlist import waitlist_manager
+from services.change_feed import change_feed
+from services.journal import journal
 import logging
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+waitlist_manager.set_promoter(promover_lista_espera)
+change_feed.subscribe("clase", aplicar_cambio)
+change_feed.subscribe("reserva", aplicar_cambio)
+journal.bind(exportar_estado, cargar_estado, aplicar_registro)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if os.getenv("TESTING") != "true":
+        setup_logging(getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
     logger.info("Iniciando aplicación Centro de Yoga Paz Interior")
     
     if os.getenv("TESTING") != "true":
+        try:
+            await redis_client.connect()
+        except Exception:
+            logger.warning("Redis no disponible, iniciando con cache local")
+        journal.load()
+        await journal.start()
         await metrics_collector.start()
+        await metrics_history.start()
+        await loop_monitor.start()
+        await cache_warmer.warm_up(warmup_calls())
+        await cache_warmer.start()
+        await waitlist_manager.start()
+        await change_feed.start()
     
     yield
     
     if os.getenv("TESTING") != "true":
+        await change_feed.stop()
+        await waitlist_manager.stop()
+        await cache_warmer.stop()
+        await loop_monitor.stop()
+        await metrics_history.stop()
         await metrics_collector.stop()
+        await journal.stop()
+        tracer.flush()
+        await redis_client.disconnect()
     logger.info("Apagando aplicación")
+    stop_logging()
 
 app = FastAPI(
     title="Centro de Yoga Paz Interior - API",
@@ -33,12 +83,16 @@ app = FastAPI(
 )
 
 if os.getenv("TESTING") != "true":
+    app.add_middleware(IdempotencyMiddleware)
     app.add_middleware(RateLimiterMiddleware)
+    app.add_middleware(AdmissionControlMiddleware)
     app.add_middleware(PerformanceMiddleware)
     app.add_middleware(MonitoringMiddleware)
+    app.add_middleware(CompressionMiddleware)
 
 app.include_router(api_router, prefix="/api/v1")
 app.include_router(alerts_router, prefix="/api/v1/alerts")
+app.include_router(admin_router, prefix="/api/v1/admin")
 
 @app.get("/")
 async def root():
@@ -50,6 +104,8 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    if os.getenv("TESTING") != "true" and not cache_warmer.is_ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
     return {"status": "healthy"}
 
 @app.get("/status")
@@ -62,10 +118,21 @@ async def system_status():
     
     alert_manager.check_performance_alerts(metrics)
     alert_manager.check_business_alerts()
+    loop_stats = loop_monitor.get_stats()
+    alert_manager.check_loop_alerts(loop_stats)
+    redis_status = redis_client.get_status()
     
     return {
-        "status": "healthy",
+        "status": "healthy" if redis_status["circuit_breaker"]["state"] == "closed" else "degraded",
         "metrics": metrics,
+        "redis": redis_status,
+        "cache_warmup": cache_warmer.get_status(),
+        "waitlist": waitlist_manager.get_stats(),
+        "change_feed": change_feed.get_stats(),
+        "journal": journal.get_status(),
+        "metrics_history": metrics_history.get_status(),
+        "admission": admission_limiter.snapshot(),
+        "event_loop": loop_stats,
         "alerts": {
             "active": alert_manager.get_active_alerts(),
             "stats": alert_manager.get_alert_stats()
@@ -1,14 +1,18 @@
 """
 Middlewares para la aplicación FastAPI
-Middlewares de rate limiting, performance y monitoreo
+Middlewares de rate limiting, idempotencia, control de admisión, performance y monitoreo
 """
 
 from .rate_limiter import RateLimiterMiddleware
 from .performance import PerformanceMiddleware
 from .monitoring import MonitoringMiddleware
+from .idempotency import IdempotencyMiddleware
+from .admission import AdmissionControlMiddleware
 
 __all__ = [
     'RateLimiterMiddleware', 
     'PerformanceMiddleware', 
-    'MonitoringMiddleware'
+    'MonitoringMiddleware',
+    'IdempotencyMiddleware',
+    'AdmissionControlMiddleware'
 ]
\ No newline at end of file
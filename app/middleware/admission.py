@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Tuple
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from monitoring.tracing import span
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CRITICAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+EXEMPT_PATHS = {"/", "/health"}
+LOW_PRIORITY_PREFIXES = ("/status", "/metrics", "/api/v1/metrics", "/api/v1/alerts")
+
+def priority_for(method: str, path: str) -> int:
+    """Las reservas pasan primero; lecturas, listados y métricas al final"""
+    if method in ("POST", "DELETE") and (path.endswith("/reservar") or path.startswith("/api/v1/reservas")):
+        return PRIORITY_CRITICAL
+    if method == "GET" or path.startswith(LOW_PRIORITY_PREFIXES):
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+class AdmissionRejected(Exception):
+    """La petición no entra: cola llena, desplazada por otra más prioritaria o espera agotada"""
+
+class AdaptiveLimiter:
+    """
+    Límite de concurrencia AIMD sobre la latencia medida.
+
+    Cada respuesta dentro de la latencia objetivo suma 1/limit al límite
+    (≈ +1 por ronda completa) mientras se esté usando al menos la mitad;
+    cada respuesta lenta lo multiplica por `backoff`. Lo que excede el
+    límite espera en una cola acotada ordenada por prioridad; si está llena,
+    una petición más prioritaria desplaza a la peor de la cola.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = None,
+        min_limit: int = None,
+        max_limit: int = None,
+        target_latency: float = None,
+        backoff: float = None,
+        queue_size: int = None,
+        queue_timeout: float = None
+    ):
+        self.limit = float(initial_limit or int(os.getenv("ADMISSION_INITIAL_LIMIT", "50")))
+        self.min_limit = min_limit or int(os.getenv("ADMISSION_MIN_LIMIT", "5"))
+        self.max_limit = max_limit or int(os.getenv("ADMISSION_MAX_LIMIT", "500"))
+        self.target_latency = target_latency or float(os.getenv("ADMISSION_TARGET_LATENCY", "0.25"))
+        self.backoff = backoff or float(os.getenv("ADMISSION_BACKOFF", "0.9"))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+        self.queue_timeout = queue_timeout or float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+        self.in_flight = 0
+        self.queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "evicted": 0, "timed_out": 0}
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        """Obtener un lugar o esperar en la cola; lanza AdmissionRejected si no entra"""
+        if self.in_flight < int(self.limit) and not self.queue:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+
+        if len(self.queue) >= self.queue_size:
+            worst = max(self.queue, default=None)
+            if worst is None or worst[0] <= priority:
+                self.stats["rejected"] += 1
+                raise AdmissionRejected()
+            self.queue.remove(worst)
+            heapq.heapify(self.queue)
+            worst[2].set_exception(AdmissionRejected())
+            self.stats["evicted"] += 1
+
+        entry = (priority, next(self._counter), asyncio.get_running_loop().create_future())
+        heapq.heappush(self.queue, entry)
+        self.stats["queued"] += 1
+
+        try:
+            done, _ = await asyncio.wait({entry[2]}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            self.stats["timed_out"] += 1
+            raise AdmissionRejected()
+        entry[2].result()
+        self.stats["admitted"] += 1
+
+    def _abandon(self, entry: Tuple[int, int, asyncio.Future]):
+        """Sacar de la cola una espera que ya no sigue; si justo recibió lugar, devolverlo"""
+        future = entry[2]
+        if future.done() and not future.cancelled() and future.exception() is None:
+            self.in_flight -= 1
+            self._grant_next()
+            return
+        future.cancel()
+        if entry in self.queue:
+            self.queue.remove(entry)
+            heapq.heapify(self.queue)
+
+    def release(self, latency: float, failed: bool = False):
+        """Liberar el lugar y ajustar el límite según la latencia observada"""
+        self.in_flight -= 1
+        if failed or latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._grant_next()
+
+    def _grant_next(self):
+        while self.queue and self.in_flight < int(self.limit):
+            _, _, future = heapq.heappop(self.queue)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos al cliente: lo que tardaría en vaciarse la cola"""
+        drain = self.target_latency * (len(self.queue) + 1) / max(self.limit, 1)
+        return max(1, int(drain + 0.999))
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued_now": len(self.queue),
+            "target_latency": self.target_latency,
+            **self.stats
+        }
+
+admission_limiter = AdaptiveLimiter()
+
+class AdmissionControlMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, limiter: AdaptiveLimiter = None):
+        super().__init__(app)
+        self.limiter = limiter or admission_limiter
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in EXEMPT_PATHS:
+            return await call_next(request)
+
+        try:
+            with span("admission"):
+                await self.limiter.acquire(priority_for(request.method, request.url.path))
+        except AdmissionRejected:
+            retry_after = self.limiter.retry_after()
+            logger.warning("Sobrecarga: rechazando %s %s", request.method, request.url.path)
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor sobrecargado. Intente más tarde."},
+                headers={"Retry-After": str(retry_after)}
+            )
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await call_next(request)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            self.limiter.release(time.perf_counter() - start, failed)
\ No newline at end of file
@@ -0,0 +1,50 @@
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+import logging
+from cache.compression import (
+    MIN_SIZE,
+    compress_async,
+    is_compressible,
+    negotiate,
+    reset_accept_encoding,
+    set_accept_encoding
+)
+
+logger = logging.getLogger(__name__)
+
+class CompressionMiddleware(BaseHTTPMiddleware):
+    """
+    Negociación de Content-Encoding. Deja el Accept-Encoding de la petición
+    a mano del cache, que responde con el cuerpo ya comprimido al guardarse;
+    solo las respuestas que no salen del cache se comprimen al vuelo.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        accept_encoding = request.headers.get("accept-encoding")
+        token = set_accept_encoding(accept_encoding)
+        try:
+            response = await call_next(request)
+        finally:
+            reset_accept_encoding(token)
+
+        headers = response.headers
+        if (
+            "content-encoding" in headers
+            or response.status_code in (204, 304)
+            or int(headers.get("content-length") or 0) < MIN_SIZE
+            or not is_compressible(headers.get("content-type"))
+        ):
+            return response
+
+        if "accept-encoding" not in headers.get("vary", "").lower():
+            headers.add_vary_header("Accept-Encoding")
+        encoding = negotiate(accept_encoding)
+        if encoding is None:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        compressed = await compress_async(body, encoding)
+        passthrough = {k: v for k, v in headers.items() if k != "content-length"}
+        passthrough["Content-Encoding"] = encoding
+        return Response(content=compressed, status_code=response.status_code, headers=passthrough)
\ No newline at end of file
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, Response
+from cache.redis_client import redis_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Soporte de `Idempotency-Key` para los POST.
+
+    La primera respuesta 2xx se guarda en Redis con TTL y los reintentos se
+    responden desde ahí con un solo GET; un 4xx no se guarda, para que el
+    cliente pueda corregir y reintentar. Mientras la primera petición está
+    en curso, los duplicados del mismo worker esperan su resultado y los de
+    otros workers ven el lock (SET NX) y consultan hasta que aparezca.
+
+    Cada respuesta guarda la huella de su petición (método, ruta, query y
+    hash del cuerpo): reusar la clave con otra petición responde 422.
+    """
+
+    def __init__(
+        self,
+        app,
+        ttl: int = None,
+        lock_ttl: int = None,
+        wait_timeout: float = None,
+        poll_interval: float = 0.05
+    ):
+        super().__init__(app)
+        self.ttl = ttl or int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+        self.lock_ttl = lock_ttl or int(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))
+        self.wait_timeout = wait_timeout or float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+        self.poll_interval = poll_interval
+        self.in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def dispatch(self, request: Request, call_next):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if request.method != "POST" or not idempotency_key:
+            return await call_next(request)
+
+        key = f"idempotency:{request.url.path}:{idempotency_key}"
+        request_body = await request.body()
+        fingerprint = self._fingerprint(request, request_body)
+
+        stored = await redis_client.get(key)
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        pending = self.in_flight.get(key)
+        if pending is not None:
+            if pending[0] != fingerprint:
+                return self._mismatch()
+            stored = await asyncio.shield(pending[1])
+            return self._replay(stored, fingerprint) if stored is not None else self._in_progress()
+
+        if not await redis_client.set_nx(f"{key}:lock", fingerprint, self.lock_ttl):
+            if await redis_client.get(f"{key}:lock") not in (fingerprint, None):
+                return self._mismatch()
+            stored = await self._wait_for_result(key)
+            if stored is None:
+                return self._in_progress()
+            return self._replay(stored, fingerprint)
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = (fingerprint, future)
+        stored = None
+        try:
+            response = await call_next(self._with_body(request, request_body))
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            stored = {
+                "status_code": response.status_code,
+                "body": body.decode(),
+                "media_type": response.headers.get("content-type"),
+                "fingerprint": fingerprint
+            }
+            if 200 <= response.status_code < 300:
+                await redis_client.set(key, stored, expire=self.ttl)
+            return Response(
+                content=body,
+                status_code=response.status_code,
+                headers={k: v for k, v in response.headers.items() if k != "content-length"}
+            )
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            # También si la petición se cancela: los duplicados no pueden quedar esperando
+            if not future.done():
+                future.set_result(stored)
+            del self.in_flight[key]
+            await redis_client.delete(f"{key}:lock")
+
+    @staticmethod
+    def _fingerprint(request: Request, body: bytes) -> str:
+        """Huella de la petición: método, ruta, query y hash del cuerpo"""
+        digest = hashlib.sha256(body).hexdigest()
+        return hashlib.sha256(
+            f"{request.method}\n{request.url.path}\n{request.url.query}\n{digest}".encode()
+        ).hexdigest()
+
+    @staticmethod
+    def _with_body(request: Request, body: bytes) -> Request:
+        """La misma petición con el cuerpo ya leído, que Starlette 0.27 no guarda para call_next"""
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if delivered:
+                return await request.receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return Request(request.scope, receive)
+
+    async def _wait_for_result(self, key: str) -> Optional[Dict]:
+        """Esperar la respuesta que está calculando otro worker; None si termina sin guardarla"""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            stored = await redis_client.get(key)
+            if stored is not None:
+                return stored
+            if not await redis_client.exists(f"{key}:lock"):
+                return await redis_client.get(key)
+        return None
+
+    @staticmethod
+    def _in_progress() -> Response:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Solicitud con la misma Idempotency-Key en curso"}
+        )
+
+    @staticmethod
+    def _mismatch() -> Response:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": "La Idempotency-Key ya se usó con otra solicitud"}
+        )
+
+    def _replay(self, stored: Dict, fingerprint: str) -> Response:
+        if stored.get("fingerprint") != fingerprint:
+            return self._mismatch()
+        logger.debug("Respuesta idempotente reutilizada")
+        return Response(
+            content=stored["body"],
+            status_code=stored["status_code"],
+            media_type=stored["media_type"],
+            headers={"Idempotent-Replayed": "true"}
+        )
\ No newline at end of file
@@ -20,7 +20,7 @@ class MonitoringMiddleware(BaseHTTPMiddleware):
             return response
 
         except Exception as e:
-            logger.error(f"Error no manejado en {request.url.path}: {e}")
+            logger.error("Error no manejado en %s: %s", request.url.path, e)
             await metrics_collector.record_exception(
                 path=request.url.path,
                 exception_type=type(e).__name__
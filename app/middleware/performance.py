@@ -4,17 +4,49 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import logging
 from monitoring.metrics_collector import metrics_collector
+from monitoring.tracing import UNMATCHED_ROUTE, Trace, route_label, tracer
+from monitoring.profiling import profiler, slow_requests
+from monitoring.timeseries import metrics_history
 
 logger = logging.getLogger(__name__)
 
+def _slow_request_details(request: Request, response: Response, trace: Trace) -> dict:
+    """Detalle guardado para una petición lenta"""
+    details = {
+        "method": request.method,
+        "path": request.url.path,
+        "query_params": dict(request.query_params),
+        "status_code": response.status_code,
+        "request_bytes": int(request.headers.get("content-length", 0)),
+        "response_bytes": int(response.headers.get("content-length", 0))
+    }
+    if trace is not None:
+        details["spans_ms"] = {
+            name: round(duration / 1e6, 3) for name, (duration, _) in trace.totals().items()
+        }
+        details["cache"] = [s.attributes["desc"] for s in trace.spans if s.name == "cache" and "desc" in s.attributes]
+    return details
+
 class PerformanceMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
+        trace = tracer.start(request.method, UNMATCHED_ROUTE)
         
         response = await call_next(request)
         
-        process_time = time.time() - start_time
+        elapsed_ns = time.perf_counter_ns() - start_ns
+        process_time = elapsed_ns / 1e9
         response.headers["X-Process-Time"] = str(process_time)
+        label = route_label(request.scope)
+        route = f"{request.method} {label}"
+        if trace is not None:
+            trace.route = label
+            tracer.finish(trace, response.status_code)
+            response.headers["Server-Timing"] = trace.server_timing()
+
+        slow_requests.record(route, elapsed_ns, lambda: _slow_request_details(request, response, trace))
+        metrics_history.record(route, elapsed_ns / 1e6, response.status_code)
+        profiler.on_request()
 
         await metrics_collector.record_request(
             path=request.url.path,
@@ -24,9 +56,6 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
         )
 
         if process_time > 1.0:
-            logger.warning(
-                f"Lentitud detectada en {request.url.path}: "
-                f"{process_time:.3f}s"
-            )
+            logger.warning("Lentitud detectada en %s: %.3fs", request.url.path, process_time)
 
         return response
\ No newline at end of file
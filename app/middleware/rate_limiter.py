@@ -1,8 +1,8 @@
-from fastapi import Request, HTTPException
+from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-import time
+from starlette.responses import JSONResponse
 from cache.redis_client import redis_client
+from monitoring.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,25 +21,13 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         endpoint = request.url.path
         key = f"rate_limit:{client_ip}:{endpoint}"
 
-        try:
-            current = await redis_client.connection.get(key)
-            if current is None:
-                await redis_client.connection.setex(key, self.window, 1)
-            else:
-                current_count = int(current)
-                if current_count >= self.max_requests:
-                    logger.warning(f"Rate limit excedido para {client_ip} en {endpoint}")
-                    raise HTTPException(
-                        status_code=429, 
-                        detail="Demasiadas solicitudes. Intente más tarde."
-                    )
-                await redis_client.connection.incr(key)
+        with span("rate_limit"):
+            current_count = await redis_client.incr_window(key, self.window)
+        if current_count is not None and current_count > self.max_requests:
+            logger.warning("Rate limit excedido para %s en %s", client_ip, endpoint)
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Demasiadas solicitudes. Intente más tarde."}
+            )
 
-            response = await call_next(request)
-            return response
-
-        except Exception as e:
-            if isinstance(e, HTTPException):
-                raise e
-            logger.error(f"Error en rate limiting: {e}")
-            return await call_next(request)
\ No newline at end of file
+        return await call_next(request)
\ No newline at end of file
@@ -10,10 +10,12 @@ from .optimized import (
     ClaseYogaResponse,
     ClaseConDisponibilidad,
     ReservaClase,
+    PosicionListaEspera,
     Instructor,
     NivelDificultad,
     TipoYoga
 )
+from .serializers import FastSerializer
 
 __all__ = [
     'ClaseYogaBase',
@@ -22,7 +24,9 @@ __all__ = [
     'ClaseYogaResponse',
     'ClaseConDisponibilidad',
     'ReservaClase',
+    'PosicionListaEspera',
     'Instructor',
     'NivelDificultad',
-    'TipoYoga'
+    'TipoYoga',
+    'FastSerializer'
 ]
\ No newline at end of file
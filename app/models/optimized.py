@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, conint
 from typing import Optional, List, Dict
 from datetime import datetime, time
 from enum import Enum
@@ -27,7 +27,7 @@ class ClaseYogaBase(BaseModel):
 
 class ClaseYogaCreate(ClaseYogaBase):
     horario: time
-    dias_semana: List[int] = Field(..., min_items=1, max_items=7)
+    dias_semana: List[conint(ge=1, le=7)] = Field(..., min_items=1, max_items=7)
 
 class ClaseYogaUpdate(BaseModel):
     nombre: Optional[str] = Field(None, max_length=100)
@@ -49,11 +49,18 @@ class ClaseYogaResponse(ClaseYogaBase):
         from_attributes = True
 
 class ReservaClase(BaseModel):
+    id: Optional[int] = None
     usuario_id: int
     clase_id: int
     fecha: datetime
     estado: str = "confirmada"
 
+class PosicionListaEspera(BaseModel):
+    clase_id: int
+    usuario_id: int
+    posicion: int
+    estado: str = "en_espera"
+
 class Instructor(BaseModel):
     id: int
     nombre: str
@@ -0,0 +1,120 @@
+"""
+Registros internos compactos para clases y reservas.
+Se guardan en memoria con __slots__ y se convierten a los modelos de la API
+solo al responder.
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from .optimized import ClaseYogaCreate, NivelDificultad, TipoYoga
+
+ESTADO_CONFIRMADA = sys.intern("confirmada")
+
+@dataclass(slots=True)
+class ClaseRecord:
+    id: int
+    nombre: str
+    descripcion: Optional[str]
+    instructor_id: int
+    tipo: TipoYoga
+    nivel: NivelDificultad
+    duracion_minutos: int
+    capacidad_maxima: int
+    precio: float
+    horario: str
+    dias_semana: Tuple[int, ...]
+    activa: bool
+    fecha_creacion: str
+    fecha_actualizacion: str
+
+    @classmethod
+    def from_create(cls, clase_id: int, clase: ClaseYogaCreate, timestamp: str) -> "ClaseRecord":
+        """Crear el registro a partir de datos ya validados"""
+        timestamp = sys.intern(timestamp)
+        return cls(
+            id=clase_id,
+            nombre=clase.nombre,
+            descripcion=clase.descripcion,
+            instructor_id=clase.instructor_id,
+            tipo=clase.tipo,
+            nivel=clase.nivel,
+            duracion_minutos=clase.duracion_minutos,
+            capacidad_maxima=clase.capacidad_maxima,
+            precio=clase.precio,
+            horario=sys.intern(clase.horario.isoformat()),
+            dias_semana=tuple(clase.dias_semana),
+            activa=True,
+            fecha_creacion=timestamp,
+            fecha_actualizacion=timestamp
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClaseRecord":
+        """Cargar un registro desde su forma serializada"""
+        return cls(
+            id=data["id"],
+            nombre=data["nombre"],
+            descripcion=data.get("descripcion"),
+            instructor_id=data["instructor_id"],
+            tipo=TipoYoga(data["tipo"]),
+            nivel=NivelDificultad(data["nivel"]),
+            duracion_minutos=data["duracion_minutos"],
+            capacidad_maxima=data["capacidad_maxima"],
+            precio=data["precio"],
+            horario=sys.intern(data["horario"]),
+            dias_semana=tuple(data["dias_semana"]),
+            activa=data["activa"],
+            fecha_creacion=sys.intern(data["fecha_creacion"]),
+            fecha_actualizacion=sys.intern(data["fecha_actualizacion"])
+        )
+
+    def apply_update(self, changes: Dict[str, Any], timestamp: str):
+        """Aplicar cambios parciales validados por ClaseYogaUpdate"""
+        for field, value in changes.items():
+            setattr(self, field, value)
+        self.fecha_actualizacion = sys.intern(timestamp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma de ClaseYogaResponse"""
+        return {
+            "id": self.id,
+            "nombre": self.nombre,
+            "descripcion": self.descripcion,
+            "instructor_id": self.instructor_id,
+            "tipo": self.tipo.value,
+            "nivel": self.nivel.value,
+            "duracion_minutos": self.duracion_minutos,
+            "capacidad_maxima": self.capacidad_maxima,
+            "precio": self.precio,
+            "horario": self.horario,
+            "dias_semana": self.dias_semana,
+            "activa": self.activa,
+            "fecha_creacion": self.fecha_creacion,
+            "fecha_actualizacion": self.fecha_actualizacion
+        }
+
+    def to_api(self, cupos_disponibles: int, instructor: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Forma de ClaseConDisponibilidad; el instructor se comparte, no se copia"""
+        data = self.to_dict()
+        data["cupos_disponibles"] = cupos_disponibles
+        data["instructor"] = instructor
+        return data
+
+@dataclass(slots=True)
+class ReservaRecord:
+    id: int
+    usuario_id: int
+    clase_id: int
+    fecha: str
+    estado: str = ESTADO_CONFIRMADA
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma de ReservaClase"""
+        return {
+            "id": self.id,
+            "usuario_id": self.usuario_id,
+            "clase_id": self.clase_id,
+            "fecha": self.fecha,
+            "estado": self.estado
+        }
\ No newline at end of file
@@ -0,0 +1,40 @@
+import os
+from typing import Any, Type
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from starlette.responses import Response
+from monitoring.tracing import span
+
+def debug_validation_enabled() -> bool:
+    """En modo debug las respuestas se validan completas contra el modelo"""
+    return os.getenv("API_DEBUG", "false") == "true"
+
+class FastSerializer:
+    """
+    Serializador precompilado para respuestas de la API.
+
+    Los datos internos ya se validaron al escribirse (ClaseYogaCreate /
+    ClaseYogaUpdate), así que por defecto se codifican directo a bytes JSON
+    sin volver a construir modelos. Con API_DEBUG=true se valida contra el
+    modelo de respuesta con un TypeAdapter compilado una sola vez.
+    """
+
+    def __init__(self, response_type: Type[Any]):
+        self.adapter = TypeAdapter(response_type)
+
+    def dump_json(self, data: Any, validate: bool = None) -> bytes:
+        """Codificar datos internos a bytes JSON"""
+        if validate is None:
+            validate = debug_validation_enabled()
+        with span("serialize"):
+            if validate:
+                return self.adapter.dump_json(self.adapter.validate_python(data))
+            return to_json(data)
+
+    def response(self, data: Any, status_code: int = 200) -> Response:
+        """Respuesta HTTP con el cuerpo ya serializado"""
+        return Response(
+            content=self.dump_json(data),
+            status_code=status_code,
+            media_type="application/json"
+        )
\ No newline at end of file
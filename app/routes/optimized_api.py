@@ -1,61 +1,121 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
+from fastapi.responses import JSONResponse
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import replace
+from datetime import datetime, time, timedelta, timezone
+from itertools import product
 from models.optimized import (
     ClaseYogaCreate, 
     ClaseYogaResponse, 
     ClaseYogaUpdate,
     ClaseConDisponibilidad,
     ReservaClase,
+    PosicionListaEspera,
     TipoYoga,
     NivelDificultad
 )
+from models.records import ClaseRecord, ReservaRecord
+from models.serializers import FastSerializer
 from cache.cache_manager import cache_manager
+from indexes.schedule import schedule_index
+from indexes.reservations import reservation_index
+from indexes.search import search_index
+from indexes.availability import availability_index, week_minute
+from services.waitlist import waitlist_manager
+from services.change_feed import Change, OP_DELETE, OP_UPSERT, ReplicationConflict, change_feed
+from services.journal import journal
 from monitoring.metrics_collector import metrics_collector
+from monitoring.tracing import TimedRoute, tracer
+from monitoring.loop_monitor import loop_monitor
+from monitoring.timeseries import metrics_history
 import logging
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-clases_db = {}
-reservas_db = {}
+clases_db: Dict[int, ClaseRecord] = {}
+reservas_db: Dict[int, ReservaRecord] = {}
 instructores_db = {
     1: {"id": 1, "nombre": "Ana García", "especialidades": ["hatha", "restaurativo"], "experiencia_anios": 5, "calificacion": 4.8},
     2: {"id": 2, "nombre": "Carlos López", "especialidades": ["vinyasa", "ashtanga"], "experiencia_anios": 7, "calificacion": 4.9}
 }
 
+# Próximo id candidato; journal.next_id lo lleva al primero que le toca a este worker
 class_id_counter = 1
+reserva_id_counter = 1
+
+# Una versión replicada con el mismo id pero otros valores en estos campos es otra clase
+CAMPOS_IDENTIDAD_CLASE = ("instructor_id", "tipo", "nivel", "horario", "dias_semana")
+
+listado_serializer = FastSerializer(List[ClaseConDisponibilidad])
+detalle_serializer = FastSerializer(ClaseConDisponibilidad)
+
+def _cupos_disponibles(clase: ClaseRecord) -> int:
+    return clase.capacidad_maxima - reservation_index.count(clase.id)
+
+def _actualizar_disponibilidad(clase: Optional[ClaseRecord]):
+    """Reubicar la clase en la vista de disponibilidad tras cambiar ella o sus reservas"""
+    if clase is None:
+        return
+    if clase.activa:
+        availability_index.update(clase.id, _cupos_disponibles(clase), clase.horario, clase.dias_semana)
+    else:
+        availability_index.remove(clase.id)
+
+def _campos_busqueda(clase: ClaseRecord) -> Dict[str, Optional[str]]:
+    """Texto indexado para la búsqueda: nombre, descripción e instructor"""
+    instructor = instructores_db.get(clase.instructor_id)
+    return {
+        "nombre": clase.nombre,
+        "descripcion": clase.descripcion,
+        "instructor": instructor["nombre"] if instructor else None
+    }
+
+def _con_disponibilidad(clase: ClaseRecord) -> dict:
+    """Clase en forma de API con cupos disponibles e instructor"""
+    return clase.to_api(_cupos_disponibles(clase), instructores_db.get(clase.instructor_id))
 
 @router.post("/clases", response_model=ClaseYogaResponse)
-@cache_manager.cached(expire=300)
 async def crear_clase(clase: ClaseYogaCreate):
     """Crear nueva clase de yoga"""
     global class_id_counter
     
     try:
-        clase_id = class_id_counter
-        clase_data = {
-            **clase.dict(),
-            "id": clase_id,
-            "activa": True,
-            "fecha_creacion": "2024-01-01T00:00:00",
-            "fecha_actualizacion": "2024-01-01T00:00:00"
-        }
-        
-        clases_db[clase_id] = clase_data
-        class_id_counter += 1
-
-        await cache_manager.invalidate_pattern("listar_clases")
+        if clase.instructor_id not in instructores_db:
+            raise HTTPException(status_code=400, detail="Instructor no encontrado")
+
+        # El id se toma antes del await del journal para que dos altas
+        # concurrentes no lo compartan; si el journal falla solo queda un hueco
+        clase_id = journal.next_id(class_id_counter)
+        class_id_counter = clase_id + 1
+        registro = ClaseRecord.from_create(clase_id, clase, "2024-01-01T00:00:00")
+        async with journal.record("clase", clase_id, OP_UPSERT, registro.to_dict()) as version:
+            try:
+                schedule_index.add(clase_id, registro.horario, registro.dias_semana)
+                search_index.add(clase_id, _campos_busqueda(registro))
+                _actualizar_disponibilidad(registro)
+            except Exception:
+                schedule_index.remove(clase_id)
+                search_index.remove(clase_id)
+                availability_index.remove(clase_id)
+                raise
+            clases_db[clase_id] = registro
+
+        await _invalidar_clase(registro)
+        await _publicar_cambio("clase", clase_id, data=registro.to_dict(), version=version)
         
         await metrics_collector.record_event("clase_creada", {"clase_id": clase_id})
-        return clase_data
+        return registro.to_dict()
 
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error creando clase: {e}")
+        logger.error("Error creando clase: %s", e)
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 @router.get("/clases", response_model=List[ClaseConDisponibilidad])
-@cache_manager.cached(expire=180)
+@cache_manager.cached(expire=180, min_expire=15, max_expire=900)
 async def listar_clases(
     tipo: Optional[TipoYoga] = Query(None),
     nivel: Optional[NivelDificultad] = Query(None),
@@ -66,54 +126,121 @@ async def listar_clases(
     try:
         clases_filtradas = []
         for clase in clases_db.values():
-            if tipo and clase["tipo"] != tipo:
+            if tipo and clase.tipo is not tipo:
                 continue
-            if nivel and clase["nivel"] != nivel:
+            if nivel and clase.nivel is not nivel:
                 continue
-            if instructor_id and clase["instructor_id"] != instructor_id:
+            if instructor_id and clase.instructor_id != instructor_id:
                 continue
-            if clase["activa"] != activa:
+            if clase.activa != activa:
                 continue
 
-            reservas_count = sum(1 for r in reservas_db.values() if r["clase_id"] == clase["id"])
-            cupos_disponibles = clase["capacidad_maxima"] - reservas_count
+            clases_filtradas.append(_con_disponibilidad(clase))
 
-            instructor = instructores_db.get(clase["instructor_id"])
+        await metrics_collector.record_event("clases_listadas", {"count": len(clases_filtradas)})
+        return listado_serializer.response(clases_filtradas)
 
-            clases_filtradas.append({
-                **clase,
-                "cupos_disponibles": cupos_disponibles,
-                "instructor": instructor
-            })
+    except Exception as e:
+        logger.error("Error listando clases: %s", e)
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-        await metrics_collector.record_event("clases_listadas", {"count": len(clases_filtradas)})
-        return clases_filtradas
+@router.get("/clases/buscar", response_model=List[ClaseConDisponibilidad])
+async def buscar_clases(
+    q: str = Query(..., min_length=1, max_length=100),
+    tipo: Optional[TipoYoga] = Query(None),
+    nivel: Optional[NivelDificultad] = Query(None),
+    activa: bool = Query(True),
+    limite: int = Query(20, ge=1, le=100)
+):
+    """Buscar por palabras del nombre, descripción o instructor; resultados por relevancia"""
+    try:
+        clases = []
+        for clase_id, _ in search_index.search(q):
+            clase = clases_db.get(clase_id)
+            if clase is None or clase.activa != activa:
+                continue
+            if tipo and clase.tipo is not tipo:
+                continue
+            if nivel and clase.nivel is not nivel:
+                continue
+            clases.append(_con_disponibilidad(clase))
+            if len(clases) >= limite:
+                break
+
+        return listado_serializer.response(clases)
 
     except Exception as e:
-        logger.error(f"Error listando clases: {e}")
+        logger.error("Error buscando clases: %s", e)
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@router.get("/clases/disponibles", response_model=List[ClaseConDisponibilidad])
+async def clases_disponibles(
+    orden: str = Query("proximas", pattern="^(proximas|cupos)$"),
+    limite: int = Query(10, ge=1, le=100),
+    dia: Optional[int] = Query(None, ge=1, le=7, description="Día de referencia (1=lunes); por defecto hoy"),
+    desde: Optional[time] = Query(None, description="Hora de referencia; por defecto ahora")
+):
+    """Clases activas con cupos, las próximas primero o las de más cupos, desde la vista materializada"""
+    if orden == "cupos":
+        clase_ids = [clase_id for clase_id, _ in availability_index.most_spots(limite)]
+    else:
+        ahora = datetime.now()
+        dia = dia or ahora.isoweekday()
+        desde = desde or ahora.time()
+        clase_ids = availability_index.soonest(week_minute(dia, desde.hour * 60 + desde.minute), limite)
+
+    return listado_serializer.response([_con_disponibilidad(clases_db[clase_id]) for clase_id in clase_ids])
+
 @router.get("/clases/{clase_id}", response_model=ClaseConDisponibilidad)
-@cache_manager.cached(expire=240, key_prefix="clase_detalle")
+@cache_manager.cached(expire=240, key_prefix="clase_detalle", min_expire=30, max_expire=1800)
 async def obtener_clase(clase_id: int):
     """Obtener detalle de una clase específica"""
     try:
         if clase_id not in clases_db:
             raise HTTPException(status_code=404, detail="Clase no encontrada")
 
-        clase = clases_db[clase_id]
-        
-        reservas_count = sum(1 for r in reservas_db.values() if r["clase_id"] == clase_id)
-        cupos_disponibles = clase["capacidad_maxima"] - reservas_count
-        
-        instructor = instructores_db.get(clase["instructor_id"])
-
-        return {**clase, "cupos_disponibles": cupos_disponibles, "instructor": instructor}
+        return detalle_serializer.response(_con_disponibilidad(clases_db[clase_id]))
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error obteniendo clase: {e}")
+        logger.error("Error obteniendo clase: %s", e)
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@router.get("/horario", response_model=List[ClaseConDisponibilidad])
+@cache_manager.cached(expire=120, key_prefix="horario", min_expire=15, max_expire=900)
+async def consultar_horario(
+    dia: int = Query(..., ge=1, le=7, description="Día de la semana (1=lunes)"),
+    desde: time = Query(time(0, 0)),
+    hasta: time = Query(time(23, 59)),
+    tipo: Optional[TipoYoga] = Query(None),
+    nivel: Optional[NivelDificultad] = Query(None),
+    con_cupos: bool = Query(True)
+):
+    """Clases que empiezan en una ventana horaria de un día, ordenadas por hora"""
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="Ventana horaria inválida")
+
+    try:
+        clases = []
+        for clase_id in schedule_index.query(dia, desde.hour * 60 + desde.minute, hasta.hour * 60 + hasta.minute):
+            clase = clases_db.get(clase_id)
+            if clase is None or not clase.activa:
+                continue
+            if tipo and clase.tipo is not tipo:
+                continue
+            if nivel and clase.nivel is not nivel:
+                continue
+
+            data = _con_disponibilidad(clase)
+            if con_cupos and data["cupos_disponibles"] <= 0:
+                continue
+            clases.append(data)
+
+        return listado_serializer.response(clases)
+
+    except Exception as e:
+        logger.error("Error consultando horario: %s", e)
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 @router.put("/clases/{clase_id}", response_model=ClaseYogaResponse)
@@ -123,66 +250,361 @@ async def actualizar_clase(clase_id: int, clase_update: ClaseYogaUpdate):
         if clase_id not in clases_db:
             raise HTTPException(status_code=404, detail="Clase no encontrada")
 
-        update_data = clase_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            clases_db[clase_id][field] = value
-
-        clases_db[clase_id]["fecha_actualizacion"] = "2024-01-01T00:00:00"
-
-        await cache_manager.invalidate_pattern("clase_detalle")
-        await cache_manager.invalidate_pattern("listar_clases")
+        update_data = clase_update.model_dump(exclude_unset=True)
+        registro = replace(clases_db[clase_id])
+        registro.apply_update(update_data, "2024-01-01T00:00:00")
+        async with journal.record("clase", clase_id, OP_UPSERT, registro.to_dict()) as version:
+            anterior = clases_db.get(clase_id)
+            if anterior is None:
+                raise HTTPException(status_code=404, detail="Clase no encontrada")
+            clases_db[clase_id] = registro
+            search_index.add(clase_id, _campos_busqueda(registro))
+            _actualizar_disponibilidad(registro)
+
+        await _invalidar_clase(anterior, registro)
+        await _publicar_cambio(
+            "clase", clase_id, fields=tuple(update_data), data=registro.to_dict(), version=version
+        )
+
+        if registro.capacidad_maxima > anterior.capacidad_maxima:
+            waitlist_manager.notify_capacity(clase_id)
 
         await metrics_collector.record_event("clase_actualizada", {"clase_id": clase_id})
-        return clases_db[clase_id]
+        return clases_db[clase_id].to_dict()
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error actualizando clase: {e}")
+        logger.error("Error actualizando clase: %s", e)
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+async def _invalidar_clase(*versiones: ClaseRecord):
+    """
+    Invalidar solo las entradas de cache cuyo resultado incluye esta clase.
+    Si se pasan la versión anterior y la nueva se cubren ambos conjuntos de
+    filtros, por ejemplo cuando la clase se activa o desactiva.
+    """
+    keys = {obtener_clase.cache_key(clase_id=clase.id) for clase in versiones}
+    dias = set()
+    for clase in versiones:
+        for tipo, nivel, instructor_id in product(
+            (None, clase.tipo), (None, clase.nivel), (None, clase.instructor_id)
+        ):
+            keys.add(listar_clases.cache_key(
+                tipo=tipo, nivel=nivel, instructor_id=instructor_id, activa=clase.activa
+            ))
+        dias.update(clase.dias_semana)
+    await cache_manager.invalidate(
+        keys=keys,
+        patterns=(consultar_horario.cache_pattern(dia=dia) for dia in sorted(dias))
+    )
+
+async def _publicar_cambio(
+    entity: str,
+    entity_id: int,
+    op: str = OP_UPSERT,
+    fields: Tuple[str, ...] = (),
+    data: Optional[Dict] = None,
+    version: Optional[Tuple] = None
+):
+    """
+    Avisar a los demás workers de una mutación ya aplicada. El journal se
+    escribe antes de aplicarla: si el fsync falla la petición responde 500
+    sin haber cambiado nada, y el reintento del cliente no la duplica.
+    """
+    await change_feed.publish(entity, entity_id, op=op, fields=fields, data=data, version=version)
+
+def aplicar_registro(entity: str, entity_id: int, op: str, data: Optional[Dict]) -> List[ClaseRecord]:
+    """
+    Aplicar una mutación al estado en memoria y sus índices. Es idempotente
+    y devuelve las versiones de clase afectadas, para invalidar su cache.
+    Si el id ya es de otro registro (otra clase u otra reserva) no lo pisa y
+    lanza ReplicationConflict.
+    """
+    global class_id_counter, reserva_id_counter
+
+    if entity == "espera":
+        if op == OP_DELETE:
+            waitlist_manager.remove(entity_id, data["usuario_id"])
+        else:
+            waitlist_manager.enqueue(entity_id, data["usuario_id"])
+        return []
+
+    if entity == "clase":
+        if op == OP_DELETE:
+            anterior = clases_db.pop(entity_id, None)
+            schedule_index.remove(entity_id)
+            search_index.remove(entity_id)
+            availability_index.remove(entity_id)
+            return [anterior] if anterior is not None else []
+        registro = ClaseRecord.from_dict(data)
+        anterior = clases_db.get(entity_id)
+        if anterior is not None and any(
+            getattr(anterior, campo) != getattr(registro, campo) for campo in CAMPOS_IDENTIDAD_CLASE
+        ):
+            raise ReplicationConflict(f"La clase {entity_id} ya existe con otro instructor, tipo u horario")
+        clases_db[registro.id] = registro
+        schedule_index.add(registro.id, registro.horario, registro.dias_semana)
+        search_index.add(registro.id, _campos_busqueda(registro))
+        _actualizar_disponibilidad(registro)
+        class_id_counter = max(class_id_counter, registro.id + 1)
+        return [c for c in (anterior, registro) if c is not None]
+
+    if op == OP_DELETE:
+        reserva = reservas_db.pop(entity_id, None)
+        if reserva is None:
+            return []
+        reservation_index.remove(reserva.id, reserva.usuario_id, reserva.clase_id)
+    else:
+        existente = reservas_db.get(entity_id)
+        if existente is not None:
+            if (existente.usuario_id, existente.clase_id) != (data["usuario_id"], data["clase_id"]):
+                raise ReplicationConflict(f"La reserva {entity_id} ya existe para otro usuario o clase")
+            return []
+        reserva = ReservaRecord(**data)
+        reservas_db[reserva.id] = reserva
+        reservation_index.add(reserva.id, reserva.usuario_id, reserva.clase_id)
+        reserva_id_counter = max(reserva_id_counter, reserva.id + 1)
+    clase = clases_db.get(reserva.clase_id)
+    _actualizar_disponibilidad(clase)
+    return [clase] if clase is not None else []
+
+async def aplicar_cambio(change: Change):
+    """
+    Aplicar una mutación hecha en otro worker e invalidar solo su clase. Un
+    cambio más viejo que el último aplicado a la entidad ya está superado.
+    Una cancelación o una clase modificada pueden liberar cupos para la
+    lista de espera de este worker.
+    """
+    if not journal.accept(change.entity, change.entity_id, change.version):
+        return
+    versiones = aplicar_registro(change.entity, change.entity_id, change.op, change.data)
+    if versiones:
+        await _invalidar_clase(*versiones)
+        if change.op == OP_DELETE or change.entity == "clase":
+            waitlist_manager.notify_capacity(versiones[-1].id)
+
+def exportar_estado() -> Dict:
+    """Estado en memoria en la forma JSON de los registros, para el snapshot"""
+    return {
+        "clase": [clase.to_dict() for clase in clases_db.values()],
+        "reserva": [reserva.to_dict() for reserva in reservas_db.values()],
+        "contadores": {"clase": class_id_counter, "reserva": reserva_id_counter},
+        "feed": change_feed.last_id,
+        "espera": waitlist_manager.export_state()
+    }
+
+def cargar_estado(estado: Dict):
+    """Reemplazar el estado en memoria por el de un snapshot y reconstruir índices"""
+    global class_id_counter, reserva_id_counter
+
+    clases_db.clear()
+    clases_db.update((row["id"], ClaseRecord.from_dict(row)) for row in estado["clase"])
+    reservas_db.clear()
+    reservas_db.update((row["id"], ReservaRecord(**row)) for row in estado["reserva"])
+    class_id_counter = estado["contadores"]["clase"]
+    reserva_id_counter = estado["contadores"]["reserva"]
+    change_feed.last_id = estado.get("feed", "0-0")
+    waitlist_manager.restore(estado.get("espera", ()))
+    schedule_index.rebuild(clases_db.values())
+    search_index.rebuild((clase.id, _campos_busqueda(clase)) for clase in clases_db.values())
+    reservation_index.rebuild(reservas_db.values())
+    availability_index.rebuild(
+        (clase.id, _cupos_disponibles(clase), clase.horario, clase.dias_semana)
+        for clase in clases_db.values() if clase.activa
+    )
+
+async def _crear_reserva(clase_id: int, usuario_id: int) -> ReservaRecord:
+    """
+    Registrar la reserva e invalidar las vistas de la clase. El cupo se
+    ocupa antes del await del journal, para que nadie más lo tome mientras
+    tanto; si el journal falla se devuelve y no queda nada aplicado.
+    """
+    global reserva_id_counter
+
+    reserva = ReservaRecord(
+        id=journal.next_id(reserva_id_counter),
+        usuario_id=usuario_id,
+        clase_id=clase_id,
+        fecha="2024-01-01T00:00:00"
+    )
+    reservas_db[reserva.id] = reserva
+    reservation_index.add(reserva.id, usuario_id, clase_id)
+    reserva_id_counter = reserva.id + 1
+    _actualizar_disponibilidad(clases_db[clase_id])
+    try:
+        version = await journal.append("reserva", reserva.id, OP_UPSERT, reserva.to_dict())
+    except Exception:
+        reservas_db.pop(reserva.id, None)
+        reservation_index.remove(reserva.id, usuario_id, clase_id)
+        _actualizar_disponibilidad(clases_db.get(clase_id))
+        waitlist_manager.notify_capacity(clase_id)
+        raise
+
+    await _invalidar_clase(clases_db[clase_id])
+    await _publicar_cambio("reserva", reserva.id, data=reserva.to_dict(), version=version)
+
+    await metrics_collector.record_event("reserva_creada", {
+        "clase_id": clase_id,
+        "usuario_id": usuario_id
+    })
+    return reserva
+
+async def promover_lista_espera(clase_id: int) -> int:
+    """
+    Convertir esperas en reservas mientras haya cupos libres. Los cupos se
+    vuelven a contar en cada vuelta: _crear_reserva ocupa el cupo antes de
+    su primer await, pero entre vueltas otra petición puede haber tomado uno.
+    El usuario sale de la lista recién con la reserva hecha: si falla, sigue
+    primero para el próximo intento.
+    """
+    promovidos = 0
+    while True:
+        clase = clases_db.get(clase_id)
+        if clase is None or not clase.activa or _cupos_disponibles(clase) <= 0:
+            break
+        usuario_id = waitlist_manager.peek(clase_id)
+        if usuario_id is None:
+            break
+        await _crear_reserva(clase_id, usuario_id)
+        waitlist_manager.remove(clase_id, usuario_id)
+        try:
+            await journal.append("espera", clase_id, OP_DELETE, {"usuario_id": usuario_id})
+        except Exception as e:
+            logger.error("No se pudo registrar la salida de %s de la espera de la clase %s: %s", usuario_id, clase_id, e)
+        await metrics_collector.record_event("lista_espera_promocion", {
+            "clase_id": clase_id,
+            "usuario_id": usuario_id
+        })
+        promovidos += 1
+    return promovidos
+
 @router.post("/clases/{clase_id}/reservar", response_model=ReservaClase)
-async def reservar_clase(clase_id: int, usuario_id: int):
-    """Reservar una clase para un usuario"""
+async def reservar_clase(clase_id: int, usuario_id: int, lista_espera: bool = Query(False)):
+    """
+    Reservar una clase para un usuario. Si la clase está llena, o ya hay
+    usuarios esperando un cupo, y se pide `lista_espera`, el usuario queda
+    en cola (202) en lugar de reintentar; los cupos que se liberan son de
+    la lista de espera en orden de llegada.
+    """
     try:
         if clase_id not in clases_db:
             raise HTTPException(status_code=404, detail="Clase no encontrada")
 
         clase = clases_db[clase_id]
-        if not clase["activa"]:
+        if not clase.activa:
             raise HTTPException(status_code=400, detail="Clase no disponible")
 
-        reservas_count = sum(1 for r in reservas_db.values() if r["clase_id"] == clase_id)
-        if reservas_count >= clase["capacidad_maxima"]:
-            raise HTTPException(status_code=400, detail="Clase llena")
-
-        reserva_id = len(reservas_db) + 1
-        reserva = {
-            "id": reserva_id,
-            "usuario_id": usuario_id,
-            "clase_id": clase_id,
-            "fecha": "2024-01-01T00:00:00",
-            "estado": "confirmada"
-        }
-        reservas_db[reserva_id] = reserva
+        en_espera = waitlist_manager.size(clase_id)
+        if en_espera:
+            waitlist_manager.notify_capacity(clase_id)
+        if en_espera or _cupos_disponibles(clase) <= 0:
+            if not lista_espera:
+                raise HTTPException(status_code=400, detail="Clase llena")
+            posicion = waitlist_manager.position(clase_id, usuario_id)
+            if posicion is None:
+                async with journal.record("espera", clase_id, OP_UPSERT, {"usuario_id": usuario_id}):
+                    posicion = waitlist_manager.enqueue(clase_id, usuario_id)
+            return JSONResponse(
+                status_code=202,
+                content=PosicionListaEspera(
+                    clase_id=clase_id, usuario_id=usuario_id, posicion=posicion
+                ).model_dump()
+            )
+
+        reserva = await _crear_reserva(clase_id, usuario_id)
+        return reserva.to_dict()
 
-        await cache_manager.invalidate_pattern("clase_detalle")
-        await cache_manager.invalidate_pattern("listar_clases")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creando reserva: %s", e)
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-        await metrics_collector.record_event("reserva_creada", {
-            "clase_id": clase_id,
-            "usuario_id": usuario_id
+@router.delete("/reservas/{reserva_id}", response_model=ReservaClase)
+async def cancelar_reserva(reserva_id: int):
+    """Cancelar una reserva y liberar el cupo"""
+    try:
+        if reserva_id not in reservas_db:
+            raise HTTPException(status_code=404, detail="Reserva no encontrada")
+        async with journal.record("reserva", reserva_id, OP_DELETE) as version:
+            # Otra cancelación de la misma reserva pudo ganar durante el await
+            reserva = reservas_db.pop(reserva_id, None)
+            if reserva is None:
+                raise HTTPException(status_code=404, detail="Reserva no encontrada")
+            reservation_index.remove(reserva.id, reserva.usuario_id, reserva.clase_id)
+            reserva.estado = "cancelada"
+        await _publicar_cambio("reserva", reserva.id, op=OP_DELETE, version=version)
+
+        clase = clases_db.get(reserva.clase_id)
+        _actualizar_disponibilidad(clase)
+        if clase is not None:
+            await _invalidar_clase(clase)
+            waitlist_manager.notify_capacity(clase.id)
+
+        await metrics_collector.record_event("reserva_cancelada", {
+            "clase_id": reserva.clase_id,
+            "usuario_id": reserva.usuario_id
         })
-
-        return reserva
+        return reserva.to_dict()
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creando reserva: {e}")
+        logger.error("Error cancelando reserva: %s", e)
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
+@router.get("/usuarios/{usuario_id}/reservas", response_model=List[ReservaClase])
+async def listar_reservas_usuario(usuario_id: int):
+    """Reservas de un usuario, desde el índice por usuario"""
+    return [reservas_db[reserva_id].to_dict() for reserva_id in reservation_index.of_user(usuario_id)]
+
+@router.get("/clases/{clase_id}/lista-espera/{usuario_id}", response_model=PosicionListaEspera)
+async def consultar_lista_espera(clase_id: int, usuario_id: int):
+    """Posición de un usuario en la lista de espera de una clase"""
+    posicion = waitlist_manager.position(clase_id, usuario_id)
+    if posicion is None:
+        raise HTTPException(status_code=404, detail="Usuario no está en lista de espera")
+    return PosicionListaEspera(clase_id=clase_id, usuario_id=usuario_id, posicion=posicion)
+
+def warmup_calls() -> List[Tuple[Callable, Dict]]:
+    """Consultas a precalentar: listados más comunes y el detalle de cada clase"""
+    sin_filtros = {"tipo": None, "nivel": None, "instructor_id": None, "activa": True}
+    calls = [(listar_clases, sin_filtros)]
+    calls.extend((listar_clases, {**sin_filtros, "tipo": tipo}) for tipo in TipoYoga)
+    calls.extend((listar_clases, {**sin_filtros, "nivel": nivel}) for nivel in NivelDificultad)
+    calls.extend((obtener_clase, {"clase_id": clase_id}) for clase_id in list(clases_db))
+    return calls
+
 @router.get("/metrics/cache")
 async def get_cache_metrics():
     """Endpoint para métricas del cache"""
-    return await cache_manager.get_stats()
\ No newline at end of file
+    return await cache_manager.get_stats()
+
+@router.get("/metrics/timing")
+async def get_timing_metrics():
+    """Desglose de tiempos por ruta y tramo"""
+    return tracer.get_route_stats()
+
+@router.get("/metrics/event-loop")
+async def get_event_loop_metrics():
+    """Percentiles de lag del event loop y últimos bloqueos con su pila"""
+    return loop_monitor.get_stats()
+
+@router.get("/metrics/history")
+async def get_metrics_history(
+    desde: Optional[datetime] = Query(None, description="Inicio del rango (por defecto, 24 h antes de hasta)"),
+    hasta: Optional[datetime] = Query(None, description="Fin del rango (por defecto, ahora)"),
+    resolucion: Optional[str] = Query(None, pattern="^(1m|5m|1h)$"),
+    ruta: Optional[str] = Query(None, description='Ruta exacta, p. ej. "GET /api/v1/clases"'),
+    por_ruta: bool = Query(False)
+):
+    """Serie histórica de peticiones, errores y percentiles de latencia"""
+    hasta = hasta or datetime.now(timezone.utc)
+    desde = desde or hasta - timedelta(days=1)
+    inicio, fin = (
+        (d if d.tzinfo else d.replace(tzinfo=timezone.utc)).timestamp() for d in (desde, hasta)
+    )
+    if inicio >= fin:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+    return await metrics_history.query(inicio, fin, resolucion, ruta, por_ruta)
\ No newline at end of file
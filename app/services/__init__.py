@@ -0,0 +1,14 @@
+"""
+Servicios de dominio en segundo plano
+Procesos asíncronos asociados a clases y reservas
+"""
+
+from .waitlist import WaitlistManager, waitlist_manager
+from .change_feed import Change, ChangeFeed, change_feed
+from .journal import Journal, journal
+
+__all__ = [
+    'WaitlistManager', 'waitlist_manager',
+    'Change', 'ChangeFeed', 'change_feed',
+    'Journal', 'journal'
+]
\ No newline at end of file
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from cache.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+@dataclass(slots=True)
+class Change:
+    """
+    Cambio de una entidad: qué registro, qué campos y su nuevo estado. La
+    versión es la del journal (instante, slot, seq) y permite descartar un
+    cambio que llega después de otro más nuevo de la misma entidad.
+    """
+    entity: str
+    entity_id: int
+    op: str
+    fields: Tuple[str, ...]
+    data: Optional[Dict[str, Any]]
+    origin: str
+    version: Optional[List] = None
+
+    def to_fields(self) -> Dict[str, str]:
+        return {
+            "entity": self.entity,
+            "id": str(self.entity_id),
+            "op": self.op,
+            "fields": ",".join(self.fields),
+            "data": json.dumps(self.data),
+            "origin": self.origin,
+            "version": json.dumps(self.version)
+        }
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "Change":
+        return cls(
+            entity=fields["entity"],
+            entity_id=int(fields["id"]),
+            op=fields["op"],
+            fields=tuple(f for f in fields["fields"].split(",") if f),
+            data=json.loads(fields["data"]),
+            origin=fields["origin"],
+            version=json.loads(fields.get("version", "null"))
+        )
+
+class ReplicationConflict(Exception):
+    """Un cambio de otro worker choca con un registro local distinto del mismo id"""
+
+ChangeHandler = Callable[[Change], Awaitable[None]]
+
+class ChangeFeed:
+    """
+    Feed de cambios entre workers sobre un Redis Stream.
+
+    Cada mutación publica un Change; cada worker lee el stream y aplica los
+    cambios de los demás con el handler de la entidad, que actualiza su
+    estado e índices locales e invalida solo las claves de ese registro.
+    La lectura no bloquea en Redis para no ocupar el pool ni disparar el
+    circuit breaker por llamadas lentas; mientras los lotes vengan llenos
+    se sigue leyendo sin esperar `poll_interval`. `last_id` viaja en el
+    snapshot del journal, así al arrancar se retoma desde la posición que
+    refleja el estado cargado y no se pierden los cambios del medio.
+    """
+
+    def __init__(
+        self,
+        stream: str = None,
+        poll_interval: float = None,
+        maxlen: int = None,
+        batch_size: int = None
+    ):
+        self.stream = stream or os.getenv("CHANGE_FEED_STREAM", "yoga:changes")
+        self.poll_interval = poll_interval or float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "0.2"))
+        self.maxlen = maxlen or int(os.getenv("CHANGE_FEED_MAXLEN", "10000"))
+        self.batch_size = batch_size or int(os.getenv("CHANGE_FEED_BATCH_SIZE", "100"))
+        self.worker_id = uuid.uuid4().hex
+        self.handlers: Dict[str, ChangeHandler] = {}
+        self.last_id = "0-0"
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {"published": 0, "publish_failures": 0, "applied": 0, "apply_errors": 0, "conflicts": 0}
+
+    def subscribe(self, entity: str, handler: ChangeHandler):
+        """Registrar cómo aplicar los cambios de otra instancia para una entidad"""
+        self.handlers[entity] = handler
+
+    async def publish(
+        self,
+        entity: str,
+        entity_id: int,
+        op: str = OP_UPSERT,
+        fields: Tuple[str, ...] = (),
+        data: Optional[Dict[str, Any]] = None,
+        version: Optional[Tuple] = None
+    ) -> Change:
+        """Publicar un cambio ya aplicado localmente"""
+        change = Change(
+            entity, entity_id, op, tuple(fields), data, self.worker_id,
+            list(version) if version is not None else None
+        )
+        if await redis_client.xadd(self.stream, change.to_fields(), maxlen=self.maxlen):
+            self.stats["published"] += 1
+        else:
+            self.stats["publish_failures"] += 1
+        return change
+
+    async def poll(self) -> int:
+        """Aplicar los cambios nuevos de otros workers; devuelve cuántos se aplicaron"""
+        applied = 0
+        while True:
+            entries = await redis_client.xread(self.stream, self.last_id, count=self.batch_size)
+            for entry_id, fields in entries:
+                self.last_id = entry_id
+                try:
+                    change = Change.from_fields(fields)
+                    if change.origin == self.worker_id:
+                        continue
+                    handler = self.handlers.get(change.entity)
+                    if handler is None:
+                        continue
+                    await handler(change)
+                    applied += 1
+                except ReplicationConflict as e:
+                    self.stats["conflicts"] += 1
+                    logger.error("Conflicto aplicando cambio %s: %s", entry_id, e)
+                except Exception as e:
+                    self.stats["apply_errors"] += 1
+                    logger.error("Error aplicando cambio %s: %s", entry_id, e)
+            if len(entries) < self.batch_size:
+                break
+        self.stats["applied"] += applied
+        return applied
+
+    async def start(self):
+        """Consumir desde `last_id`, la posición que trajo el snapshot (o el inicio del stream)"""
+        self.is_running = True
+        self.task = asyncio.create_task(self._consume())
+        logger.info("Feed de cambios iniciado (worker=%s)", self.worker_id[:8])
+
+    async def stop(self):
+        """Detener el consumidor"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+        logger.info("Feed de cambios detenido")
+
+    async def _consume(self):
+        while self.is_running:
+            await asyncio.sleep(self.poll_interval)
+            await self.poll()
+
+    def get_stats(self) -> Dict:
+        return {"worker_id": self.worker_id, "last_id": self.last_id, **self.stats}
+
+change_feed = ChangeFeed()
\ No newline at end of file
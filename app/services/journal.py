@@ -0,0 +1,513 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic_core import from_json, to_json
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"YSNP"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct("<4sHQd")
+
+ExportState = Callable[[], Dict[str, Any]]
+ImportState = Callable[[Dict[str, Any]], None]
+ApplyEntry = Callable[[str, int, str, Optional[Dict]], Any]
+
+JournalEntry = Tuple[float, int, str, int, str, Optional[Dict], Path]
+# (instante, slot, seq): orden total de las mutaciones de todos los workers
+Version = Tuple[float, int, int]
+
+class Journal:
+    """
+    Journal append-only de mutaciones con snapshots.
+
+    Las entradas se acumulan en memoria y un único flusher las escribe con
+    un solo fsync por lote (group commit): las peticiones que llegan durante
+    un fsync salen juntas en el siguiente. Cada `snapshot_every` entradas se
+    guarda un snapshot y se rota el journal, de modo que el arranque carga
+    el snapshot y solo reaplica la cola. Reaplicar es idempotente,
+    así que una entrada ya incluida en el snapshot no rompe nada. Una
+    entrada cuenta como en vuelo desde que se escribe hasta que la ruta la
+    aplica, y el snapshot guarda el seq hasta el que el estado exportado
+    está completo, no el último escrito.
+
+    Cada proceso escribe en su propio directorio `worker-N`, tomado con un
+    flock que dura lo que el proceso: los workers no comparten archivo, seq
+    ni rotación. Al arrancar se carga el snapshot más reciente de cualquier
+    worker y se reaplican, en orden de tiempo, las entradas de todos los
+    workers posteriores a él (las de otros workers con `replay_grace`
+    segundos de margen, por lo que tarda en llegar un cambio por el feed).
+    Cada entidad recuerda la versión (instante, slot, seq) de la última
+    mutación aplicada durante ese margen: una entrada reaplicada o un cambio
+    del feed más viejo que ella se descarta, así una reserva cancelada en un
+    worker no revive con la alta reaplicada desde el journal de otro.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        flush_interval: float = None,
+        snapshot_every: int = None,
+        sync_commit: bool = None,
+        max_workers: int = None,
+        replay_grace: float = None
+    ):
+        self.root = Path(directory or os.getenv("JOURNAL_DIR", "data/journal"))
+        self.directory = self.root
+        self.max_workers = max_workers or int(os.getenv("JOURNAL_MAX_WORKERS", "64"))
+        self.replay_grace = (
+            replay_grace if replay_grace is not None
+            else float(os.getenv("JOURNAL_REPLAY_GRACE", "5"))
+        )
+        self.slot: Optional[int] = None
+        self._slot_lock = None
+        self.flush_interval = flush_interval or float(os.getenv("JOURNAL_FLUSH_INTERVAL", "0.05"))
+        self.snapshot_every = snapshot_every or int(os.getenv("JOURNAL_SNAPSHOT_EVERY", "5000"))
+        self.sync_commit = (
+            sync_commit if sync_commit is not None
+            else os.getenv("JOURNAL_SYNC_COMMIT", "true") == "true"
+        )
+        self.export_state: Optional[ExportState] = None
+        self.import_state: Optional[ImportState] = None
+        self.apply_entry: Optional[ApplyEntry] = None
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.versions: Dict[Tuple[str, int], Version] = {}
+        self._inflight: Set[int] = set()
+        self._pruned_at = time.monotonic()
+        self.file = None
+        self.pending: List[bytes] = []
+        self.waiters: List[asyncio.Future] = []
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self.stats = {
+            "entries": 0,
+            "batches": 0,
+            "snapshots": 0,
+            "write_errors": 0,
+            "cold_start_seconds": 0.0,
+            "snapshot_records": 0,
+            "replayed_entries": 0,
+            "stale_entries": 0,
+            "corrupt_entries": 0,
+            "replay_errors": 0
+        }
+
+    @property
+    def journal_path(self) -> Path:
+        return self.directory / "journal.log"
+
+    @property
+    def rotated_path(self) -> Path:
+        return self.directory / "journal.log.1"
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.directory / "snapshot.bin"
+
+    def _claim_slot(self):
+        """Tomar el primer directorio worker-N libre; sin fcntl (Windows) se usa worker-0"""
+        if self.slot is not None:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        for slot in range(self.max_workers):
+            lock = self._try_lock(slot)
+            if lock is None:
+                continue
+            self.slot, self._slot_lock = slot, lock
+            self.directory = self.root / f"worker-{slot}"
+            self.directory.mkdir(exist_ok=True)
+            return
+        raise RuntimeError(f"No hay journals libres en {self.root} (JOURNAL_MAX_WORKERS={self.max_workers})")
+
+    def _try_lock(self, slot: int):
+        lock = open(self.root / f"worker-{slot}.lock", "a")
+        if fcntl is None:
+            return lock
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def _release_slot(self):
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+        self._slot_lock = None
+        self.slot = None
+
+    @staticmethod
+    def _slot_of(directory: Path) -> int:
+        return int(directory.name.split("-", 1)[1])
+
+    def next_id(self, counter: int) -> int:
+        """
+        Primer id de este worker desde `counter`. Cada slot usa los ids
+        congruentes con él módulo max_workers, así dos workers nunca reparten
+        el mismo; sin journal o con JOURNAL_MAX_WORKERS=1 son correlativos.
+        """
+        if self.slot is None:
+            return counter
+        return counter + (self.slot - (counter - 1)) % self.max_workers
+
+    def _is_abandoned(self, directory: Path) -> bool:
+        """Un directorio de otro worker se puede reparar solo si ningún proceso lo tiene tomado"""
+        if fcntl is None:
+            return False
+        lock = self._try_lock(self._slot_of(directory))
+        if lock is None:
+            return False
+        lock.close()
+        return True
+
+    def bind(self, export_state: ExportState, import_state: ImportState, apply_entry: ApplyEntry):
+        """Registrar cómo exportar, cargar y reaplicar el estado en memoria"""
+        self.export_state = export_state
+        self.import_state = import_state
+        self.apply_entry = apply_entry
+
+    def load(self) -> Dict:
+        """Cargar el snapshot más reciente y reaplicar la cola de los journals de todos los workers"""
+        start = time.perf_counter()
+        self._claim_slot()
+        worker_dirs = sorted(path for path in self.root.glob("worker-*") if path.is_dir())
+
+        own_snapshot = self.snapshot_path
+        if own_snapshot.exists():
+            self.snapshot_seq = self._read_snapshot_header(own_snapshot)[0]
+            self.seq = self.snapshot_seq
+
+        headers = [
+            (self._read_snapshot_header(directory / "snapshot.bin"), directory)
+            for directory in worker_dirs if (directory / "snapshot.bin").exists()
+        ]
+        base_dir, base_seq, base_ts = None, 0, 0.0
+        if headers:
+            (base_seq, base_ts), base_dir = max(headers, key=lambda item: item[0][1])
+            snapshot = self._read_snapshot(base_dir / "snapshot.bin")
+            state = snapshot["state"]
+            self.import_state(state)
+            self.versions = {
+                (entity, entity_id): (ts, slot, seq)
+                for entity, entity_id, ts, slot, seq in snapshot["versions"]
+            }
+            self.stats["snapshot_records"] = sum(
+                len(rows) for rows in state.values() if isinstance(rows, list)
+            )
+
+        entries: List[JournalEntry] = []
+        for directory in worker_dirs:
+            repair = directory == self.directory or self._is_abandoned(directory)
+            for name in ("journal.log.1", "journal.log"):
+                path = directory / name
+                if path.exists():
+                    entries.extend(self._read_entries(path, repair))
+
+        pending = [
+            entry for entry in entries
+            if (entry[1] > base_seq if entry[6] == base_dir else entry[0] > base_ts - self.replay_grace)
+        ]
+        pending.sort(key=lambda entry: (entry[0], entry[1]))
+        replayed = 0
+        for ts, seq, entity, entity_id, op, data, directory in pending:
+            if not self.accept(entity, entity_id, (ts, self._slot_of(directory), seq)):
+                continue
+            try:
+                self.apply_entry(entity, entity_id, op, data)
+            except Exception as e:
+                self.stats["replay_errors"] += 1
+                logger.error("Entrada %s/%d del journal no aplicada: %s", directory.name, seq, e)
+                continue
+            replayed += 1
+        for entry in entries:
+            if entry[6] == self.directory:
+                self.seq = max(self.seq, entry[1])
+        self.stats["replayed_entries"] = replayed
+
+        self.stats["cold_start_seconds"] = round(time.perf_counter() - start, 4)
+        logger.info(
+            "Estado restaurado: %d registros del snapshot + %d entradas del journal en %ss",
+            self.stats["snapshot_records"], replayed, self.stats["cold_start_seconds"]
+        )
+        return self.get_status()
+
+    @staticmethod
+    def _read_snapshot_header(path: Path) -> Tuple[int, float]:
+        """(seq, instante) de un snapshot, sin cargar el estado"""
+        with open(path, "rb") as f:
+            magic, version, seq, ts = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot inválido en {path}")
+        return seq, ts
+
+    @staticmethod
+    def _read_snapshot(path: Path) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            f.seek(SNAPSHOT_HEADER.size)
+            return from_json(f.read())
+
+    def _read_entries(self, path: Path, repair: bool) -> List[JournalEntry]:
+        """
+        Entradas de un journal. Una línea ilegible en el medio se saltea sin
+        perder las siguientes; solo la cola a medias de una escritura
+        interrumpida se corta, y solo si `repair`.
+        """
+        entries = []
+        offset = 0
+        torn_at = None
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    torn_at = offset
+                    logger.warning("Journal %s/%s cortado en el byte %d", path.parent.name, path.name, offset)
+                    break
+                try:
+                    seq, ts, entity, entity_id, op, data = json.loads(line)
+                except ValueError:
+                    self.stats["corrupt_entries"] += 1
+                    logger.warning("Journal %s/%s: entrada ilegible en el byte %d", path.parent.name, path.name, offset)
+                else:
+                    entries.append((ts, seq, entity, entity_id, op, data, path.parent))
+                offset += len(line)
+        if repair and torn_at is not None:
+            os.truncate(path, torn_at)
+        return entries
+
+    def accept(self, entity: str, entity_id: int, version: Optional[Version]) -> bool:
+        """
+        Registrar `version` como la última de la entidad si es más nueva que
+        la que ya tiene; False si llega tarde y no se debe aplicar.
+        """
+        if version is None:
+            return True
+        key = (entity, entity_id)
+        version = tuple(version)
+        current = self.versions.get(key)
+        if current is not None and version <= current:
+            self.stats["stale_entries"] += 1
+            return False
+        self.versions[key] = version
+        return True
+
+    def _prune_versions(self, now: float):
+        """Olvidar las versiones más viejas que el margen de reaplicación"""
+        horizon = now - self.replay_grace
+        self.versions = {key: version for key, version in self.versions.items() if version[0] > horizon}
+        self._pruned_at = time.monotonic()
+
+    @asynccontextmanager
+    async def record(
+        self, entity: str, entity_id: int, op: str, data: Optional[Dict] = None
+    ) -> AsyncIterator[Optional[Version]]:
+        """
+        Escribir una mutación y aplicarla dentro del bloque. Con sync_commit
+        el bloque empieza después del fsync; hasta que termina la entrada está
+        en vuelo y ningún snapshot la da por incluida. Entrega la versión de
+        la mutación, o None si el journal está apagado.
+        """
+        if self.file is None:
+            yield None
+            return
+        self.seq += 1
+        seq = self.seq
+        version = (time.time(), self.slot or 0, seq)
+        self._inflight.add(seq)
+        try:
+            self.pending.append(
+                json.dumps([seq, version[0], entity, entity_id, op, data], separators=(",", ":")).encode() + b"\n"
+            )
+            if self.sync_commit:
+                future = asyncio.get_running_loop().create_future()
+                self.waiters.append(future)
+                self._wakeup.set()
+                await future
+            yield version
+            # La versión se registra ya aplicada, igual que la entrada en el snapshot
+            self.accept(entity, entity_id, version)
+        finally:
+            self._inflight.discard(seq)
+
+    async def append(
+        self, entity: str, entity_id: int, op: str, data: Optional[Dict] = None
+    ) -> Optional[Version]:
+        """Agregar una mutación ya aplicada en memoria; con sync_commit espera al fsync de su lote"""
+        async with self.record(entity, entity_id, op, data) as version:
+            return version
+
+    async def flush(self):
+        """Escribir y sincronizar las entradas pendientes en un solo lote"""
+        async with self._lock:
+            await self._flush()
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            await self.snapshot()
+        elif time.monotonic() - self._pruned_at > self.replay_grace:
+            self._prune_versions(time.time())
+
+    async def _flush(self):
+        """Escribir el lote pendiente; si falla, lo informa a quienes esperan y relanza"""
+        if not self.pending:
+            return
+        batch, self.pending = b"".join(self.pending), []
+        waiters, self.waiters = self.waiters, []
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except BaseException as e:
+            self.stats["write_errors"] += 1
+            logger.error("Error escribiendo el journal: %s", e)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            raise
+        self.stats["entries"] += batch.count(b"\n")
+        self.stats["batches"] += 1
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _fail_pending(self, error: BaseException):
+        """Descartar lo que no se llegó a escribir y avisar a quienes lo esperan"""
+        if self.sync_commit:
+            self.pending = []
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+
+    def _write(self, batch: bytes):
+        """Agregar el lote y sincronizarlo; si falla, el archivo vuelve a terminar en una línea completa"""
+        fd = self.file.fileno()
+        start = os.lseek(fd, 0, os.SEEK_END)
+        try:
+            view = memoryview(batch)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        except BaseException:
+            try:
+                os.ftruncate(fd, start)
+            except OSError as e:
+                logger.error("No se pudo descartar la escritura a medias del journal: %s", e)
+            raise
+
+    async def snapshot(self):
+        """Guardar el estado completo y descartar el journal que ya cubre"""
+        async with self._lock:
+            await self._flush()
+            state = self.export_state()
+            seq = min(self._inflight) - 1 if self._inflight else self.seq
+            ts = time.time()
+            self._prune_versions(ts)
+            payload = to_json({
+                "state": state,
+                "versions": [(*key, *version) for key, version in self.versions.items()]
+            })
+            self._rotate()
+            await asyncio.to_thread(self._write_snapshot, seq, ts, payload)
+            await asyncio.to_thread(self._trim_rotated, seq)
+            self.snapshot_seq = seq
+            self.stats["snapshots"] += 1
+
+    def _rotate(self):
+        """Apartar el journal actual; si quedó uno rotado sin snapshot, se concatena"""
+        self.file.close()
+        try:
+            if self.rotated_path.exists():
+                with open(self.rotated_path, "ab") as rotated:
+                    rotated.write(self.journal_path.read_bytes())
+                self.journal_path.unlink()
+            else:
+                os.replace(self.journal_path, self.rotated_path)
+        finally:
+            self.file = open(self.journal_path, "ab", buffering=0)
+
+    def _trim_rotated(self, seq: int):
+        """Dejar en el journal rotado solo las entradas que el snapshot no incluye"""
+        if not self.rotated_path.exists():
+            return
+        keep = [line for line in self.rotated_path.read_bytes().splitlines(keepends=True) if self._line_seq(line) > seq]
+        if not keep:
+            self.rotated_path.unlink()
+            return
+        tmp_path = self.rotated_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(keep))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.rotated_path)
+
+    @staticmethod
+    def _line_seq(line: bytes) -> int:
+        """Seq de una línea sin decodificarla entera; las ilegibles no se conservan"""
+        try:
+            return int(line[1:line.index(b",")])
+        except ValueError:
+            return 0
+
+    def _write_snapshot(self, seq: int, ts: float, payload: bytes):
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, seq, ts))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def start(self):
+        """Abrir el journal e iniciar el flusher"""
+        self._claim_slot()
+        self.file = open(self.journal_path, "ab", buffering=0)
+        self.is_running = True
+        self.task = asyncio.create_task(self._flusher())
+        logger.info("Journal iniciado (%s)", self.journal_path)
+
+    async def stop(self):
+        """Vaciar lo pendiente, dejar un snapshot y cerrar el journal"""
+        self.is_running = False
+        if self.task:
+            self._wakeup.set()
+            await self.task
+        if self.file is not None:
+            await self.snapshot()
+            self.file.close()
+            self.file = None
+        self._release_slot()
+        logger.info("Journal detenido")
+
+    async def _flusher(self):
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Error en el flusher del journal: %s", e)
+                self._fail_pending(e)
+
+    def get_status(self) -> Dict:
+        return {
+            "enabled": self.file is not None,
+            "worker_dir": str(self.directory),
+            "seq": self.seq,
+            "snapshot_seq": self.snapshot_seq,
+            **self.stats
+        }
+
+journal = Journal()
\ No newline at end of file
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Promoter = Callable[[int], Awaitable[int]]
+
+class ClassWaitlist:
+    """Cola FIFO de una clase con tickets crecientes para ubicar la posición en O(1)"""
+    __slots__ = ("queue", "tickets", "next_ticket")
+
+    def __init__(self):
+        self.queue: Deque[Tuple[int, int]] = deque()
+        self.tickets: Dict[int, int] = {}
+        self.next_ticket = 0
+
+    def position(self, usuario_id: int) -> Optional[int]:
+        ticket = self.tickets.get(usuario_id)
+        if ticket is None:
+            return None
+        return ticket - self.queue[0][0] + 1
+
+class WaitlistManager:
+    """
+    Listas de espera por clase y worker que promueve a los usuarios en
+    espera cuando se libera capacidad.
+
+    Las listas viven en el proceso: las rutas las escriben en el journal y
+    entran en el snapshot, así que sobreviven a un reinicio, pero no se
+    replican por el feed. Con un solo worker son exactas; con varios, cada
+    worker promueve solo a quienes esperaron en él, las posiciones son por
+    worker y al reiniciar se recuperan las del snapshot más reciente, que
+    puede ser de otro. Si se usa la lista de espera, conviene un worker.
+    """
+
+    def __init__(self):
+        self.waitlists: Dict[int, ClassWaitlist] = {}
+        self.promoter: Optional[Promoter] = None
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self._signals: "asyncio.Queue[int]" = asyncio.Queue()
+        self._pending: Set[int] = set()
+        self.promoted_total = 0
+
+    def set_promoter(self, promoter: Promoter):
+        """Registrar la función que convierte esperas en reservas"""
+        self.promoter = promoter
+
+    def enqueue(self, clase_id: int, usuario_id: int) -> int:
+        """Agregar un usuario a la lista (idempotente) y devolver su posición"""
+        waitlist = self.waitlists.setdefault(clase_id, ClassWaitlist())
+        position = waitlist.position(usuario_id)
+        if position is not None:
+            return position
+
+        waitlist.tickets[usuario_id] = waitlist.next_ticket
+        waitlist.queue.append((waitlist.next_ticket, usuario_id))
+        waitlist.next_ticket += 1
+        return waitlist.position(usuario_id)
+
+    def position(self, clase_id: int, usuario_id: int) -> Optional[int]:
+        """Posición actual del usuario (1 = siguiente en ser promovido)"""
+        waitlist = self.waitlists.get(clase_id)
+        return waitlist.position(usuario_id) if waitlist else None
+
+    def peek(self, clase_id: int) -> Optional[int]:
+        """Primer usuario en espera, sin sacarlo"""
+        waitlist = self.waitlists.get(clase_id)
+        return waitlist.queue[0][1] if waitlist and waitlist.queue else None
+
+    def remove(self, clase_id: int, usuario_id: int) -> bool:
+        """Sacar a un usuario de la lista; fuera de la cabeza renumera los tickets"""
+        waitlist = self.waitlists.get(clase_id)
+        if not waitlist or usuario_id not in waitlist.tickets:
+            return False
+        if waitlist.queue[0][1] == usuario_id:
+            self.pop(clase_id)
+            return True
+        del self.waitlists[clase_id]
+        for _, restante in waitlist.queue:
+            if restante != usuario_id:
+                self.enqueue(clase_id, restante)
+        return True
+
+    def pop(self, clase_id: int) -> Optional[int]:
+        """Sacar al primer usuario en espera"""
+        waitlist = self.waitlists.get(clase_id)
+        if not waitlist or not waitlist.queue:
+            return None
+        _, usuario_id = waitlist.queue.popleft()
+        del waitlist.tickets[usuario_id]
+        if not waitlist.queue:
+            del self.waitlists[clase_id]
+        return usuario_id
+
+    def size(self, clase_id: int) -> int:
+        waitlist = self.waitlists.get(clase_id)
+        return len(waitlist.queue) if waitlist else 0
+
+    def export_state(self) -> List[Tuple[int, List[int]]]:
+        """Listas como (clase_id, usuarios en orden) para el snapshot"""
+        return [
+            (clase_id, [usuario_id for _, usuario_id in waitlist.queue])
+            for clase_id, waitlist in self.waitlists.items()
+        ]
+
+    def restore(self, rows: Iterable[Tuple[int, List[int]]]):
+        """Reemplazar las listas por las de un snapshot"""
+        self.waitlists = {}
+        for clase_id, usuarios in rows:
+            for usuario_id in usuarios:
+                self.enqueue(clase_id, usuario_id)
+
+    def notify_capacity(self, clase_id: int):
+        """Avisar que la clase puede tener cupos libres"""
+        if clase_id in self.waitlists and clase_id not in self._pending:
+            self._pending.add(clase_id)
+            self._signals.put_nowait(clase_id)
+
+    async def process_pending(self) -> int:
+        """Promover en todas las clases señaladas; devuelve cuántos se promovieron"""
+        promoted = 0
+        while not self._signals.empty():
+            promoted += await self._promote(self._signals.get_nowait())
+        return promoted
+
+    async def _promote(self, clase_id: int) -> int:
+        self._pending.discard(clase_id)
+        if self.promoter is None:
+            return 0
+        try:
+            promoted = await self.promoter(clase_id)
+        except Exception as e:
+            logger.error("Error promoviendo lista de espera de la clase %s: %s", clase_id, e)
+            return 0
+        self.promoted_total += promoted
+        return promoted
+
+    async def start(self):
+        """Iniciar el worker de promoción"""
+        self.is_running = True
+        self.task = asyncio.create_task(self._worker())
+        logger.info("Worker de listas de espera iniciado")
+
+    async def stop(self):
+        """Detener el worker de promoción"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+        logger.info("Worker de listas de espera detenido")
+
+    async def _worker(self):
+        while self.is_running:
+            clase_id = await self._signals.get()
+            await self._promote(clase_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            "clases_con_espera": len(self.waitlists),
+            "usuarios_en_espera": sum(len(w.queue) for w in self.waitlists.values()),
+            "promovidos": self.promoted_total
+        }
+
+waitlist_manager = WaitlistManager()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Microbenchmark de construcción de claves de cache.
+Compara la clave anterior (repr + MD5) con KeyBuilder compilado por firma.
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/bench_cache_keys.py
+"""
+
+import hashlib
+import timeit
+from typing import Optional
+from fastapi import Query
+from models.optimized import TipoYoga, NivelDificultad
+from cache.keys import KeyBuilder
+
+async def listar_clases(
+    tipo: Optional[TipoYoga] = Query(None),
+    nivel: Optional[NivelDificultad] = Query(None),
+    instructor_id: Optional[int] = Query(None),
+    activa: bool = Query(True)
+):
+    return []
+
+def legacy_key(func_name: str, *args, **kwargs) -> str:
+    key_data = f"{func_name}:{args}:{kwargs}"
+    return f"yoga_{hashlib.md5(key_data.encode()).hexdigest()}"
+
+def run(number: int = 200_000):
+    kwargs = {"tipo": TipoYoga.HATHA, "nivel": None, "instructor_id": 2, "activa": True}
+    builder = KeyBuilder(listar_clases, "listar_clases")
+
+    cases = {
+        "legacy repr+md5": lambda: legacy_key("listar_clases", **kwargs),
+        "KeyBuilder.build": lambda: builder.build((), kwargs),
+    }
+
+    print(f"Clave: {builder.build((), kwargs)}")
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=number, repeat=5))
+        print(f"{name:<20} {best / number * 1e9:8.0f} ns/llamada")
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
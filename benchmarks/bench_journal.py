@@ -0,0 +1,94 @@
+"""
+Benchmark del arranque en frío con journal y snapshots.
+Compara restaurar 100k reservas reaplicando todo el journal frente a
+cargar el snapshot y reaplicar solo una cola corta, y mide el costo de
+escritura con group commit frente a un fsync por reserva.
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/bench_journal.py
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from routes import optimized_api
+from services.journal import Journal
+
+RESERVAS = 100_000
+COLA = 1_000
+ESCRITURAS = 2_000
+
+def reserva(i):
+    return {"id": i, "usuario_id": i % 5000, "clase_id": 1,
+            "fecha": "2024-01-01T00:00:00", "estado": "confirmada"}
+
+def new_journal(directory, **kwargs):
+    journal = Journal(directory=directory, snapshot_every=10**9, **kwargs)
+    journal.bind(optimized_api.exportar_estado, optimized_api.cargar_estado, optimized_api.aplicar_registro)
+    return journal
+
+def reset():
+    optimized_api.cargar_estado({"clase": [], "reserva": [], "contadores": (1, 1)})
+
+async def write_entries(directory, count, snapshot_at=None):
+    journal = new_journal(directory, sync_commit=False)
+    journal.load()
+    await journal.start()
+    for i in range(1, count + 1):
+        data = reserva(i)
+        optimized_api.aplicar_registro("reserva", i, "upsert", data)
+        await journal.append("reserva", i, "upsert", data)
+        if i == snapshot_at:
+            await journal.snapshot()
+    await journal.flush()
+    journal.is_running = False
+    journal.task.cancel()
+    journal.file.close()
+
+def cold_start(directory):
+    reset()
+    return new_journal(directory).load()
+
+async def write_latency(directory, sync_commit, group):
+    journal = new_journal(directory, sync_commit=sync_commit)
+    journal.load()
+    await journal.start()
+    start = time.perf_counter()
+    for base in range(0, ESCRITURAS, group):
+        await asyncio.gather(*(
+            journal.append("reserva", i, "upsert", reserva(i)) for i in range(base, base + group)
+        ))
+    elapsed = time.perf_counter() - start
+    await journal.flush()
+    journal.is_running = False
+    journal.task.cancel()
+    journal.file.close()
+    return elapsed, journal.stats["batches"]
+
+async def run():
+    with tempfile.TemporaryDirectory() as solo_journal, tempfile.TemporaryDirectory() as con_snapshot:
+        reset()
+        await write_entries(solo_journal, RESERVAS)
+        reset()
+        await write_entries(con_snapshot, RESERVAS, snapshot_at=RESERVAS - COLA)
+
+        full = cold_start(solo_journal)
+        snap = cold_start(con_snapshot)
+        print(f"Arranque en frío con {RESERVAS} reservas")
+        print(f"  solo journal   {full['cold_start_seconds'] * 1000:8.1f} ms ({full['replayed_entries']} entradas)")
+        print(
+            f"  snapshot+cola  {snap['cold_start_seconds'] * 1000:8.1f} ms "
+            f"({snap['snapshot_records']} registros + {snap['replayed_entries']} entradas, "
+            f"{os.path.getsize(os.path.join(con_snapshot, 'snapshot.bin')) / 1e6:.1f} MB)"
+        )
+
+    print(f"\n{ESCRITURAS} reservas con espera de durabilidad")
+    for label, group in (("fsync por reserva", 1), ("group commit x50", 50)):
+        with tempfile.TemporaryDirectory() as directory:
+            elapsed, batches = await write_latency(directory, True, group)
+        print(f"  {label:18} {elapsed * 1000:8.1f} ms ({batches} fsync)")
+    reset()
+
+if __name__ == "__main__":
+    asyncio.run(run())
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+Benchmark de memoria de los registros internos.
+Mide la huella de 100k reservas como dict frente a ReservaRecord y las
+asignaciones de un listado de clases con ambos formatos.
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/bench_memory.py
+"""
+
+import tracemalloc
+from models.optimized import NivelDificultad, TipoYoga
+from models.records import ClaseRecord, ReservaRecord
+
+RESERVAS = 100_000
+CLASES = 1_000
+
+INSTRUCTOR = {
+    "id": 1, "nombre": "Ana García", "especialidades": ["hatha", "restaurativo"],
+    "experiencia_anios": 5, "calificacion": 4.8
+}
+
+def measure(builder):
+    """Bytes retenidos y número de bloques asignados por `builder`"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = builder()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    return result, size, blocks
+
+def reservas_dict():
+    return {
+        i: {"id": i, "usuario_id": i % 5000, "clase_id": i % CLASES,
+            "fecha": "2024-01-01T00:00:00", "estado": "confirmada"}
+        for i in range(RESERVAS)
+    }
+
+def reservas_record():
+    return {
+        i: ReservaRecord(id=i, usuario_id=i % 5000, clase_id=i % CLASES, fecha="2024-01-01T00:00:00")
+        for i in range(RESERVAS)
+    }
+
+def clase_dict(i):
+    return {
+        "id": i, "nombre": f"Clase {i}", "descripcion": None, "instructor_id": 1,
+        "tipo": "hatha", "nivel": "principiante", "duracion_minutos": 60,
+        "capacidad_maxima": 20, "precio": 25.0, "horario": "09:00:00",
+        "dias_semana": [1, 3, 5], "activa": True,
+        "fecha_creacion": "2024-01-01T00:00:00", "fecha_actualizacion": "2024-01-01T00:00:00"
+    }
+
+def run():
+    _, dict_size, _ = measure(reservas_dict)
+    _, record_size, _ = measure(reservas_record)
+    print(f"{RESERVAS} reservas")
+    print(f"  dict          {dict_size / 1e6:8.2f} MB ({dict_size / RESERVAS:.0f} B/reserva)")
+    print(f"  ReservaRecord {record_size / 1e6:8.2f} MB ({record_size / RESERVAS:.0f} B/reserva)")
+
+    clases_dict = {i: clase_dict(i) for i in range(CLASES)}
+    clases_record = {i: ClaseRecord.from_dict(clase_dict(i)) for i in clases_dict}
+    _, clases_dict_size, _ = measure(lambda: {i: clase_dict(i) for i in range(CLASES)})
+    _, clases_record_size, _ = measure(lambda: {i: ClaseRecord.from_dict(clase_dict(i)) for i in range(CLASES)})
+    print(f"{CLASES} clases")
+    print(f"  dict          {clases_dict_size / 1e3:8.1f} KB")
+    print(f"  ClaseRecord   {clases_record_size / 1e3:8.1f} KB")
+
+    _, _, dict_blocks = measure(lambda: [
+        {**c, "cupos_disponibles": 20, "instructor": INSTRUCTOR} for c in clases_dict.values()
+        if c["tipo"] == TipoYoga.HATHA and c["nivel"] == NivelDificultad.PRINCIPIANTE
+    ])
+    _, _, record_blocks = measure(lambda: [
+        c.to_api(20, INSTRUCTOR) for c in clases_record.values()
+        if c.tipo is TipoYoga.HATHA and c.nivel is NivelDificultad.PRINCIPIANTE
+    ])
+    print(f"Listado de {CLASES} clases (bloques asignados)")
+    print(f"  dict          {dict_blocks:8d}")
+    print(f"  ClaseRecord   {record_blocks:8d}")
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Benchmark de serialización del listado de clases.
+Compara el camino de FastAPI (validar contra response_model + codificar)
+con FastSerializer (bytes JSON directos para datos ya validados).
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/bench_serialization.py
+"""
+
+import json
+import timeit
+from typing import List
+from models.optimized import ClaseConDisponibilidad
+from models.serializers import FastSerializer
+
+INSTRUCTOR = {
+    "id": 1, "nombre": "Ana García", "especialidades": ["hatha", "restaurativo"],
+    "experiencia_anios": 5, "calificacion": 4.8
+}
+
+def build_listing(size: int) -> List[dict]:
+    return [
+        {
+            "id": i,
+            "nombre": f"Clase {i}",
+            "descripcion": "Clase de prueba",
+            "instructor_id": 1,
+            "tipo": "hatha",
+            "nivel": "principiante",
+            "duracion_minutos": 60,
+            "capacidad_maxima": 20,
+            "precio": 25.0,
+            "horario": "09:00:00",
+            "dias_semana": [1, 3, 5],
+            "activa": True,
+            "fecha_creacion": "2024-01-01T00:00:00",
+            "fecha_actualizacion": "2024-01-01T00:00:00",
+            "cupos_disponibles": 12,
+            "instructor": INSTRUCTOR
+        }
+        for i in range(size)
+    ]
+
+def run():
+    serializer = FastSerializer(List[ClaseConDisponibilidad])
+    adapter = serializer.adapter
+
+    def fastapi_path(data):
+        validated = adapter.validate_python(data)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    print(f"{'clases':>7} {'validado (ms)':>14} {'rápido (ms)':>12} {'speedup':>8}")
+    for size in (10, 1_000, 10_000):
+        data = build_listing(size)
+        number = max(1, 20_000 // size)
+        slow = min(timeit.repeat(lambda: fastapi_path(data), number=number, repeat=5)) / number
+        fast = min(timeit.repeat(lambda: serializer.dump_json(data, validate=False), number=number, repeat=5)) / number
+        print(f"{size:>7} {slow * 1e3:>14.3f} {fast * 1e3:>12.3f} {slow / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    run()
\ No newline at end of file
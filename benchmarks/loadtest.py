@@ -0,0 +1,328 @@
+"""
+Pruebas de carga de lazo abierto contra la API.
+
+Las llegadas siguen un proceso de Poisson a la tasa pedida y no esperan a
+que terminen las anteriores. La latencia se mide desde el instante en que
+la petición debía salir, no desde que salió: si el servidor (o el propio
+generador, que en proceso comparte el event loop con la app) se atrasa,
+ese atraso cuenta, y así no hay omisión coordinada.
+
+Por defecto corre contra la app ASGI en proceso, sin lifespan (sin Redis,
+journal ni tareas de fondo), con un cliente por usuario simulado para que
+el rate limiter vea IPs distintas. Con --fake-redis el cache y el rate
+limiter usan un Redis en proceso con la latencia indicada en vez del
+respaldo local. Con --url corre contra un uvicorn local.
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/loadtest.py browse booking_rush --duration 10
+    PYTHONPATH=app:. python benchmarks/loadtest.py browse --fake-redis 0.5
+    PYTHONPATH=app:. python benchmarks/loadtest.py --save-baseline benchmarks/baseline.json
+    PYTHONPATH=app:. python benchmarks/loadtest.py --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import httpx
+
+Request = Tuple[str, str, Dict]
+
+@dataclass
+class Context:
+    """Datos sembrados antes de la corrida que usan los pasos"""
+    clase_ids: List[int] = field(default_factory=list)
+    rush_clase_id: int = 0
+    next_usuario: int = 100_000
+
+    def usuario(self) -> int:
+        self.next_usuario += 1
+        return self.next_usuario
+
+@dataclass
+class Step:
+    name: str
+    weight: float
+    build: Callable[[Context, random.Random], Request]
+
+@dataclass
+class Scenario:
+    name: str
+    rate: float
+    steps: List[Step]
+
+def listado(ctx, rng):
+    return "GET", "/api/v1/clases", {"params": rng.choice([{}, {"tipo": "hatha"}, {"nivel": "intermedio"}])}
+
+def detalle(ctx, rng):
+    return "GET", f"/api/v1/clases/{rng.choice(ctx.clase_ids)}", {}
+
+def busqueda(ctx, rng):
+    return "GET", "/api/v1/clases/buscar", {"params": {"q": rng.choice(["yoga", "restaur", "flujo suave", "ana"])}}
+
+def disponibles(ctx, rng):
+    return "GET", "/api/v1/clases/disponibles", {"params": {"limite": 10}}
+
+def reserva_rush(ctx, rng):
+    return "POST", f"/api/v1/clases/{ctx.rush_clase_id}/reservar", {
+        "params": {"usuario_id": ctx.usuario(), "lista_espera": "true"}
+    }
+
+def reserva(ctx, rng):
+    return "POST", f"/api/v1/clases/{rng.choice(ctx.clase_ids)}/reservar", {
+        "params": {"usuario_id": ctx.usuario(), "lista_espera": "true"}
+    }
+
+def actualizacion(ctx, rng):
+    return "PUT", f"/api/v1/clases/{rng.choice(ctx.clase_ids)}", {"json": {"precio": rng.randint(15, 40)}}
+
+SCENARIOS = {
+    "browse": Scenario("browse", 80, [Step("GET /clases", 1, listado)]),
+    "detail": Scenario("detail", 100, [Step("GET /clases/{id}", 1, detalle)]),
+    "booking_rush": Scenario("booking_rush", 60, [Step("POST /clases/{rush}/reservar", 1, reserva_rush)]),
+    "mixed": Scenario("mixed", 80, [
+        Step("GET /clases", 35, listado),
+        Step("GET /clases/{id}", 30, detalle),
+        Step("GET /clases/buscar", 10, busqueda),
+        Step("GET /clases/disponibles", 10, disponibles),
+        Step("POST /clases/{id}/reservar", 12, reserva),
+        Step("PUT /clases/{id}", 3, actualizacion),
+    ]),
+}
+
+class EndpointStats:
+    """Latencias corregidas y códigos de estado de un paso"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status: Dict[int, int] = {}
+
+    def record(self, latency: float, status: int):
+        self.latencies.append(latency)
+        self.status[status] = self.status.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict:
+        ordered = sorted(self.latencies)
+        last = len(ordered) - 1
+        errors = sum(count for status, count in self.status.items() if status == 0 or status >= 500)
+        return {
+            "count": len(ordered),
+            "throughput": round(len(ordered) / elapsed, 1),
+            "errors": errors,
+            "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+            "p50_ms": round(ordered[int(last * 0.50)] * 1000, 2) if ordered else 0.0,
+            "p95_ms": round(ordered[int(last * 0.95)] * 1000, 2) if ordered else 0.0,
+            "p99_ms": round(ordered[int(last * 0.99)] * 1000, 2) if ordered else 0.0,
+            "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            "status": {str(status): count for status, count in sorted(self.status.items())}
+        }
+
+def make_clients(url: Optional[str], users: int, fake_redis_ms: Optional[float] = None) -> List[httpx.AsyncClient]:
+    """Un cliente por usuario simulado en proceso; uno compartido contra --url"""
+    timeout = httpx.Timeout(30.0)
+    if url:
+        limits = httpx.Limits(max_connections=500, max_keepalive_connections=500)
+        return [httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits)]
+
+    from main import app
+    from monitoring.log_pipeline import setup_logging
+    setup_logging(logging.WARNING)
+    if fake_redis_ms is not None:
+        from cache.redis_client import redis_client
+        redis_client.use_fake(latency=fake_redis_ms / 1000)
+    return [
+        httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, client=(f"10.0.{i // 250}.{i % 250 + 1}", 40000 + i)),
+            base_url="http://loadtest",
+            timeout=timeout
+        )
+        for i in range(users)
+    ]
+
+async def seed(client: httpx.AsyncClient, classes: int) -> Context:
+    """Crear las clases sobre las que corren los escenarios"""
+    rng = random.Random(0)
+    ctx = Context()
+    tipos = ["hatha", "vinyasa", "ashtanga", "kundalini", "restaurativo"]
+    niveles = ["principiante", "intermedio", "avanzado"]
+    descripciones = ["Flujo suave", "Postura restaurativa", "Secuencia dinámica", "Respiración y meditación"]
+    for i in range(classes + 1):
+        response = await client.post("/api/v1/clases", json={
+            "nombre": f"Yoga {tipos[i % len(tipos)].title()} {i}",
+            "descripcion": rng.choice(descripciones),
+            "instructor_id": 1 + i % 2,
+            "tipo": tipos[i % len(tipos)],
+            "nivel": niveles[i % len(niveles)],
+            "duracion_minutos": 60,
+            "capacidad_maxima": 50,
+            "precio": 25.0,
+            "horario": f"{7 + i % 14:02d}:00:00",
+            "dias_semana": sorted(rng.sample(range(1, 8), 3))
+        })
+        response.raise_for_status()
+        ctx.clase_ids.append(response.json()["id"])
+    ctx.rush_clase_id = ctx.clase_ids.pop()
+    return ctx
+
+async def send(client, stats: EndpointStats, request: Request, scheduled: float):
+    method, url, kwargs = request
+    try:
+        response = await client.request(method, url, **kwargs)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    stats.record(time.perf_counter() - scheduled, status)
+
+async def run_scenario(
+    scenario: Scenario,
+    clients: List[httpx.AsyncClient],
+    ctx: Context,
+    rate: float,
+    duration: float,
+    seed_value: int
+) -> Dict:
+    """Disparar llegadas de Poisson durante `duration` y resumir por paso"""
+    rng = random.Random(seed_value)
+    weights = [step.weight for step in scenario.steps]
+    stats = {step.name: EndpointStats() for step in scenario.steps}
+    tasks = []
+    max_dispatch_lag = 0.0
+
+    start = time.perf_counter()
+    scheduled = start
+    while True:
+        scheduled += rng.expovariate(rate)
+        if scheduled - start >= duration:
+            break
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_dispatch_lag = max(max_dispatch_lag, -delay)
+        step = rng.choices(scenario.steps, weights)[0]
+        client = clients[rng.randrange(len(clients))]
+        tasks.append(asyncio.create_task(send(client, stats[step.name], step.build(ctx, rng), scheduled)))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    return {
+        "rate": rate,
+        "duration": duration,
+        "elapsed": round(elapsed, 3),
+        "requests": len(tasks),
+        "throughput": round(len(tasks) / elapsed, 1),
+        "max_dispatch_lag_ms": round(max_dispatch_lag * 1000, 2),
+        "endpoints": {name: endpoint.summary(elapsed) for name, endpoint in stats.items()}
+    }
+
+def print_report(name: str, report: Dict):
+    print(
+        f"\n{name}: {report['requests']} peticiones a {report['rate']:.0f}/s, "
+        f"{report['throughput']:.1f} req/s, atraso máximo del generador {report['max_dispatch_lag_ms']:.1f} ms"
+    )
+    print(f"  {'paso':32} {'n':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err':>6}")
+    for step, s in report["endpoints"].items():
+        print(
+            f"  {step:32} {s['count']:7d} {s['throughput']:8.1f} {s['p50_ms']:8.2f} "
+            f"{s['p95_ms']:8.2f} {s['p99_ms']:8.2f} {s['max_ms']:8.2f} {s['errors']:6d}"
+        )
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regresiones frente a la línea base: p99, throughput y tasa de errores por paso"""
+    regressions = []
+    for name, report in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for step, current in report["endpoints"].items():
+            previous = base["endpoints"].get(step)
+            if previous is None:
+                continue
+            label = f"{name} / {step}"
+            p99_limit = max(previous["p99_ms"] * (1 + tolerance), previous["p99_ms"] + min_delta_ms)
+            if current["p99_ms"] > p99_limit:
+                regressions.append(f"{label}: p99 {current['p99_ms']:.2f} ms > {p99_limit:.2f} ms")
+            if current["throughput"] < previous["throughput"] * (1 - tolerance):
+                regressions.append(
+                    f"{label}: throughput {current['throughput']:.1f} < {previous['throughput']:.1f} req/s"
+                )
+            if current["error_rate"] > previous["error_rate"] + 0.01:
+                regressions.append(
+                    f"{label}: errores {current['error_rate']:.2%} > {previous['error_rate']:.2%}"
+                )
+    return regressions
+
+async def run(args) -> int:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    clients = make_clients(args.url, args.users, args.fake_redis)
+    try:
+        ctx = await seed(clients[0], args.classes)
+        results = {}
+        for offset, name in enumerate(args.scenarios):
+            scenario = SCENARIOS[name]
+            results[name] = await run_scenario(
+                scenario, clients, ctx, args.rate or scenario.rate, args.duration, args.seed + offset
+            )
+            print_report(name, results[name])
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        saved = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved.update(results)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2)
+        print(f"\nLínea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegresiones frente a la línea base:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nSin regresiones frente a la línea base")
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas de carga de lazo abierto")
+    parser.add_argument("scenarios", nargs="*", help=f"Escenarios a correr: {', '.join(SCENARIOS)} (todos por defecto)")
+    parser.add_argument("--url", help="Base de un servidor ya levantado; por defecto la app en proceso")
+    parser.add_argument(
+        "--fake-redis", type=float, metavar="LATENCY_MS",
+        help="En proceso, usar un Redis simulado con esta latencia por round trip"
+    )
+    parser.add_argument("--rate", type=float, help="Llegadas por segundo; por defecto la del escenario")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=200, help="Clientes simulados en proceso")
+    parser.add_argument("--classes", type=int, default=50, help="Clases sembradas antes de correr")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Guardar el reporte completo en este archivo")
+    parser.add_argument("--baseline", help="Comparar contra esta línea base y fallar si hay regresiones")
+    parser.add_argument("--save-baseline", help="Guardar (o actualizar) la línea base con esta corrida")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Empeoramiento relativo tolerado")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Diferencia de p99 que se ignora")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(unknown))}")
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    return args
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
\ No newline at end of file
@@ -0,0 +1,344 @@
+"""
+Suite de microbenchmarks de los internos: claves y decorador de cache,
+serialización del cliente Redis (sobre el Redis en proceso de
+cache.fake_redis, sin latencia), contador del rate limiter, invalidación
+por patrón, compresión de respuestas, métricas, alertas y el armado del
+listado.
+
+Cada caso se calienta, calibra cuántas llamadas entran en --min-time y
+repite la medición --repeat veces; se informan mínimo, mediana, media y
+desvío por llamada. El JSON incluye el commit y el intérprete, y con
+--compare se contrasta el mínimo de cada caso contra una corrida anterior.
+El logging se desactiva durante la corrida: se mide el código, no la
+escritura de los handlers.
+
+Ejecutar desde la raíz del repositorio:
+    PYTHONPATH=app:. python benchmarks/microbench.py
+    PYTHONPATH=app:. python benchmarks/microbench.py "metrics.*" --max-size 100000
+    PYTHONPATH=app:. python benchmarks/microbench.py --json bench.json --compare base.json
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import itertools
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import Query
+from models.optimized import TipoYoga, NivelDificultad
+from cache import compression
+from cache.cache_manager import CacheManager
+from cache.fake_redis import FakeRedis
+from cache.keys import KeyBuilder
+from cache.redis_client import RedisClient, redis_client
+from monitoring.metrics_collector import MetricsCollector
+from monitoring.alerts import Alert, AlertLevel, AlertManager
+from routes import optimized_api
+
+BENCHMARKS: List[Tuple[str, Tuple, Callable]] = []
+
+def benchmark(name: str, sizes: Tuple = (None,)):
+    """Registrar una fábrica que devuelve la función a medir (sync o async) para cada tamaño"""
+    def register(factory: Callable) -> Callable:
+        BENCHMARKS.append((name, sizes, factory))
+        return factory
+    return register
+
+def clase_data(i: int) -> Dict:
+    return {
+        "id": i, "nombre": f"Yoga {i}", "descripcion": "Flujo suave para todos los niveles",
+        "instructor_id": 1 + i % 2, "tipo": "hatha", "nivel": "intermedio",
+        "duracion_minutos": 60, "capacidad_maxima": 20, "precio": 25.0,
+        "horario": "09:00:00", "dias_semana": [1, 3, 5], "activa": True,
+        "fecha_creacion": "2024-01-01T00:00:00", "fecha_actualizacion": "2024-01-01T00:00:00"
+    }
+
+async def listar_clases(
+    tipo: Optional[TipoYoga] = Query(None),
+    nivel: Optional[NivelDificultad] = Query(None),
+    instructor_id: Optional[int] = Query(None),
+    activa: bool = Query(True)
+):
+    return []
+
+LISTADO_KWARGS = {"tipo": TipoYoga.HATHA, "nivel": None, "instructor_id": 2, "activa": True}
+
+@benchmark("models.enum_compare")
+def bench_enum_compare(size):
+    tipo = TipoYoga.HATHA
+    return lambda: tipo == TipoYoga.HATHA
+
+@benchmark("models.str_compare")
+def bench_str_compare(size):
+    tipo = "hatha"
+    return lambda: tipo == "hatha"
+
+@benchmark("cache.generate_key")
+def bench_generate_key(size):
+    manager = CacheManager()
+    return lambda: manager._generate_key("listar_clases", **LISTADO_KWARGS)
+
+@benchmark("cache.key_builder")
+def bench_key_builder(size):
+    builder = KeyBuilder(listar_clases, "listar_clases")
+    return lambda: builder.build((), LISTADO_KWARGS)
+
+def cached_endpoint():
+    manager = CacheManager()
+
+    @manager.cached(expire=300, key_prefix="bench")
+    async def obtener(clase_id: int):
+        return clase_data(clase_id)
+    return obtener
+
+@benchmark("cached.hit")
+def bench_cached_hit(size):
+    obtener = cached_endpoint()
+    asyncio.get_event_loop().run_until_complete(obtener(clase_id=1))
+    return lambda: obtener(clase_id=1)
+
+@benchmark("cached.miss")
+def bench_cached_miss(size):
+    obtener = cached_endpoint()
+    ids = itertools.count(1)
+    return lambda: obtener(clase_id=next(ids))
+
+def redis_with_payload(size):
+    client = RedisClient()
+    client.connection = FakeRedis()
+    payload = [clase_data(i) for i in range(size)]
+    return client, payload
+
+@benchmark("redis.set", sizes=(1, 20, 100))
+def bench_redis_set(size):
+    client, payload = redis_with_payload(size)
+    return lambda: client.set("bench:listado", payload)
+
+@benchmark("redis.get", sizes=(1, 20, 100))
+def bench_redis_get(size):
+    client, payload = redis_with_payload(size)
+    asyncio.get_event_loop().run_until_complete(client.set("bench:listado", payload))
+    return lambda: client.get("bench:listado")
+
+@benchmark("redis.incr_window")
+def bench_incr_window(size):
+    client = RedisClient()
+    client.connection = FakeRedis()
+    return lambda: client.incr_window("rate:bench", 60)
+
+@benchmark("cache.invalidate_matching", sizes=(100, 1_000, 10_000))
+def bench_invalidate_matching(size):
+    manager = CacheManager()
+    redis_client.use_fake()
+    for i in range(size):
+        redis_client.connection.server.set(f"yoga:otra:{i}", "1")
+    return lambda: manager.invalidate_matching("yoga:bench:*")
+
+def listing_response(size):
+    return optimized_api.listado_serializer.response([clase_data(i) for i in range(size)])
+
+@benchmark("compression.cached_hit_gzip", sizes=(20, 100, 1_000))
+def bench_cached_hit_gzip(size):
+    manager = CacheManager()
+    response = listing_response(size)
+
+    @manager.cached(expire=300, key_prefix=f"bench_gzip_{size}")
+    async def listado():
+        return response
+
+    compression.set_accept_encoding("gzip, deflate, br")
+    asyncio.get_event_loop().run_until_complete(listado())
+    return listado
+
+@benchmark("compression.dynamic_gzip", sizes=(20, 100, 1_000))
+def bench_dynamic_gzip(size):
+    body = listing_response(size).body
+    return lambda: compression.compress(body, "gzip")
+
+def collector_with(size):
+    collector = MetricsCollector()
+    now = time.time()
+    paths = [f"/api/v1/clases/{i}" for i in range(50)]
+    requests = collector.metrics["requests"]
+    for i in range(size):
+        requests.append({
+            "timestamp": now, "path": paths[i % 50], "method": "GET",
+            "status_code": 200, "response_time": 0.01 * (i % 7)
+        })
+    collector.metrics["response_times"].extend(0.01 * (i % 7) for i in range(size))
+    return collector
+
+METRIC_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+@benchmark("metrics.record_request", sizes=METRIC_SIZES)
+def bench_record_request(size):
+    collector = collector_with(size)
+    return lambda: collector.record_request("/api/v1/clases", "GET", 200, 0.012)
+
+@benchmark("metrics.record_event", sizes=METRIC_SIZES)
+def bench_record_event(size):
+    collector = collector_with(size)
+    return lambda: collector.record_event("reserva_creada", {"clase_id": 1, "usuario_id": 7})
+
+@benchmark("metrics.get_metrics_summary", sizes=METRIC_SIZES)
+def bench_metrics_summary(size):
+    return collector_with(size).get_metrics_summary
+
+@benchmark("alerts.add_alert", sizes=(100, 1_000, 10_000))
+def bench_add_alert(size):
+    manager = AlertManager()
+    manager.alerts.extend(Alert(f"Alerta {i}", "Mensaje", AlertLevel.MEDIUM, "bench") for i in range(size))
+    titles = (f"Nueva alerta {i}" for i in itertools.count())
+
+    def add_and_drop():
+        manager.add_alert(next(titles), "Mensaje", AlertLevel.HIGH, "bench")
+        manager.alerts.pop()
+    return add_and_drop
+
+@benchmark("listing.build", sizes=(10, 100, 1_000))
+def bench_listing(size):
+    optimized_api.cargar_estado({"clase": [], "reserva": [], "contadores": (1, 1)})
+    for i in range(1, size + 1):
+        optimized_api.aplicar_registro("clase", i, "upsert", clase_data(i))
+    build = optimized_api.listar_clases.__wrapped__
+    optimized_api.metrics_collector.metrics["events"] = []
+    return lambda: build(tipo=None, nivel=None, instructor_id=None, activa=True)
+
+def timer(fn: Callable, loop: asyncio.AbstractEventLoop) -> Callable[[int], float]:
+    """Función que mide `number` llamadas seguidas; las corrutinas se esperan dentro de una sola"""
+    probe = fn()
+    if not asyncio.iscoroutine(probe):
+        def run(number: int) -> float:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            return time.perf_counter() - start
+        return run
+
+    loop.run_until_complete(probe)
+
+    async def batch(number: int) -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        return time.perf_counter() - start
+
+    return lambda number: loop.run_until_complete(batch(number))
+
+def measure(run: Callable[[int], float], warmup: float, min_time: float, repeat: int) -> Dict:
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        run(1)
+
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= min_time or number >= 10**7:
+            break
+        number = number * 10 if elapsed < min_time / 10 else int(number * min_time / elapsed) + 1
+
+    per_call = [elapsed / number * 1e9] + [run(number) / number * 1e9 for _ in range(repeat - 1)]
+    median = statistics.median(per_call)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_ns": round(min(per_call), 1),
+        "median_ns": round(median, 1),
+        "mean_ns": round(statistics.fmean(per_call), 1),
+        "stdev_ns": round(statistics.stdev(per_call), 1) if repeat > 1 else 0.0,
+        "ops_per_sec": round(1e9 / median, 1)
+    }
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+def format_ns(ns: float) -> str:
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("µs", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+def selected(patterns: List[str], max_size: int):
+    for name, sizes, factory in BENCHMARKS:
+        for size in sizes:
+            if size is not None and size > max_size:
+                continue
+            full_name = name if size is None else f"{name}[{size}]"
+            if not patterns or any(fnmatch.fnmatch(full_name, p) or fnmatch.fnmatch(name, p) for p in patterns):
+                yield full_name, size, factory
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Casos cuyo mínimo empeoró más que `threshold` respecto a la línea base"""
+    regressions = []
+    print(f"\nComparación con {baseline['meta'].get('commit')}:")
+    for name, current in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        change = current["min_ns"] / previous["min_ns"] - 1
+        marker = "  <-- regresión" if change > threshold else ""
+        print(f"  {name:42} {format_ns(previous['min_ns']):>10} -> {format_ns(current['min_ns']):>10} {change:+7.1%}{marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks de los internos")
+    parser.add_argument("patterns", nargs="*", help="Patrones glob de casos (por defecto todos)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--warmup", type=float, default=0.1, help="Segundos de calentamiento por caso")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Segundos mínimos por repetición")
+    parser.add_argument("--max-size", type=int, default=1_000_000, help="Omitir tamaños mayores")
+    parser.add_argument("--json", help="Guardar resultados en este archivo")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Empeoramiento tolerado al comparar")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    results = {}
+    print(f"{'caso':42} {'mín':>10} {'mediana':>10} {'desvío':>10} {'ops/s':>12}")
+    for name, size, factory in selected(args.patterns, args.max_size):
+        stats = measure(timer(factory(size), loop), args.warmup, args.min_time, args.repeat)
+        results[name] = stats
+        print(
+            f"{name:42} {format_ns(stats['min_ns']):>10} {format_ns(stats['median_ns']):>10} "
+            f"{format_ns(stats['stdev_ns']):>10} {stats['ops_per_sec']:12,.0f}"
+        )
+    loop.close()
+
+    report = {"meta": metadata(), "results": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -55,6 +55,26 @@ class AlertManager:
                 "errors"
             )
 
+    def check_loop_alerts(self, loop_stats: Dict):
+        """Alertas de bloqueo del event loop"""
+        lag = loop_stats.get('lag_ms', {})
+        threshold_ms = loop_stats.get('threshold_ms', 100)
+
+        if lag.get('max', 0) > 1000:
+            self.add_alert(
+                "Event loop detenido",
+                f"El event loop estuvo bloqueado {lag['max']:.0f}ms",
+                AlertLevel.HIGH,
+                "event_loop"
+            )
+        elif lag.get('p99', 0) > threshold_ms:
+            self.add_alert(
+                "Event loop con lag",
+                f"p99 de lag del event loop en {lag['p99']:.0f}ms (límite: {threshold_ms:.0f}ms)",
+                AlertLevel.MEDIUM,
+                "event_loop"
+            )
+
     def check_business_alerts(self):
         """Alertas específicas del negocio de yoga"""
         ocupacion_promedio = 0.78
@@ -77,14 +97,14 @@ class AlertManager:
         
         new_alert = Alert(title, message, level, source)
         self.alerts.append(new_alert)
-        logger.warning(f"ALERTA {level.value}: {title} - {message}")
+        logger.warning("ALERTA %s: %s - %s", level.value, title, message)
 
     def resolve_alert(self, title: str) -> bool:
         """Marcar alerta como resuelta"""
         for alert in self.alerts:
             if alert.title == title and not alert.resolved:
                 alert.resolved = True
-                logger.info(f"Alerta resuelta: {title}")
+                logger.info("Alerta resuelta: %s", title)
                 return True
         return False
 
@@ -36,7 +36,7 @@ async def get_metrics_dashboard():
         }
         
     except Exception as e:
-        logger.error(f"Error obteniendo métricas: {e}")
+        logger.error("Error obteniendo métricas: %s", e)
         return {
             "status": "error",
             "message": "Error obteniendo métricas"
@@ -0,0 +1,142 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de `extra` al mismo nivel"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class RepetitionFilter(logging.Filter):
+    """
+    Limita los mensajes repetitivos antes de encolarlos. La clave es el
+    logger más la plantilla sin formatear (`record.msg`), por eso los
+    caminos calientes loguean con argumentos y no con f-strings. Por
+    plantilla pasan `burst` registros por ventana; del resto solo se cuenta
+    cuántos se descartaron y el primero de la ventana siguiente lo informa
+    en `suppressed`. Los DEBUG además se muestrean con `debug_sample_rate`.
+    Se recuerdan a lo sumo `max_keys` plantillas (LRU): un f-string que se
+    cuele genera una plantilla por mensaje y no debe crecer sin límite.
+    """
+
+    def __init__(
+        self,
+        burst: int = None,
+        window: float = None,
+        debug_sample_rate: float = None,
+        max_keys: int = None
+    ):
+        super().__init__()
+        self.burst = burst or int(os.getenv("LOG_RATE_LIMIT_BURST", "10"))
+        self.window = window or float(os.getenv("LOG_RATE_LIMIT_WINDOW", "10"))
+        self.debug_sample_rate = (
+            debug_sample_rate if debug_sample_rate is not None
+            else float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+        )
+        self.max_keys = max_keys or int(os.getenv("LOG_RATE_LIMIT_MAX_KEYS", "1000"))
+        self._windows: "OrderedDict[Tuple[str, str], List]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR and record.exc_info:
+            return True
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:
+            return False
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is not None:
+                self._windows.move_to_end(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+class EnqueueOnlyHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea al encolar: el mensaje se arma con
+    getMessage() en el hilo del listener. Los argumentos se pasan por
+    referencia, como es habitual con logging perezoso.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(level: int = logging.INFO, json_output: bool = None) -> logging.handlers.QueueListener:
+    """
+    Reemplazar los handlers del root por una cola: el hilo que loguea solo
+    filtra y encola, y un listener en segundo plano formatea y escribe.
+    """
+    global _listener
+    if json_output is None:
+        json_output = os.getenv("LOG_FORMAT", "json") == "json"
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(
+        JsonFormatter() if json_output
+        else logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    )
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = EnqueueOnlyHandler(log_queue)
+    handler.addFilter(RepetitionFilter())
+
+    stop_logging()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def stop_logging():
+    """Vaciar la cola, detener el listener y volver a escribir directo"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, EnqueueOnlyHandler):
+            root.removeHandler(existing)
+    for target in _listener.handlers:
+        root.addHandler(target)
+    _listener = None
\ No newline at end of file
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from monitoring.alerts import alert_manager
+
+logger = logging.getLogger(__name__)
+
+class LoopLagMonitor:
+    """
+    Salud del event loop. Un latido duerme `interval` y mide cuánto tarde
+    despierta: ese retraso es el tiempo que alguna corrutina retuvo el loop
+    sin ceder. Un hilo vigía detecta el latido atrasado mientras el bloqueo
+    sigue ocurriendo y guarda la pila del hilo del loop en ese momento, que
+    es la del código que lo está bloqueando.
+    """
+
+    def __init__(
+        self,
+        interval: float = None,
+        threshold: float = None,
+        window: int = None,
+        max_events: int = None
+    ):
+        self.interval = interval or float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+        self.threshold = threshold or float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+        self.samples: Deque[float] = deque(maxlen=window or int(os.getenv("LOOP_LAG_WINDOW", "1200")))
+        self.blocking_events: Deque[Dict] = deque(maxlen=max_events or int(os.getenv("LOOP_LAG_MAX_EVENTS", "20")))
+        self.blocked_total = 0
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self.last_beat = time.monotonic()
+        self._beat = 0
+        self._captured_beat = -1
+        self._pending_stack: Optional[List[str]] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    async def start(self):
+        """Iniciar el latido y el hilo vigía sobre el loop actual"""
+        self._loop_thread = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.is_running = True
+        self._stop.clear()
+        self.task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Monitor del event loop iniciado")
+
+    async def stop(self):
+        """Detener el latido y el vigía"""
+        self.is_running = False
+        self._stop.set()
+        if self.task:
+            self.task.cancel()
+        logger.info("Monitor del event loop detenido")
+
+    async def _heartbeat(self):
+        while self.is_running:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.record(now - expected)
+            self.last_beat = now
+            self._beat += 1
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            if self._captured_beat == self._beat:
+                continue
+            if time.monotonic() - self.last_beat > self.interval + self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    self._pending_stack = self._format_stack(frame)
+                    self._captured_beat = self._beat
+
+    @staticmethod
+    def _format_stack(frame, limit: int = 20) -> List[str]:
+        stack = []
+        while frame is not None and len(stack) < limit:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}")
+            frame = frame.f_back
+        return list(reversed(stack))
+
+    def record(self, lag: float):
+        """Registrar el retraso de un latido; si supera el umbral, guardar el bloqueo"""
+        lag = max(lag, 0.0)
+        self.samples.append(lag)
+        if lag <= self.threshold:
+            return
+
+        stack, self._pending_stack = self._pending_stack or [], None
+        self.blocked_total += 1
+        self.blocking_events.append({
+            "lag_ms": round(lag * 1000, 1),
+            "timestamp": time.time(),
+            "stack": stack
+        })
+        if stack:
+            logger.warning("Event loop bloqueado %.0fms en %s", lag * 1000, stack[-1])
+        else:
+            logger.warning("Event loop bloqueado %.0fms", lag * 1000)
+        alert_manager.check_loop_alerts(self.get_stats())
+
+    def percentiles(self) -> Dict[str, float]:
+        """Percentiles de lag de la ventana, en milisegundos"""
+        if not self.samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            "p50": round(ordered[int(last * 0.50)] * 1000, 2),
+            "p95": round(ordered[int(last * 0.95)] * 1000, 2),
+            "p99": round(ordered[int(last * 0.99)] * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2)
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "running": self.is_running,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": self.percentiles(),
+            "samples": len(self.samples),
+            "blocked_total": self.blocked_total,
+            "recent_blocks": list(self.blocking_events)
+        }
+
+loop_monitor = LoopLagMonitor()
\ No newline at end of file
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import hmac
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+class SlowRequestStore:
+    """
+    Las N peticiones más lentas de cada ruta, en un min-heap por ruta.
+    El detalle solo se arma si la petición entra en el heap, así que el
+    costo para las peticiones rápidas es una comparación.
+    """
+
+    def __init__(self, per_route: int = None):
+        self.per_route = per_route or int(os.getenv("SLOW_REQUESTS_PER_ROUTE", "10"))
+        self.routes: Dict[str, List[Tuple[int, int, Dict]]] = {}
+        self._counter = itertools.count()
+
+    def record(self, route: str, duration_ns: int, details: Callable[[], Dict]) -> bool:
+        """Guardar la petición si está entre las más lentas de su ruta"""
+        heap = self.routes.setdefault(route, [])
+        if len(heap) >= self.per_route and duration_ns <= heap[0][0]:
+            return False
+        entry = (duration_ns, next(self._counter), {
+            "duration_ms": round(duration_ns / 1e6, 3),
+            "timestamp": time.time(),
+            **details()
+        })
+        if len(heap) >= self.per_route:
+            heapq.heapreplace(heap, entry)
+        else:
+            heapq.heappush(heap, entry)
+        return True
+
+    def get(self, route: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Peticiones guardadas por ruta, de la más lenta a la más rápida"""
+        routes = {route: self.routes.get(route, [])} if route else self.routes
+        return {
+            name: [details for _, _, details in sorted(heap, reverse=True)]
+            for name, heap in routes.items()
+        }
+
+    def clear(self):
+        self.routes.clear()
+
+class SamplingProfiler:
+    """
+    Profiler estadístico bajo demanda. Un hilo aparte toma la pila del
+    hilo del event loop cada `interval` segundos con sys._current_frames()
+    y cuenta pilas colapsadas (`a;b;c N`), el formato de entrada de
+    flamegraph.pl y speedscope. No instrumenta llamadas, así que el costo
+    es fijo por muestra y no depende de la carga. El hilo muestreador
+    necesita el GIL, por lo que las esperas de I/O (select) pueden aparecer
+    algo sobrerrepresentadas frente al código que no lo suelta.
+    """
+
+    def __init__(self, interval: float = None, max_seconds: float = None):
+        self.interval = interval or float(os.getenv("PROFILER_INTERVAL", "0.005"))
+        self.max_seconds = max_seconds or float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.remaining_requests: Optional[int] = None
+        self.is_active = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._finished: Optional[asyncio.Event] = None
+
+    def start(self, seconds: float, requests: Optional[int] = None):
+        """Empezar a muestrear el hilo actual (el del event loop)"""
+        if self.is_active:
+            raise RuntimeError("Ya hay un perfil en curso")
+        loop = asyncio.get_running_loop()
+        self.stacks = Counter()
+        self.samples = 0
+        self.remaining_requests = requests
+        self.is_active = True
+        self._stop.clear()
+        self._finished = asyncio.Event()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(), time.monotonic() + min(seconds, self.max_seconds), loop),
+            name="sampling-profiler",
+            daemon=True
+        )
+        self._thread.start()
+        logger.info("Profiler activo por %ss o %s peticiones", seconds, requests)
+
+    def stop(self):
+        self._stop.set()
+
+    def on_request(self):
+        """Contar una petición terminada y cortar si se llegó al máximo pedido"""
+        if self.is_active and self.remaining_requests is not None:
+            self.remaining_requests -= 1
+            if self.remaining_requests <= 0:
+                self._stop.set()
+
+    def _sample(self, thread_id: int, deadline: float, loop: asyncio.AbstractEventLoop):
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+                self.samples += 1
+        self.is_active = False
+        loop.call_soon_threadsafe(self._finished.set)
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    async def profile(self, seconds: float, requests: Optional[int] = None) -> str:
+        """Muestrear hasta que se cumpla el tiempo o las peticiones y devolver las pilas"""
+        self.start(seconds, requests)
+        await self._finished.wait()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+slow_requests = SlowRequestStore()
+profiler = SamplingProfiler()
+
+router = APIRouter()
+
+async def verify_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Los endpoints de diagnóstico exigen ADMIN_TOKEN; sin token configurado
+    no existen (404). La comparación es de tiempo constante.
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+@router.get("/slow-requests", dependencies=[Depends(verify_admin)])
+async def get_slow_requests(route: Optional[str] = Query(None)):
+    """Peticiones más lentas por ruta con su desglose"""
+    return slow_requests.get(route)
+
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(verify_admin)])
+async def run_profile(
+    seconds: float = Query(10, gt=0, le=300),
+    requests: Optional[int] = Query(None, ge=1)
+):
+    """Perfilar el proceso por `seconds` o hasta `requests` peticiones; devuelve pilas colapsadas"""
+    if profiler.is_active:
+        raise HTTPException(status_code=409, detail="Ya hay un perfil en curso")
+    return await profiler.profile(seconds, requests)
\ No newline at end of file
@@ -0,0 +1,365 @@
+import asyncio
+import itertools
+import logging
+import math
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUCKET_BOUNDS_MS = tuple(round(0.5 * 1.5 ** i, 3) for i in range(28))
+HISTOGRAM_SIZE = len(BUCKET_BOUNDS_MS) + 1
+
+RESOLUTIONS = {"1m": 60, "5m": 300, "1h": 3600}
+DEFAULT_RETENTION_DAYS = {"1m": 2, "5m": 30, "1h": 365}
+MAX_POINTS = 1440
+OVERFLOW_ROUTE = "<otras>"
+
+BLOCK_MAGIC = b"YTSB"
+BLOCK_VERSION = 1
+BLOCK_HEADER = struct.Struct("<4sHIII")
+
+Row = Tuple[int, str, "Aggregate"]
+
+class Aggregate:
+    """Conteo, errores, suma, máximo e histograma logarítmico de latencias de un intervalo"""
+
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * HISTOGRAM_SIZE
+
+    def add(self, duration_ms: float, error: bool):
+        self.count += 1
+        self.errors += error
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+        self.histogram[bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+
+    def merge(self, other: "Aggregate"):
+        self.count += other.count
+        self.errors += other.errors
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def copy(self) -> "Aggregate":
+        clone = Aggregate()
+        clone.merge(self)
+        return clone
+
+    def quantile(self, q: float) -> float:
+        """Percentil interpolado dentro del bucket del histograma que lo contiene"""
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.histogram):
+            if n and seen + n >= rank:
+                lower = BUCKET_BOUNDS_MS[index - 1] if index else 0.0
+                upper = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max_ms)
+            seen += n
+        return self.max_ms
+
+    def to_point(self, bucket: int) -> Dict:
+        return {
+            "timestamp": datetime.fromtimestamp(bucket, timezone.utc).isoformat(),
+            "requests": self.count,
+            "errors": self.errors,
+            "error_rate": round(self.errors / max(self.count, 1), 4),
+            "avg_ms": round(self.total_ms / max(self.count, 1), 3),
+            "p50_ms": round(self.quantile(0.5), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "p99_ms": round(self.quantile(0.99), 3),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+def encode_block(rows: List[Row]) -> bytes:
+    """Un bloque columnar comprimido: rutas, buckets, contadores, sumas y la matriz de histogramas"""
+    n = len(rows)
+    routes = "\0".join(route for _, route, _ in rows).encode()
+    payload = b"".join((
+        struct.pack("<I", len(routes)),
+        routes,
+        struct.pack(f"<{n}q", *(bucket for bucket, _, _ in rows)),
+        struct.pack(f"<{n}I", *(agg.count for _, _, agg in rows)),
+        struct.pack(f"<{n}I", *(agg.errors for _, _, agg in rows)),
+        struct.pack(f"<{n}d", *(agg.total_ms for _, _, agg in rows)),
+        struct.pack(f"<{n}d", *(agg.max_ms for _, _, agg in rows)),
+        struct.pack(f"<{n * HISTOGRAM_SIZE}I", *itertools.chain.from_iterable(agg.histogram for _, _, agg in rows))
+    ))
+    compressed = zlib.compress(payload, 6)
+    return BLOCK_HEADER.pack(BLOCK_MAGIC, BLOCK_VERSION, n, len(compressed), zlib.crc32(compressed)) + compressed
+
+def decode_block(n: int, payload: bytes) -> List[Row]:
+    (routes_size,) = struct.unpack_from("<I", payload)
+    offset = 4 + routes_size
+    routes = payload[4:offset].decode().split("\0")
+
+    def column(code: str, count: int):
+        nonlocal offset
+        values = struct.unpack_from(f"<{count}{code}", payload, offset)
+        offset += struct.calcsize(f"<{count}{code}")
+        return values
+
+    buckets, counts, errors = column("q", n), column("I", n), column("I", n)
+    totals, maxima = column("d", n), column("d", n)
+    histograms = column("I", n * HISTOGRAM_SIZE)
+
+    rows = []
+    for i in range(n):
+        agg = Aggregate()
+        agg.count, agg.errors, agg.total_ms, agg.max_ms = counts[i], errors[i], totals[i], maxima[i]
+        agg.histogram = list(histograms[i * HISTOGRAM_SIZE:(i + 1) * HISTOGRAM_SIZE])
+        rows.append((buckets[i], routes[i], agg))
+    return rows
+
+def read_file(path: Path) -> Tuple[List[Row], int]:
+    """Filas de un archivo de bloques y los bytes válidos, cortando en el primer bloque dañado"""
+    data = path.read_bytes()
+    rows: List[Row] = []
+    offset = 0
+    while offset + BLOCK_HEADER.size <= len(data):
+        magic, version, n, size, crc = BLOCK_HEADER.unpack_from(data, offset)
+        start = offset + BLOCK_HEADER.size
+        payload = data[start:start + size]
+        if magic != BLOCK_MAGIC or version != BLOCK_VERSION or len(payload) < size or zlib.crc32(payload) != crc:
+            logger.warning("Bloque inválido en %s en el byte %d", path.name, offset)
+            break
+        rows.extend(decode_block(n, zlib.decompress(payload)))
+        offset = start + size
+    return rows, offset
+
+def day_of(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+class MetricsHistory:
+    """
+    Historial persistente de latencias y errores por ruta. Las peticiones
+    se agregan por minuto en memoria; cada `flush_interval` los minutos
+    cerrados se escriben como un bloque columnar comprimido en un archivo
+    por día, y se acumulan en rollups de 5 minutos y de una hora que se
+    escriben al cerrarse. Los histogramas se suman exactamente, así que
+    los percentiles de un rollup son los de sus minutos. Cada resolución
+    tiene su propia retención en días.
+    """
+
+    def __init__(
+        self,
+        directory: str = None,
+        flush_interval: float = None,
+        retention_days: Dict[str, int] = None,
+        max_routes: int = None
+    ):
+        self.directory = Path(directory or os.getenv("METRICS_HISTORY_DIR", "data/metrics"))
+        self.flush_interval = flush_interval or float(os.getenv("METRICS_HISTORY_FLUSH_INTERVAL", "15"))
+        self.retention_days = retention_days or {
+            resolution: int(os.getenv(f"METRICS_RETENTION_{resolution.upper()}_DAYS", str(days)))
+            for resolution, days in DEFAULT_RETENTION_DAYS.items()
+        }
+        self.max_routes = max_routes or int(os.getenv("METRICS_HISTORY_MAX_ROUTES", "200"))
+        self.routes: Set[str] = set()
+        self.open: Dict[str, Dict[Tuple[int, str], Aggregate]] = {resolution: {} for resolution in RESOLUTIONS}
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"blocks": 0, "rows": 0, "bytes": 0, "write_errors": 0, "expired_files": 0}
+
+    def path_for(self, resolution: str, day: str) -> Path:
+        return self.directory / resolution / f"{day}.tsb"
+
+    def record(self, route: str, duration_ms: float, status_code: int, now: float = None):
+        """Sumar una petición al minuto en curso de su ruta; pasado max_routes, las rutas nuevas van a una sola serie"""
+        now = time.time() if now is None else now
+        if route not in self.routes:
+            if len(self.routes) >= self.max_routes:
+                route = OVERFLOW_ROUTE
+            else:
+                self.routes.add(route)
+        key = (int(now // 60) * 60, route)
+        agg = self.open["1m"].get(key)
+        if agg is None:
+            agg = self.open["1m"][key] = Aggregate()
+        agg.add(duration_ms, status_code >= 400)
+
+    def _close(self, resolution: str, now: float) -> List[Row]:
+        step = RESOLUTIONS[resolution]
+        pending = self.open[resolution]
+        closed = sorted(key for key in pending if key[0] + step <= now)
+        return [(bucket, route, pending.pop((bucket, route))) for bucket, route in closed]
+
+    def _roll_up(self, resolution: str, rows: Iterable[Row]):
+        """Sumar minutos cerrados a los rollups abiertos de una resolución"""
+        step = RESOLUTIONS[resolution]
+        for bucket, route, agg in rows:
+            key = (bucket // step * step, route)
+            target = self.open[resolution].get(key)
+            if target is None:
+                self.open[resolution][key] = agg.copy()
+            else:
+                target.merge(agg)
+
+    async def flush(self, now: float = None, final: bool = False):
+        """Escribir los intervalos cerrados; con final también los abiertos"""
+        now = math.inf if final else (time.time() if now is None else now)
+        async with self._lock:
+            minutes = self._close("1m", now)
+            self._roll_up("5m", minutes)
+            self._roll_up("1h", minutes)
+            batches = {"1m": minutes, "5m": self._close("5m", now), "1h": self._close("1h", now)}
+            if not any(batches.values()):
+                return
+            try:
+                await asyncio.to_thread(self._write, batches)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error("Error escribiendo el historial de métricas: %s", e)
+
+    def _write(self, batches: Dict[str, List[Row]]):
+        for resolution, rows in batches.items():
+            for day, day_rows in itertools.groupby(rows, key=lambda row: day_of(row[0])):
+                block = encode_block(list(day_rows))
+                path = self.path_for(resolution, day)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "ab") as f:
+                    f.write(block)
+                self.stats["blocks"] += 1
+                self.stats["bytes"] += len(block)
+            self.stats["rows"] += len(rows)
+
+    def expire(self, now: float = None) -> int:
+        """Borrar los archivos diarios que quedaron fuera de la retención de su resolución"""
+        now = time.time() if now is None else now
+        removed = 0
+        for resolution, days in self.retention_days.items():
+            oldest = day_of(now - days * 86400)
+            folder = self.directory / resolution
+            if not folder.exists():
+                continue
+            for path in folder.glob("*.tsb"):
+                if path.stem < oldest:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        self.stats["expired_files"] += removed
+        return removed
+
+    def recover(self, now: float = None):
+        """Reparar el último archivo de cada resolución y rearmar los rollups que no llegaron a escribirse"""
+        now = time.time() if now is None else now
+        written_until = {}
+        for resolution, step in RESOLUTIONS.items():
+            files = sorted((self.directory / resolution).glob("*.tsb"))
+            written_until[resolution] = 0
+            if not files:
+                continue
+            rows, valid_bytes = read_file(files[-1])
+            if valid_bytes < files[-1].stat().st_size:
+                os.truncate(files[-1], valid_bytes)
+            if rows:
+                written_until[resolution] = max(bucket for bucket, _, _ in rows) + step
+
+        since = max(min(written_until["5m"], written_until["1h"]), now - self.retention_days["1m"] * 86400)
+        minutes = self._read_range("1m", since, now)
+        for resolution in ("5m", "1h"):
+            step = RESOLUTIONS[resolution]
+            self._roll_up(resolution, [row for row in minutes if row[0] // step * step >= written_until[resolution]])
+
+    def _read_range(self, resolution: str, start: float, end: float) -> List[Row]:
+        rows = []
+        day = int(start // 86400) * 86400
+        while day <= end:
+            path = self.path_for(resolution, day_of(day))
+            if path.exists():
+                rows.extend(row for row in read_file(path)[0] if start <= row[0] < end)
+            day += 86400
+        return rows
+
+    def pick_resolution(self, start: float, end: float, now: float = None) -> str:
+        """La resolución más fina que cubre el rango con su retención y sin pasar de MAX_POINTS"""
+        now = time.time() if now is None else now
+        for resolution, step in RESOLUTIONS.items():
+            if start >= now - self.retention_days[resolution] * 86400 and (end - start) / step <= MAX_POINTS:
+                return resolution
+        return "1h"
+
+    async def query(
+        self,
+        start: float,
+        end: float,
+        resolution: Optional[str] = None,
+        route: Optional[str] = None,
+        by_route: bool = False
+    ) -> Dict:
+        """Serie de puntos entre start y end, total o por ruta, incluyendo lo aún no escrito"""
+        resolution = resolution or self.pick_resolution(start, end)
+        step = RESOLUTIONS[resolution]
+        start = int(start // step * step)
+        pending = [
+            (bucket, name, agg.copy())
+            for (bucket, name), agg in list(self.open[resolution].items())
+            if start <= bucket < end
+        ]
+        rows = await asyncio.to_thread(self._read_range, resolution, start, end)
+
+        series: Dict[str, Dict[int, Aggregate]] = {}
+        for bucket, name, agg in itertools.chain(rows, pending):
+            if route is not None and name != route:
+                continue
+            points = series.setdefault(name if by_route else "total", {})
+            target = points.get(bucket)
+            if target is None:
+                points[bucket] = agg
+            else:
+                target.merge(agg)
+
+        return {
+            "resolution": resolution,
+            "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            "end": datetime.fromtimestamp(end, timezone.utc).isoformat(),
+            "series": {
+                name: [points[bucket].to_point(bucket) for bucket in sorted(points)]
+                for name, points in sorted(series.items())
+            }
+        }
+
+    async def start(self):
+        """Recuperar el estado en disco e iniciar el volcado periódico"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self.recover)
+        self.is_running = True
+        self.task = asyncio.create_task(self._flusher())
+        logger.info("Historial de métricas iniciado (%s)", self.directory)
+
+    async def stop(self):
+        """Escribir también los intervalos abiertos y detener el volcado"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+        await self.flush(final=True)
+        logger.info("Historial de métricas detenido")
+
+    async def _flusher(self):
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            await asyncio.to_thread(self.expire)
+
+    def get_status(self) -> Dict:
+        return {
+            "directory": str(self.directory),
+            "retention_days": self.retention_days,
+            "open_rows": {resolution: len(rows) for resolution, rows in self.open.items()},
+            **self.stats
+        }
+
+metrics_history = MetricsHistory()
\ No newline at end of file
@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+def route_label(scope: Dict[str, Any]) -> str:
+    """Plantilla de la ruta que atendió la petición; las que no llegaron a una ruta comparten una etiqueta"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or UNMATCHED_ROUTE
+
+class Span:
+    """Tramo medido con perf_counter_ns dentro de una petición"""
+    __slots__ = ("name", "start_ns", "end_ns", "parent", "attributes")
+
+    def __init__(self, name: str, start_ns: int, parent: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.start_ns = start_ns
+        self.end_ns = start_ns
+        self.parent = parent
+        self.attributes = attributes
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+class Trace:
+    """Spans de una petición; el primero (índice 0) es el total"""
+    __slots__ = ("route", "method", "spans", "unix_start_ns", "start_ns")
+
+    def __init__(self, route: str, method: str):
+        self.route = route
+        self.method = method
+        self.spans: List[Span] = []
+        self.unix_start_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+
+    def add(self, name: str, start_ns: int, end_ns: int, parent: int = 0, **attributes) -> Span:
+        item = Span(name, start_ns, parent, attributes)
+        item.end_ns = end_ns
+        self.spans.append(item)
+        return item
+
+    def totals(self) -> Dict[str, List]:
+        """Duración acumulada y descripción de cada tramo, en orden de aparición"""
+        totals: Dict[str, List] = {}
+        for item in self.spans:
+            entry = totals.setdefault(item.name, [0, item.attributes.get("desc")])
+            entry[0] += item.duration_ns
+        return totals
+
+    def server_timing(self) -> str:
+        """Cabecera Server-Timing con la duración acumulada de cada tramo"""
+        return ", ".join(
+            f"{name};desc={desc};dur={duration / 1e6:.3f}" if desc else f"{name};dur={duration / 1e6:.3f}"
+            for name, (duration, desc) in self.totals().items()
+        )
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[int] = contextvars.ContextVar("current_span", default=0)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Medir un tramo de la petición actual. Sin traza activa no hace nada,
+    así que se puede usar en código compartido con tareas de fondo.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = Span(name, time.perf_counter_ns(), _current_span.get(), attributes)
+    trace.spans.append(current)
+    token = _current_span.set(len(trace.spans) - 1)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.perf_counter_ns()
+        _current_span.reset(token)
+
+class Tracer:
+    """
+    Abre una traza por petición, agrega los tramos por ruta y, si
+    TRACE_OTLP_FILE está definido, exporta cada traza como una línea
+    OTLP/JSON (el formato del file exporter del collector).
+    """
+
+    def __init__(self, enabled: bool = None, otlp_file: str = None, export_batch: int = None):
+        self.enabled = enabled if enabled is not None else os.getenv("TRACING_ENABLED", "true") == "true"
+        self.otlp_file = otlp_file if otlp_file is not None else os.getenv("TRACE_OTLP_FILE", "")
+        self.export_batch = export_batch or int(os.getenv("TRACE_EXPORT_BATCH", "100"))
+        self.service_name = os.getenv("TRACE_SERVICE_NAME", "yoga-api")
+        self.route_stats: Dict[str, Dict[str, List[int]]] = {}
+        self._export_buffer: List[str] = []
+        self._export_lock = threading.Lock()
+
+    def start(self, method: str, path: str) -> Optional[Trace]:
+        """Abrir la traza de una petición"""
+        if not self.enabled:
+            return None
+        trace = Trace(path, method)
+        trace.spans.append(Span("total", trace.start_ns, 0, {}))
+        _current_trace.set(trace)
+        _current_span.set(0)
+        return trace
+
+    def finish(self, trace: Trace, status_code: int):
+        """Cerrar la traza, agregarla a su ruta y encolarla para exportar"""
+        trace.spans[0].end_ns = time.perf_counter_ns()
+        trace.spans[0].attributes["http.status_code"] = status_code
+        _current_trace.set(None)
+
+        stats = self.route_stats.setdefault(f"{trace.method} {trace.route}", {})
+        for item in trace.spans:
+            entry = stats.setdefault(item.name, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += item.duration_ns
+            entry[2] = max(entry[2], item.duration_ns)
+
+        if self.otlp_file:
+            self._export_buffer.append(json.dumps(self._to_otlp(trace), separators=(",", ":")))
+            if len(self._export_buffer) >= self.export_batch:
+                self.flush()
+
+    def _to_otlp(self, trace: Trace) -> Dict:
+        trace_id = os.urandom(16).hex()
+        span_ids = [os.urandom(8).hex() for _ in trace.spans]
+        offset = trace.unix_start_ns - trace.start_ns
+        spans = []
+        for index, item in enumerate(trace.spans):
+            spans.append({
+                "traceId": trace_id,
+                "spanId": span_ids[index],
+                "parentSpanId": span_ids[item.parent] if index else "",
+                "name": item.name if index else f"{trace.method} {trace.route}",
+                "kind": 2 if index == 0 else 1,
+                "startTimeUnixNano": str(item.start_ns + offset),
+                "endTimeUnixNano": str(item.end_ns + offset),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in item.attributes.items()
+                ]
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}}
+            ]},
+            "scopeSpans": [{"scope": {"name": "yoga.tracing"}, "spans": spans}]
+        }]}
+
+    def flush(self):
+        """Escribir las trazas pendientes en el archivo OTLP"""
+        with self._export_lock:
+            lines, self._export_buffer = self._export_buffer, []
+            if not lines:
+                return
+            try:
+                with open(self.otlp_file, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                logger.error("Error exportando trazas a %s: %s", self.otlp_file, e)
+
+    def get_route_stats(self) -> Dict:
+        """Tiempo medio y máximo por tramo para cada ruta, en milisegundos"""
+        return {
+            route: {
+                name: {
+                    "count": count,
+                    "avg_ms": round(total / count / 1e6, 3),
+                    "max_ms": round(maximum / 1e6, 3)
+                }
+                for name, (count, total, maximum) in spans.items()
+            }
+            for route, spans in self.route_stats.items()
+        }
+
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def timed(*args, **kwargs):
+            with span("handler"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @wraps(endpoint)
+        def timed(*args, **kwargs):
+            with span("handler"):
+                return endpoint(*args, **kwargs)
+    return timed
+
+class TimedRoute(APIRoute):
+    """
+    Ruta que separa el tiempo de FastAPI alrededor del handler: lo previo
+    (parseo y validación de parámetros) como `validation` y lo posterior
+    (validación y serialización con response_model) como `response`.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route_path = self.path
+
+        async def timed_handler(request):
+            trace = _current_trace.get()
+            if trace is None:
+                return await handler(request)
+            trace.route = route_path
+            first = len(trace.spans)
+            start = time.perf_counter_ns()
+            response = await handler(request)
+            end = time.perf_counter_ns()
+
+            body = next((s for s in trace.spans[first:] if s.name == "handler"), None)
+            if body is not None:
+                trace.add("validation", start, body.start_ns)
+                trace.add("response", body.end_ns, end)
+            return response
+
+        return timed_handler
+
+tracer = Tracer()
\ No newline at end of file
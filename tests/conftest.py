@@ -1,4 +1,5 @@
 import pytest
+import pytest_asyncio
 import asyncio
 import os
 from fastapi.testclient import TestClient
@@ -19,38 +20,27 @@ def test_client():
     with TestClient(app) as client:
         yield client
 
-@pytest.fixture(scope="function")
+@pytest_asyncio.fixture(scope="function")
 async def setup_cache():
-    """Setup para tests de cache"""
-    from app.cache.redis_client import redis_client
-    from app.cache.cache_manager import cache_manager
-    
-    import redis.asyncio as redis
-    from unittest.mock import AsyncMock, MagicMock
-    
-    mock_redis = AsyncMock()
-    mock_redis.ping.return_value = True
-    mock_redis.get.return_value = None
-    mock_redis.setex.return_value = True
-    mock_redis.delete.return_value = 1
-    mock_redis.exists.return_value = 1
-    mock_redis.keys.return_value = []
+    """Setup para tests de cache sobre un Redis en proceso"""
+    from cache.redis_client import redis_client
+    from cache.cache_manager import cache_manager
     
-    redis_client.connection = mock_redis
-    redis_client.connection.keys = AsyncMock(return_value=[])
-    redis_client.connection.delete = AsyncMock(return_value=1)
+    redis_client.use_fake()
     
     yield redis_client, cache_manager
     
     redis_client.connection = None
+    redis_client.local_cache.clear()
 
 @pytest.fixture(scope="function")
 async def setup_database():
     """Setup de base de datos simulada para tests"""
     from app.routes.optimized_api import clases_db, reservas_db, instructores_db
+    from app.models.records import ClaseRecord
     
     test_clases = {
-        1: {
+        1: ClaseRecord.from_dict({
             "id": 1,
             "nombre": "Yoga Principiantes",
             "descripcion": "Clase para iniciantes",
@@ -65,7 +55,7 @@ async def setup_database():
             "activa": True,
             "fecha_creacion": "2024-01-01T00:00:00",
             "fecha_actualizacion": "2024-01-01T00:00:00"
-        }
+        })
     }
     
     test_instructores = {
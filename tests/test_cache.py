@@ -1,19 +1,25 @@
 import pytest
 import asyncio
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from app.cache.redis_client import RedisClient, redis_client
 from app.cache.cache_manager import CacheManager, cache_manager
+from app.cache.circuit_breaker import CircuitBreaker, CircuitState
+from app.cache.adaptive_ttl import AdaptiveTTLPolicy
+from app.cache.keys import KeyBuilder
 import json
+import time
 
 @pytest.mark.asyncio
 class TestRedisClient:
     """Tests para el cliente Redis"""
     
-    async def test_redis_connection(self, setup_cache):
+    async def test_redis_connection(self, setup_cache, monkeypatch):
         """Test de conexión a Redis"""
         redis_client, _ = setup_cache
+        monkeypatch.setenv("REDIS_FAKE", "true")
         await redis_client.connect()
         assert redis_client.connection is not None
+        assert await redis_client.connection.ping()
     
     async def test_set_and_get_value(self, setup_cache):
         """Test de guardar y obtener valores del cache"""
@@ -22,25 +28,162 @@ class TestRedisClient:
         test_key = "test_key"
         test_value = {"clase_id": 1, "nombre": "Yoga Principiantes"}
         
-        redis_client.connection.setex = AsyncMock(return_value=True)
-        
-        redis_client.connection.get = AsyncMock(return_value=json.dumps(test_value))
-        
         await redis_client.set(test_key, test_value)
-        redis_client.connection.setex.assert_called_once()
+        assert await redis_client.connection.get(test_key) == json.dumps(test_value)
+        assert 0 < await redis_client.connection.ttl(test_key) <= 3600
         
         result = await redis_client.get(test_key)
         assert result == test_value
-        redis_client.connection.get.assert_called_once_with(test_key)
     
     async def test_get_nonexistent_key(self, setup_cache):
         """Test de obtener clave que no existe"""
         redis_client, _ = setup_cache
         
-        redis_client.connection.get = AsyncMock(return_value=None)
         result = await redis_client.get("key_inexistente")
         assert result is None
 
+@pytest.mark.asyncio
+class TestRedisClientBatch:
+    """Tests de operaciones en lote del cliente Redis"""
+
+    async def test_mget_single_round_trip(self):
+        """mget debe resolver todas las claves con una sola llamada"""
+        client = RedisClient()
+        client.connection = AsyncMock()
+        client.connection.mget = AsyncMock(return_value=[json.dumps({"id": 1}), None])
+
+        result = await client.mget(["a", "b"])
+
+        assert result == [{"id": 1}, None]
+        client.connection.mget.assert_called_once_with(["a", "b"])
+
+    async def test_mset_with_ttl_uses_pipeline(self):
+        """mset_with_ttl debe encolar un SETEX por clave y ejecutar una vez"""
+        client = RedisClient()
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[True, True])
+        pipe.__aenter__ = AsyncMock(return_value=pipe)
+        pipe.__aexit__ = AsyncMock(return_value=False)
+        client.connection = MagicMock()
+        client.connection.pipeline.return_value = pipe
+
+        await client.mset_with_ttl({"a": 1, "b": 2}, expire=60)
+
+        assert pipe.setex.call_count == 2
+        pipe.execute.assert_awaited_once()
+
+    async def test_delete_many_empty(self):
+        """delete_many sin claves no debe tocar Redis"""
+        client = RedisClient()
+        client.connection = AsyncMock()
+
+        assert await client.delete_many([]) == 0
+        client.connection.delete.assert_not_called()
+
+    async def test_pool_settings_from_env(self, monkeypatch):
+        """La configuración del pool se toma del entorno"""
+        monkeypatch.setenv("REDIS_MAX_CONNECTIONS", "7")
+        monkeypatch.setenv("REDIS_SOCKET_TIMEOUT", "0.25")
+        client = RedisClient()
+
+        assert client.max_connections == 7
+        assert client.socket_timeout == 0.25
+
+class TestCircuitBreaker:
+    """Tests del circuit breaker de Redis"""
+
+    def test_opens_on_failure_rate(self):
+        """El circuito se abre al superar la tasa de error"""
+        breaker = CircuitBreaker("test", min_calls=4, failure_rate_threshold=0.5)
+        for _ in range(2):
+            breaker.record_success()
+        for _ in range(2):
+            breaker.record_failure()
+
+        assert breaker.state is CircuitState.OPEN
+        assert breaker.allow_request() is False
+
+    def test_opens_on_slow_calls(self):
+        """Llamadas lentas también abren el circuito"""
+        breaker = CircuitBreaker("test", min_calls=3, slow_call_threshold=0.05)
+        for _ in range(3):
+            breaker.record_success(slow=True)
+
+        assert breaker.state is CircuitState.OPEN
+
+    def test_half_open_recovers(self):
+        """Tras el timeout, las sondas exitosas cierran el circuito"""
+        breaker = CircuitBreaker("test", min_calls=1, open_timeout=0, half_open_max_calls=2)
+        breaker.record_failure()
+        assert breaker.state is CircuitState.OPEN
+
+        for _ in range(2):
+            assert breaker.allow_request() is True
+            breaker.record_success()
+
+        assert breaker.state is CircuitState.CLOSED
+
+@pytest.mark.asyncio
+class TestRedisFallback:
+    """Tests del modo degradado del cliente Redis"""
+
+    async def test_fallback_to_local_cache(self):
+        """Con Redis caído se sirve desde el cache local sin esperar"""
+        client = RedisClient()
+        client.breaker = CircuitBreaker("test", min_calls=1)
+        client.connection = AsyncMock()
+        client.connection.setex = AsyncMock(side_effect=ConnectionError("down"))
+        client.connection.get = AsyncMock(side_effect=ConnectionError("down"))
+
+        await client.set("clave", {"id": 1}, expire=60)
+        assert client.breaker.state is CircuitState.OPEN
+
+        assert await client.get("clave") == {"id": 1}
+        client.connection.get.assert_not_called()
+
+    async def test_rate_limit_counter_without_redis(self):
+        """El contador de rate limit sigue funcionando en memoria"""
+        client = RedisClient()
+
+        counts = [await client.incr_window("rate_limit:test", 60) for _ in range(3)]
+
+        assert counts == [1, 2, 3]
+
+    async def test_slow_round_trips_open_breaker(self):
+        """Round trips más lentos que el umbral abren el circuito"""
+        from app.cache.fake_redis import FakeRedis
+        client = RedisClient()
+        client.breaker = CircuitBreaker("test", min_calls=2, slow_call_threshold=0.01)
+        client.connection = FakeRedis(latency=0.05)
+
+        for _ in range(2):
+            await client.get("clave")
+
+        assert client.breaker.state is CircuitState.OPEN
+
+    async def test_event_loop_lag_is_not_slow(self):
+        """Un event loop bloqueado no cuenta como llamada lenta de Redis"""
+        from app.cache.fake_redis import FakeRedis
+        client = RedisClient()
+        client.breaker = CircuitBreaker("test", min_calls=1, slow_call_threshold=0.02)
+        client.connection = FakeRedis()
+
+        asyncio.get_running_loop().call_soon(time.sleep, 0.1)
+        await client.get("clave")
+
+        assert list(client.breaker.window) == [(False, False)]
+
+    async def test_scan_is_not_timed(self):
+        """Un SCAN de varias vueltas no entra en el umbral de llamada lenta"""
+        from app.cache.fake_redis import FakeRedis
+        client = RedisClient()
+        client.breaker = CircuitBreaker("test", min_calls=1, slow_call_threshold=0.01)
+        client.connection = FakeRedis(latency=0.03)
+        await client.connection.set("clase:1", "{}")
+
+        assert await client.scan_keys("clase:*") == ["clase:1"]
+        assert list(client.breaker.window) == [(False, False)]
+
 @pytest.mark.asyncio 
 class TestCacheManager:
     """Tests para el gestor de cache"""
@@ -50,37 +193,412 @@ class TestCacheManager:
         cache_manager = CacheManager()
         key = cache_manager._generate_key("test_func", "arg1", kwarg1="value1")
         
-        assert key.startswith("yoga_")
+        assert key.startswith("yoga:test_func:")
         assert len(key) > 10
     
+    async def test_key_builder_canonical(self):
+        """Las claves son legibles, con enums normalizados y defaults aplicados"""
+        from fastapi import Query
+        from app.models.optimized import TipoYoga, NivelDificultad
+
+        async def listar_clases(
+            tipo: TipoYoga = Query(None),
+            nivel: NivelDificultad = Query(None),
+            activa: bool = Query(True)
+        ):
+            return []
+
+        builder = KeyBuilder(listar_clases, "listar_clases", version=3)
+
+        assert builder.build((), {"tipo": TipoYoga.HATHA}) == "yoga:listar_clases:v3:tipo=hatha:nivel=*:activa=true"
+        assert builder.build((), {"tipo": "hatha", "activa": True}) == builder.build((TipoYoga.HATHA,), {})
+    
+    async def test_key_builder_hashes_long_tail(self):
+        """Las claves largas conservan el namespace y acortan la cola"""
+        async def buscar(q: str):
+            return []
+
+        key = KeyBuilder(buscar, "buscar", max_length=64).build(("x" * 500,), {})
+
+        assert key.startswith("yoga:buscar:v1:q=")
+        assert len(key) < 64
+
+    async def test_key_builder_patterns_match_escaped_and_long_values(self):
+        """Los patrones no se rompen con metacaracteres glob ni con valores largos"""
+        from fnmatch import fnmatchcase
+
+        async def buscar(q: str, tipo: str = None):
+            return []
+
+        builder = KeyBuilder(buscar, "buscar")
+        glob = builder.build(("y*ga[1]?",), {"tipo": "hatha"})
+        assert "*" not in glob and "[" not in glob and "?" not in glob
+        assert fnmatchcase(glob, builder.pattern({"q": "y*ga[1]?"}))
+        assert not fnmatchcase(builder.build(("yoga1x",), {}), builder.pattern({"q": "y*ga[1]?"}))
+
+        largo = "x" * 500
+        key = builder.build((largo,), {"tipo": "hatha"})
+        assert fnmatchcase(key, builder.pattern({"q": largo}))
+        assert fnmatchcase(key, builder.pattern({"tipo": "hatha"}))
+        assert fnmatchcase(key, "yoga:buscar:*")
+    
     async def test_cached_decorator_hit(self, setup_cache):
         """Test de decorador cached - cache hit"""
-        _, cache_manager = setup_cache
+        redis_client, cache_manager = setup_cache
+        calls = []
         
-        mock_func = AsyncMock(return_value={"data": "test"})
+        async def obtener(arg):
+            calls.append(arg)
+            return {"data": "fresh"}
         
-        cache_manager.redis_client.get = AsyncMock(return_value={"data": "cached"})
-        
-        decorated_func = cache_manager.cached(expire=300)(mock_func)
+        decorated_func = cache_manager.cached(expire=300, key_prefix="test_hit")(obtener)
+        await redis_client.connection.setex(
+            decorated_func.cache_key("test_arg"), 300, json.dumps({"data": "cached"})
+        )
         result = await decorated_func("test_arg")
         
         assert result == {"data": "cached"}
-        mock_func.assert_not_called()
+        assert calls == []
     
     async def test_cached_decorator_miss(self, setup_cache):
         """Test de decorador cached - cache miss"""
-        _, cache_manager = setup_cache
+        redis_client, cache_manager = setup_cache
+        calls = []
         
-        mock_func = AsyncMock(return_value={"data": "fresh"})
+        async def obtener(arg):
+            calls.append(arg)
+            return {"data": "fresh"}
         
-        cache_manager.redis_client.get = AsyncMock(return_value=None)
-        cache_manager.redis_client.set = AsyncMock()
-        
-        decorated_func = cache_manager.cached(expire=300)(mock_func)
+        decorated_func = cache_manager.cached(expire=300, key_prefix="test_miss")(obtener)
         result = await decorated_func("test_arg")
         
         assert result == {"data": "fresh"}
-        mock_func.assert_called_once()
+        assert calls == ["test_arg"]
+        assert await redis_client.connection.exists(decorated_func.cache_key("test_arg")) == 1
+
+    async def test_invalidate_matching_scans_redis(self, setup_cache):
+        """La invalidación por patrón recorre Redis con SCAN y borra solo lo que coincide"""
+        redis_client, cache_manager = setup_cache
+
+        async def listar(tipo: str, activa: bool = True):
+            return [tipo]
+
+        decorated_func = cache_manager.cached(expire=300, key_prefix="test_scan")(listar)
+        for tipo in ("hatha", "vinyasa"):
+            for activa in (True, False):
+                await decorated_func(tipo, activa)
+        for i in range(40):
+            await redis_client.connection.set(f"otra:{i}", i)
+
+        await cache_manager.invalidate_matching(decorated_func.cache_pattern(tipo="hatha"))
+
+        remaining = [key async for key in redis_client.connection.scan_iter(match="yoga:test_scan:*")]
+        assert sorted(remaining) == sorted(
+            decorated_func.cache_key("vinyasa", activa) for activa in (True, False)
+        )
+        assert await redis_client.connection.dbsize() == 42
+
+    async def test_invalidate_counts_one_write_per_namespace(self, setup_cache):
+        """Una mutación cuenta una escritura por namespace, no por clave o patrón"""
+        redis_client, cache_manager = setup_cache
+        for namespace in ("test_uno", "test_dos"):
+            cache_manager.ttl_policy.configure(namespace, base_ttl=300)
+
+        await cache_manager.invalidate(
+            keys=["yoga:test_uno:a", "yoga:test_uno:b", "yoga:test_dos:a"],
+            patterns=["yoga:test_dos:dia=lunes*", "yoga:test_dos:dia=martes*"]
+        )
+
+        assert cache_manager.ttl_policy.namespaces["test_uno"].writes == 1
+        assert cache_manager.ttl_policy.namespaces["test_dos"].writes == 1
+
+class TestAdaptiveTTL:
+    """Tests de TTL adaptativo por namespace"""
+
+    def test_base_ttl_without_writes(self):
+        """Sin escrituras observadas se usa el TTL configurado"""
+        policy = AdaptiveTTLPolicy(staleness_budget=0.1, tau=60)
+        policy.configure("listar_clases", 180, min_ttl=15, max_ttl=900)
+
+        assert policy.ttl_for("listar_clases") == 180
+
+    def test_write_rate_shortens_ttl(self):
+        """Muchas escrituras acercan el TTL al mínimo configurado"""
+        policy = AdaptiveTTLPolicy(staleness_budget=0.1, tau=60)
+        policy.configure("clase_detalle", 240, min_ttl=30, max_ttl=1800)
+        for _ in range(100):
+            policy.record_write("clase_detalle")
+
+        assert policy.ttl_for("clase_detalle") == 30
+
+    def test_staleness_budget_must_be_a_probability(self):
+        """Un presupuesto fuera de (0, 1) se rechaza al configurar, no en cada ttl_for"""
+        for budget in (0, 1, 1.5, -0.1):
+            with pytest.raises(ValueError):
+                AdaptiveTTLPolicy(staleness_budget=budget)
+
+    def test_snapshot_reports_hit_ratio(self):
+        """El snapshot expone TTL elegido y ratio de aciertos"""
+        policy = AdaptiveTTLPolicy()
+        policy.configure("listar_clases", 180)
+        policy.record_miss("listar_clases")
+        for _ in range(3):
+            policy.record_hit("listar_clases")
+
+        snapshot = policy.snapshot()["listar_clases"]
+        assert snapshot["hit_ratio"] == 0.75
+        assert snapshot["ttl"] == 180
+
+@pytest.mark.asyncio
+class TestCacheWarmup:
+    """Tests de precalentamiento y refresh-ahead"""
+
+    async def test_warm_up_and_refresh_ahead(self):
+        """El warm-up puebla el cache y las claves calientes se recalculan"""
+        from cache.cache_manager import cache_manager as app_cache_manager
+        from cache.warmup import CacheWarmer
+
+        calls = []
+
+        async def listar(tipo=None):
+            calls.append(tipo)
+            return {"tipo": tipo}
+
+        cached_listar = app_cache_manager.cached(expire=1, key_prefix="warmup_test")(listar)
+        warmer = CacheWarmer(refresh_margin=5, min_hits=1)
+
+        await warmer.warm_up([(cached_listar, {"tipo": "hatha"})])
+        assert warmer.is_ready
+        assert calls == ["hatha"]
+
+        assert await cached_listar(tipo="hatha") == {"tipo": "hatha"}
+        assert calls == ["hatha"]
+
+        assert await warmer.refresh_hot_keys() >= 1
+        assert calls == ["hatha", "hatha"]
+
+    async def test_refresh_skips_value_invalidated_meanwhile(self):
+        """Un refresh que se cruza con una invalidación no vuelve a guardar el valor viejo"""
+        from cache.cache_manager import cache_manager as app_cache_manager
+        from cache.redis_client import redis_client
+
+        estado = {"version": 1}
+
+        async def detalle():
+            leido = estado["version"]
+            if leido == 2:
+                # La mutación y su invalidación llegan mientras se recalcula
+                estado["version"] = 3
+                await app_cache_manager.invalidate_keys(cached_detalle.cache_key())
+            return {"version": leido}
+
+        cached_detalle = app_cache_manager.cached(expire=60, key_prefix="refresh_race")(detalle)
+        assert await cached_detalle() == {"version": 1}
+        key = cached_detalle.cache_key()
+        estado["version"] = 2
+
+        assert not await app_cache_manager.refresh(key)
+        assert await redis_client.get(key) is None
+        assert await cached_detalle() == {"version": 3}
+
+@pytest.mark.asyncio
+class TestFakeRedis:
+    """Tests del Redis en proceso usado por las pruebas y los benchmarks"""
+
+    async def test_ttl_expiry(self, monkeypatch):
+        from cache import fake_redis
+
+        now = [1000.0]
+        monkeypatch.setattr(fake_redis.time, "monotonic", lambda: now[0])
+        client = fake_redis.FakeRedis()
+
+        await client.set("clave", "valor", ex=10)
+        assert await client.ttl("clave") == 10
+        now[0] += 10.5
+        assert await client.get("clave") is None
+        assert await client.exists("clave") == 0
+
+    async def test_incr_window_pipeline(self, setup_cache):
+        redis_client, _ = setup_cache
+
+        counts = [await redis_client.incr_window("rate:test", 60) for _ in range(3)]
+
+        assert counts == [1, 2, 3]
+        assert redis_client.connection.stats["round_trips"] == 3
+        assert 0 < await redis_client.connection.ttl("rate:test") <= 60
+
+    async def test_sorted_set_ranges(self):
+        from cache.fake_redis import FakeRedis
+
+        client = FakeRedis()
+        await client.zadd("ranking", {"a": 3, "b": 1, "c": 2})
+        await client.zincrby("ranking", 5, "b")
+
+        assert await client.zrange("ranking", 0, -1) == ["c", "a", "b"]
+        assert await client.zrevrange("ranking", 0, 0, withscores=True) == [("b", 6.0)]
+        assert await client.zrangebyscore("ranking", "(2", "+inf") == ["a", "b"]
+
+    async def test_pubsub(self):
+        from cache.fake_redis import FakeRedis
+
+        client = FakeRedis()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.psubscribe("cache:*")
+
+        assert await client.publish("cache:invalidate", "clases") == 1
+        message = await pubsub.get_message(timeout=0.1)
+        assert message["channel"] == "cache:invalidate"
+        assert message["data"] == "clases"
+
+    async def test_script_is_atomic(self):
+        from cache.fake_redis import FakeRedis
+
+        def reservar(server, keys, args):
+            libres = int(server.get(keys[0]) or 0)
+            if libres < int(args[0]):
+                return 0
+            server.decr(keys[0], int(args[0]))
+            return 1
+
+        client = FakeRedis(latency=0.001)
+        await client.set("cupos", 5)
+        script = client.register_script(reservar)
+
+        results = await asyncio.gather(*(script(keys=["cupos"], args=[1]) for _ in range(8)))
+
+        assert sorted(results) == [0, 0, 0, 1, 1, 1, 1, 1]
+        assert await client.get("cupos") == "0"
+
+class TestCompression:
+    """Tests de negociación de Content-Encoding y cuerpos precomprimidos en cache"""
+
+    def test_negotiate_honours_q_values(self):
+        from cache.compression import negotiate
+
+        assert negotiate("gzip, deflate", ("gzip",)) == "gzip"
+        assert negotiate("br;q=1.0, gzip;q=0.5", ("gzip",)) == "gzip"
+        assert negotiate("gzip;q=0", ("gzip",)) is None
+        assert negotiate("*", ("br", "gzip")) == "br"
+        assert negotiate("identity", ("gzip",)) is None
+        assert negotiate(None, ("gzip",)) is None
+
+    @pytest.mark.asyncio
+    async def test_cached_response_is_compressed_once(self, setup_cache, monkeypatch):
+        import gzip
+        from starlette.responses import Response
+        from cache import compression
+
+        _, cache_manager = setup_cache
+        calls = []
+        stored, dynamic = compression.CODECS["gzip"]
+
+        def counting(data):
+            calls.append(len(data))
+            return stored(data)
+
+        monkeypatch.setitem(compression.CODECS, "gzip", (counting, dynamic))
+        body = json.dumps([{"id": i, "nombre": "Yoga Hatha", "nivel": "intermedio"} for i in range(100)])
+
+        @cache_manager.cached(expire=60, key_prefix="test_gzip")
+        async def listado():
+            return Response(content=body, media_type="application/json")
+
+        token = compression.set_accept_encoding("gzip, deflate")
+        try:
+            miss = await listado()
+            hits = [await listado() for _ in range(3)]
+        finally:
+            compression.reset_accept_encoding(token)
+        plain = await listado()
+
+        assert len(calls) == 1
+        for response in [miss, *hits]:
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.headers["vary"] == "Accept-Encoding"
+            assert gzip.decompress(response.body).decode() == body
+        assert "content-encoding" not in plain.headers
+        assert plain.headers["vary"] == "Accept-Encoding"
+        assert plain.body.decode() == body
+
+    @pytest.mark.asyncio
+    async def test_variants_stored_as_raw_bytes(self, setup_cache):
+        """Cada codificación va en su clave y un hit lee solo la negociada en un round trip"""
+        import gzip
+        from starlette.responses import Response
+        from cache import compression
+
+        redis_client, cache_manager = setup_cache
+        body = json.dumps([{"id": i, "nombre": "Yoga Hatha", "nivel": "intermedio"} for i in range(100)])
+
+        @cache_manager.cached(expire=60, key_prefix="test_variants")
+        async def listado():
+            return Response(content=body, media_type="application/json")
+
+        token = compression.set_accept_encoding("gzip")
+        try:
+            await listado()
+            key = listado.cache_key()
+            server = redis_client.connection.server
+            assert isinstance(server.data[f"{key}:enc=gzip"], bytes)
+            assert server.data[f"{key}:enc=identity"] == body.encode()
+            assert len(server.data[key]) < 200
+
+            round_trips = redis_client.connection.stats["round_trips"]
+            hit = await listado()
+            assert redis_client.connection.stats["round_trips"] == round_trips + 1
+        finally:
+            compression.reset_accept_encoding(token)
+        assert gzip.decompress(hit.body).decode() == body
+
+        await cache_manager.invalidate_keys(key)
+        assert not [k for k in server.data if k.startswith(key)]
+
+    @pytest.mark.asyncio
+    async def test_small_responses_are_not_compressed(self, setup_cache):
+        from starlette.responses import Response
+        from cache import compression
+
+        _, cache_manager = setup_cache
+
+        @cache_manager.cached(expire=60, key_prefix="test_small")
+        async def detalle():
+            return Response(content=b'{"id": 1}', media_type="application/json")
+
+        token = compression.set_accept_encoding("gzip")
+        try:
+            response = await detalle()
+        finally:
+            compression.reset_accept_encoding(token)
+
+        assert "content-encoding" not in response.headers
+        assert "vary" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_middleware_negotiates_encoding(self, sample_clase_data):
+        from httpx import AsyncClient
+        from main import app
+        from middleware.compression import CompressionMiddleware
+
+        async with AsyncClient(app=CompressionMiddleware(app), base_url="http://test") as client:
+            for i in range(8):
+                response = await client.post("/api/v1/clases", json={
+                    **sample_clase_data, "nombre": f"Compresion Vinyasa {i}", "instructor_id": 2
+                })
+                assert response.status_code == 200
+            listado = await client.get("/api/v1/clases?instructor_id=2", headers={"Accept-Encoding": "gzip"})
+            cacheado = await client.get("/api/v1/clases?instructor_id=2", headers={"Accept-Encoding": "gzip"})
+            busqueda = await client.get("/api/v1/clases/buscar?q=compresion", headers={"Accept-Encoding": "gzip"})
+            identidad = await client.get("/api/v1/clases/buscar?q=compresion", headers={"Accept-Encoding": "identity"})
+            chica = await client.get("/health", headers={"Accept-Encoding": "gzip"})
+
+        for response in (listado, cacheado, busqueda):
+            assert response.headers["content-encoding"] == "gzip"
+            assert "Accept-Encoding" in response.headers["vary"]
+        assert cacheado.json() == listado.json()
+        assert len(busqueda.json()) == 8
+        assert "content-encoding" not in identidad.headers
+        assert identidad.json() == busqueda.json()
+        assert "content-encoding" not in chica.headers
 
 @pytest.mark.asyncio
 class TestCacheIntegration:
@@ -96,17 +614,12 @@ class TestCacheIntegration:
             await asyncio.sleep(0.01)
             return {"data": "resultado"}
         
-        cache_manager.redis_client.get = AsyncMock(return_value=None)
-        cache_manager.redis_client.set = AsyncMock()
-        
         cached_function = cache_manager.cached(expire=60)(slow_function)
         
         start_time = time.time()
         result1 = await cached_function()
         first_call_time = time.time() - start_time
         
-        cache_manager.redis_client.get = AsyncMock(return_value=result1)
-        
         start_time = time.time()
         result2 = await cached_function()
         second_call_time = time.time() - start_time
@@ -39,19 +39,412 @@ class TestPerformance:
 
     @pytest.mark.asyncio
     async def test_cache_performance(self):
-        """Test de performance del cache"""
+        """La segunda petición sale del cache sin recalcular el listado"""
+        from cache.cache_manager import cache_manager
+
+        stats = cache_manager.ttl_policy.namespaces["listar_clases"]
         async with AsyncClient(app=app, base_url="http://test") as client:
-            start_time_1 = time.time()
-            await client.get("/api/v1/clases")
-            end_time_1 = time.time()
-            first_request_time = end_time_1 - start_time_1
-
-            start_time_2 = time.time()
-            await client.get("/api/v1/clases")
-            end_time_2 = time.time()
-            second_request_time = end_time_2 - start_time_2
-
-            logger.info(f"Primera request: {first_request_time:.3f}s")
-            logger.info(f"Segunda request: {second_request_time:.3f}s")
-            
-            assert second_request_time < first_request_time * 0.5
\ No newline at end of file
+            first = await client.get("/api/v1/clases?nivel=avanzado")
+            hits, misses = stats.hits, stats.misses
+            second = await client.get("/api/v1/clases?nivel=avanzado")
+
+        assert (stats.hits, stats.misses) == (hits + 1, misses)
+        assert second.json() == first.json()
+
+class TestAdmissionControl:
+    """Tests del limitador de concurrencia adaptativo"""
+
+    @pytest.mark.asyncio
+    async def test_slow_responses_shrink_limit(self):
+        from middleware.admission import AdaptiveLimiter
+
+        limiter = AdaptiveLimiter(initial_limit=20, min_limit=2, target_latency=0.1)
+        for _ in range(10):
+            await limiter.acquire()
+            limiter.release(latency=0.5)
+        assert limiter.limit < 8
+
+        for _ in range(6):
+            await limiter.acquire()
+        before = limiter.limit
+        for _ in range(2):
+            limiter.release(latency=0.01)
+        assert limiter.limit > before
+
+    @pytest.mark.asyncio
+    async def test_full_queue_fails_fast_and_prefers_reservations(self):
+        from middleware.admission import (
+            AdaptiveLimiter, AdmissionRejected, PRIORITY_CRITICAL, PRIORITY_LOW
+        )
+
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, queue_size=1, queue_timeout=1)
+        await limiter.acquire()
+
+        listado = asyncio.create_task(limiter.acquire(PRIORITY_LOW))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await limiter.acquire(PRIORITY_LOW)
+
+        reserva = asyncio.create_task(limiter.acquire(PRIORITY_CRITICAL))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await listado
+
+        limiter.release(latency=0.01)
+        await asyncio.wait_for(reserva, 1)
+        assert limiter.in_flight == 1
+        assert limiter.stats["evicted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_overload_returns_503_with_retry_after(self):
+        from fastapi import FastAPI
+        from middleware.admission import AdaptiveLimiter, AdmissionControlMiddleware
+
+        test_app = FastAPI()
+        test_app.add_middleware(
+            AdmissionControlMiddleware,
+            limiter=AdaptiveLimiter(initial_limit=1, min_limit=1, queue_size=0)
+        )
+
+        @test_app.get("/lento")
+        async def lento():
+            await asyncio.sleep(0.05)
+            return {"ok": True}
+
+        async with AsyncClient(app=test_app, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.get("/lento") for _ in range(3)))
+
+        statuses = sorted(r.status_code for r in responses)
+        assert statuses == [200, 503, 503]
+        assert all(r.headers["Retry-After"] == "1" for r in responses if r.status_code == 503)
+
+class TestTracing:
+    """Tests de Server-Timing y exportación de spans"""
+
+    @pytest.mark.asyncio
+    async def test_server_timing_breakdown(self):
+        """La respuesta detalla validación, handler, cache y serialización"""
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            await client.get("/api/v1/clases?nivel=avanzado")
+            response = await client.get("/api/v1/clases?nivel=avanzado")
+            stats = (await client.get("/api/v1/metrics/timing")).json()
+
+        timing = response.headers["Server-Timing"]
+        names = [entry.split(";")[0] for entry in timing.split(", ")]
+        assert names[0] == "total"
+        assert {"validation", "handler", "cache", "response"} <= set(names)
+        assert "cache;desc=hit" in timing
+        assert stats["GET /api/v1/clases"]["handler"]["count"] >= 2
+
+    @pytest.mark.asyncio
+    async def test_route_stats_use_templates(self):
+        """Las estadísticas se agrupan por plantilla; lo que no llega a una ruta comparte una etiqueta"""
+        from middleware.performance import PerformanceMiddleware
+        from monitoring.tracing import UNMATCHED_ROUTE, tracer
+
+        tracer.route_stats.clear()
+        async with AsyncClient(app=PerformanceMiddleware(app), base_url="http://test") as client:
+            for clase_id in (1, 2, 3):
+                await client.get(f"/api/v1/clases/{clase_id}")
+            await client.get("/no/existe/1")
+            await client.get("/no/existe/2")
+
+        assert set(tracer.route_stats) == {"GET /api/v1/clases/{clase_id}", f"GET {UNMATCHED_ROUTE}"}
+
+    def test_otlp_file_export(self, tmp_path):
+        import json
+        from monitoring.tracing import Tracer, span
+
+        sink = tmp_path / "traces.jsonl"
+        tracer = Tracer(enabled=True, otlp_file=str(sink), export_batch=1)
+        trace = tracer.start("GET", "/api/v1/horario")
+        with span("cache", desc="miss"):
+            with span("redis"):
+                pass
+        tracer.finish(trace, 200)
+
+        exported = json.loads(sink.read_text().splitlines()[0])
+        spans = exported["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [s["name"] for s in spans] == ["GET /api/v1/horario", "cache", "redis"]
+        assert spans[2]["parentSpanId"] == spans[1]["spanId"]
+        assert int(spans[0]["endTimeUnixNano"]) >= int(spans[2]["endTimeUnixNano"])
+
+class TestProfiling:
+    """Tests del buffer de peticiones lentas y el profiler por muestreo"""
+
+    def test_slow_store_keeps_slowest_per_route(self):
+        from monitoring.profiling import SlowRequestStore
+
+        store = SlowRequestStore(per_route=3)
+        built = []
+        for duration in [5, 1, 9, 3, 7, 2]:
+            store.record("GET /x", duration * 1_000_000, lambda d=duration: built.append(d) or {"d": d})
+
+        assert [r["d"] for r in store.get("GET /x")["GET /x"]] == [9, 7, 5]
+        assert 2 not in built
+
+    @pytest.mark.asyncio
+    async def test_slow_requests_endpoint(self, monkeypatch):
+        from monitoring.profiling import slow_requests
+
+        monkeypatch.setenv("ADMIN_TOKEN", "secreto")
+        slow_requests.clear()
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            await client.get("/api/v1/horario?dia=3&desde=08:00:00")
+            response = await client.get(
+                "/api/v1/admin/slow-requests",
+                params={"route": "GET /api/v1/horario"},
+                headers={"X-Admin-Token": "secreto"}
+            )
+
+        stored = response.json()["GET /api/v1/horario"]
+        assert stored[0]["query_params"]["dia"] == "3"
+        assert "handler" in stored[0]["spans_ms"]
+
+    @pytest.mark.asyncio
+    async def test_admin_endpoints_fail_closed(self, monkeypatch):
+        """Sin ADMIN_TOKEN los endpoints no existen y con token exigen el correcto"""
+        monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            assert (await client.get("/api/v1/admin/slow-requests")).status_code == 404
+            monkeypatch.setenv("ADMIN_TOKEN", "secreto")
+            assert (await client.get("/api/v1/admin/slow-requests")).status_code == 403
+            response = await client.get("/api/v1/admin/slow-requests", headers={"X-Admin-Token": "otro"})
+            assert response.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_profile_returns_collapsed_stacks(self):
+        from monitoring.profiling import SamplingProfiler
+
+        profiler = SamplingProfiler(interval=0.001)
+
+        async def busy():
+            await asyncio.sleep(0.01)
+            end = time.perf_counter() + 0.1
+            while time.perf_counter() < end:
+                sum(range(1000))
+
+        task = asyncio.create_task(busy())
+        collapsed = await profiler.profile(seconds=0.1)
+        await task
+
+        lines = collapsed.splitlines()
+        assert profiler.samples > 0
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("test_performance.py:busy" in line for line in lines)
+
+    @pytest.mark.asyncio
+    async def test_slow_requests_bounded_without_tracing(self, monkeypatch):
+        """Sin trazas, las peticiones lentas también se agrupan por plantilla de ruta"""
+        from middleware.performance import PerformanceMiddleware
+        from monitoring.profiling import slow_requests
+        from monitoring.tracing import tracer
+
+        monkeypatch.setattr(tracer, "enabled", False)
+        slow_requests.clear()
+        async with AsyncClient(app=PerformanceMiddleware(app), base_url="http://test") as client:
+            for clase_id in (1, 2, 3):
+                await client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=1")
+            await client.get("/no/existe")
+
+        assert set(slow_requests.routes) == {"POST /api/v1/clases/{clase_id}/reservar", "GET <unmatched>"}
+
+class TestEventLoopMonitor:
+    """Tests del monitor de lag del event loop"""
+
+    @pytest.mark.asyncio
+    async def test_detects_blocking_call_with_stack(self):
+        from monitoring.loop_monitor import LoopLagMonitor
+
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.03)
+        await monitor.start()
+        await asyncio.sleep(0.05)
+
+        def bloqueante():
+            time.sleep(0.12)
+
+        bloqueante()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert monitor.blocked_total == 1
+        event = monitor.blocking_events[0]
+        assert event["lag_ms"] >= 80
+        assert any("bloqueante" in frame for frame in event["stack"])
+        assert monitor.percentiles()["max"] >= 80
+
+    def test_lag_raises_alert(self):
+        from monitoring.alerts import AlertManager
+
+        manager = AlertManager()
+        manager.check_loop_alerts({"threshold_ms": 100, "lag_ms": {"p99": 250.0, "max": 300.0}})
+        manager.check_loop_alerts({"threshold_ms": 100, "lag_ms": {"p99": 250.0, "max": 300.0}})
+
+        active = manager.get_active_alerts()
+        assert len(active) == 1
+        assert active[0]["source"] == "event_loop"
+
+class TestLogPipeline:
+    """Tests del logging por cola con salida JSON"""
+
+    def _record(self, msg, *args, level=logging.WARNING, **extra):
+        record = logging.LogRecord("yoga.test", level, __file__, 1, msg, args, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_repetitive_messages_are_limited_per_template(self):
+        from monitoring.log_pipeline import RepetitionFilter
+
+        log_filter = RepetitionFilter(burst=3, window=0.05, debug_sample_rate=1.0)
+        passed = [
+            log_filter.filter(self._record("Rate limit excedido para %s en %s", f"10.0.0.{i}", "/clases"))
+            for i in range(10)
+        ]
+        assert passed == [True] * 3 + [False] * 7
+        assert log_filter.filter(self._record("Otro mensaje"))
+
+        time.sleep(0.06)
+        record = self._record("Rate limit excedido para %s en %s", "10.0.0.1", "/clases")
+        assert log_filter.filter(record)
+        assert record.suppressed == 7
+
+    def test_repetition_filter_is_bounded(self):
+        """Mensajes únicos (f-strings) no hacen crecer el filtro sin límite"""
+        from monitoring.log_pipeline import RepetitionFilter
+
+        log_filter = RepetitionFilter(burst=1, window=60, max_keys=5)
+        for _ in range(3):
+            log_filter.filter(self._record("Plantilla caliente %s", 1))
+        for i in range(100):
+            assert log_filter.filter(self._record(f"Error aplicando cambio {i}"))
+            log_filter.filter(self._record("Plantilla caliente %s", 1))
+        assert len(log_filter._windows) == 5
+        assert not log_filter.filter(self._record("Plantilla caliente %s", 1))
+
+    def test_json_formatter_includes_extra_fields(self):
+        import json
+        from monitoring.log_pipeline import JsonFormatter
+
+        line = JsonFormatter().format(self._record("Lentitud detectada en %s: %.3fs", "/clases", 1.5, route="/clases"))
+        data = json.loads(line)
+        assert data["msg"] == "Lentitud detectada en /clases: 1.500s"
+        assert data["level"] == "WARNING"
+        assert data["route"] == "/clases"
+
+    def test_queue_listener_writes_records(self, capsys):
+        import json
+        from monitoring.log_pipeline import setup_logging, stop_logging
+
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        try:
+            setup_logging(logging.INFO, json_output=True)
+            logging.getLogger("yoga.test").info("Reserva %s confirmada", 42)
+            stop_logging()
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+        lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+        assert {"logger": "yoga.test", "msg": "Reserva 42 confirmada"}.items() <= lines[-1].items()
+
+class TestMetricsHistory:
+    """Tests del historial persistente de métricas por ruta"""
+
+    DAY = 1_700_006_400  # medianoche UTC
+
+    @pytest.mark.asyncio
+    async def test_minutes_roll_up_and_survive_restart(self, tmp_path):
+        from monitoring.timeseries import MetricsHistory
+
+        history = MetricsHistory(directory=str(tmp_path))
+        for minute in range(10):
+            for i in range(100):
+                status = 500 if i == 0 else 200
+                history.record("GET /api/v1/clases", 1 + i % 10, status, now=self.DAY + minute * 60 + 1)
+        history.record("POST /api/v1/reservas", 40, 201, now=self.DAY + 30)
+        await history.flush(now=self.DAY + 600)
+
+        reopened = MetricsHistory(directory=str(tmp_path))
+        minutes = await reopened.query(self.DAY, self.DAY + 600, "1m", route="GET /api/v1/clases")
+        points = minutes["series"]["total"]
+        assert len(points) == 10
+        assert points[0]["requests"] == 100
+        assert points[0]["error_rate"] == 0.01
+        assert 8 <= points[0]["p95_ms"] <= 10
+
+        rollup = await reopened.query(self.DAY, self.DAY + 600, "5m", by_route=True)
+        assert [p["requests"] for p in rollup["series"]["GET /api/v1/clases"]] == [500, 500]
+        assert rollup["series"]["GET /api/v1/clases"][0]["p95_ms"] == points[0]["p95_ms"]
+        assert rollup["series"]["POST /api/v1/reservas"][0]["max_ms"] == 40
+
+    @pytest.mark.asyncio
+    async def test_recover_rebuilds_unwritten_rollups_and_truncated_tail(self, tmp_path):
+        from monitoring.timeseries import MetricsHistory
+
+        history = MetricsHistory(directory=str(tmp_path))
+        for minute in range(3):
+            history.record("GET /api/v1/horario", 5, 200, now=self.DAY + minute * 60)
+        await history.flush(now=self.DAY + 180)
+        minute_file = history.path_for("1m", "2023-11-15")
+        size = minute_file.stat().st_size
+        with open(minute_file, "ab") as f:
+            f.write(b"YTSB\x01")
+
+        restarted = MetricsHistory(directory=str(tmp_path))
+        restarted.recover(now=self.DAY + 200)
+        await restarted.flush(final=True)
+
+        assert minute_file.stat().st_size == size
+        hourly = await restarted.query(self.DAY, self.DAY + 3600, "1h")
+        assert hourly["series"]["total"][0]["requests"] == 3
+
+    def test_retention_and_resolution_choice(self, tmp_path):
+        from monitoring.timeseries import MetricsHistory
+
+        history = MetricsHistory(directory=str(tmp_path), retention_days={"1m": 2, "5m": 30, "1h": 365})
+        for resolution, day in (("1m", "2023-11-10"), ("1m", "2023-11-14"), ("5m", "2023-11-10")):
+            path = history.path_for(resolution, day)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"")
+
+        assert history.expire(now=self.DAY) == 1
+        assert not history.path_for("1m", "2023-11-10").exists()
+        assert history.path_for("5m", "2023-11-10").exists()
+
+        assert history.pick_resolution(self.DAY - 3600, self.DAY, now=self.DAY) == "1m"
+        assert history.pick_resolution(self.DAY - 4 * 86400, self.DAY, now=self.DAY) == "5m"
+        assert history.pick_resolution(self.DAY - 90 * 86400, self.DAY, now=self.DAY) == "1h"
+
+    @pytest.mark.asyncio
+    async def test_history_routes_are_templates(self):
+        """El historial guarda una serie por plantilla de ruta, no por URL"""
+        from middleware.performance import PerformanceMiddleware
+        from monitoring.timeseries import MetricsHistory, metrics_history
+
+        metrics_history.open["1m"].clear()
+        async with AsyncClient(app=PerformanceMiddleware(app), base_url="http://test") as client:
+            for clase_id in range(1, 6):
+                await client.get(f"/api/v1/clases/{clase_id}")
+            await client.get("/no/existe")
+
+        routes = {route for _, route in metrics_history.open["1m"]}
+        assert routes == {"GET /api/v1/clases/{clase_id}", "GET <unmatched>"}
+
+        capped = MetricsHistory(max_routes=2)
+        for i in range(5):
+            capped.record(f"GET /ruta/{i}", 1, 200, now=self.DAY)
+        assert {route for _, route in capped.open["1m"]} == {"GET /ruta/0", "GET /ruta/1", "<otras>"}
+
+    @pytest.mark.asyncio
+    async def test_history_endpoint(self):
+        from monitoring.timeseries import metrics_history
+
+        metrics_history.record("GET /api/v1/clases", 12, 200)
+        async with AsyncClient(app=app, base_url="http://test") as client:
+            response = await client.get("/api/v1/metrics/history?resolucion=1m&por_ruta=true")
+            invalid = await client.get("/api/v1/metrics/history?desde=2024-01-02T00:00:00&hasta=2024-01-01T00:00:00")
+
+        assert response.status_code == 200
+        assert response.json()["series"]["GET /api/v1/clases"][-1]["requests"] >= 1
+        assert invalid.status_code == 400
\ No newline at end of file
@@ -0,0 +1,662 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+@pytest.fixture
+def client():
+    """Client de testing para FastAPI"""
+    return TestClient(app)
+
+def crear_clase(client, sample_clase_data, capacidad: int) -> int:
+    response = client.post("/api/v1/clases", json={
+        **sample_clase_data,
+        "nombre": f"Clase capacidad {capacidad}",
+        "capacidad_maxima": capacidad
+    })
+    assert response.status_code == 200
+    return response.json()["id"]
+
+class TestListaEspera:
+    """Tests de la lista de espera"""
+
+    def test_enqueue_is_idempotent(self):
+        """Reintentar la espera no duplica la posición"""
+        from app.services.waitlist import WaitlistManager
+
+        manager = WaitlistManager()
+        assert manager.enqueue(1, 10) == 1
+        assert manager.enqueue(1, 11) == 2
+        assert manager.enqueue(1, 10) == 1
+
+        assert manager.pop(1) == 10
+        assert manager.position(1, 11) == 1
+
+    @pytest.mark.asyncio
+    async def test_promotion_on_capacity_increase(self, client, sample_clase_data):
+        """Aumentar la capacidad promueve a los usuarios en espera"""
+        from services.waitlist import waitlist_manager
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=1)
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=1").status_code == 200
+
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=2").status_code == 400
+
+        response = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=2&lista_espera=true")
+        assert response.status_code == 202
+        assert response.json()["posicion"] == 1
+        assert client.get(f"/api/v1/clases/{clase_id}/lista-espera/2").json()["posicion"] == 1
+
+        client.put(f"/api/v1/clases/{clase_id}", json={"capacidad_maxima": 2})
+        assert await waitlist_manager.process_pending() == 1
+
+        assert client.get(f"/api/v1/clases/{clase_id}/lista-espera/2").status_code == 404
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 0
+
+    @pytest.mark.asyncio
+    async def test_freed_spot_goes_to_waitlist_first(self, client, sample_clase_data):
+        """Un cupo liberado es del primero en espera, no de quien reintenta"""
+        from services.waitlist import waitlist_manager
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=1)
+        reserva_id = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=1").json()["id"]
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=2&lista_espera=true").status_code == 202
+
+        client.delete(f"/api/v1/reservas/{reserva_id}")
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=3").status_code == 400
+        response = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=3&lista_espera=true")
+        assert response.json()["posicion"] == 2
+
+        await waitlist_manager.process_pending()
+        reservas = client.get("/api/v1/usuarios/2/reservas").json()
+        assert clase_id in [r["clase_id"] for r in reservas]
+        assert client.get(f"/api/v1/clases/{clase_id}/lista-espera/3").json()["posicion"] == 1
+
+    @pytest.mark.asyncio
+    async def test_promotion_rechecks_capacity(self, sample_clase_data, monkeypatch):
+        """Si otra reserva toma el cupo durante la promoción, no se sobrerreserva"""
+        from routes import optimized_api
+        from services.waitlist import waitlist_manager
+
+        clase = await optimized_api.crear_clase(optimized_api.ClaseYogaCreate(
+            **{**sample_clase_data, "capacidad_maxima": 2}
+        ))
+        clase_id = clase["id"]
+        for usuario_id in (10, 11, 12):
+            waitlist_manager.enqueue(clase_id, usuario_id)
+
+        crear_reserva = optimized_api._crear_reserva
+        competidor = []
+
+        async def con_competencia(cid, usuario_id):
+            reserva = await crear_reserva(cid, usuario_id)
+            if not competidor:
+                competidor.append(await crear_reserva(cid, 99))
+            return reserva
+
+        monkeypatch.setattr(optimized_api, "_crear_reserva", con_competencia)
+        assert await optimized_api.promover_lista_espera(clase_id) == 1
+        assert optimized_api.reservation_index.count(clase_id) == 2
+        assert waitlist_manager.position(clase_id, 11) == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_promotion_keeps_user_first(self, sample_clase_data, monkeypatch):
+        """Si la reserva de la promoción falla, el usuario no pierde su lugar"""
+        from routes import optimized_api
+        from services.waitlist import waitlist_manager
+
+        clase = await optimized_api.crear_clase(optimized_api.ClaseYogaCreate(
+            **{**sample_clase_data, "capacidad_maxima": 1}
+        ))
+        clase_id = clase["id"]
+        waitlist_manager.enqueue(clase_id, 20)
+        waitlist_manager.enqueue(clase_id, 21)
+
+        async def falla(cid, usuario_id):
+            raise OSError("disco lleno")
+
+        monkeypatch.setattr(optimized_api, "_crear_reserva", falla)
+        with pytest.raises(OSError):
+            await optimized_api.promover_lista_espera(clase_id)
+        assert waitlist_manager.position(clase_id, 20) == 1
+
+        monkeypatch.undo()
+        assert await optimized_api.promover_lista_espera(clase_id) == 1
+        assert waitlist_manager.position(clase_id, 21) == 1
+
+    def test_waitlist_survives_state_round_trip(self):
+        """Las listas de espera viajan en el snapshot y conservan el orden"""
+        from routes.optimized_api import cargar_estado, exportar_estado
+        from services.waitlist import waitlist_manager
+
+        waitlist_manager.enqueue(8001, 30)
+        waitlist_manager.enqueue(8001, 31)
+        waitlist_manager.enqueue(8001, 32)
+        waitlist_manager.remove(8001, 31)
+        estado = exportar_estado()
+
+        waitlist_manager.restore(())
+        cargar_estado(estado)
+        assert waitlist_manager.position(8001, 32) == 2
+        assert waitlist_manager.position(8001, 31) is None
+        waitlist_manager.remove(8001, 30)
+        waitlist_manager.remove(8001, 32)
+
+class TestCancelacion:
+    """Tests de cancelación y reservas por usuario"""
+
+    def test_cancel_restores_spot(self, client, sample_clase_data):
+        """Cancelar libera el cupo y la quita del listado del usuario"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=2)
+        reserva = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=77").json()
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 1
+
+        reservas = client.get("/api/v1/usuarios/77/reservas").json()
+        assert [r["id"] for r in reservas] == [reserva["id"]]
+
+        response = client.delete(f"/api/v1/reservas/{reserva['id']}")
+        assert response.status_code == 200
+        assert response.json()["estado"] == "cancelada"
+
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 2
+        assert client.get("/api/v1/usuarios/77/reservas").json() == []
+        assert client.delete(f"/api/v1/reservas/{reserva['id']}").status_code == 404
+
+    def test_reserva_ids_are_not_reused(self, client, sample_clase_data):
+        """Los ids no se repiten tras una cancelación"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=5)
+        primera = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=80").json()
+        segunda = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=81").json()
+        client.delete(f"/api/v1/reservas/{primera['id']}")
+
+        tercera = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=82").json()
+        assert tercera["id"] not in (primera["id"], segunda["id"])
+
+    def test_reservation_index_counts(self):
+        from app.indexes.reservations import ReservationIndex
+
+        index = ReservationIndex()
+        index.add(1, usuario_id=5, clase_id=9)
+        index.add(2, usuario_id=5, clase_id=10)
+        index.remove(1, usuario_id=5, clase_id=9)
+
+        assert index.count(9) == 0
+        assert index.count(10) == 1
+        assert index.of_user(5) == [2]
+
+class TestIdempotencia:
+    """Tests de Idempotency-Key en los POST"""
+
+    def test_retry_replays_reservation(self, client, sample_clase_data):
+        """Un reintento con la misma clave no crea otra reserva"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=3)
+        headers = {"Idempotency-Key": f"reserva-{clase_id}-90"}
+
+        primera = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=90", headers=headers)
+        segunda = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=90", headers=headers)
+
+        assert primera.status_code == segunda.status_code == 200
+        assert segunda.json() == primera.json()
+        assert segunda.headers["Idempotent-Replayed"] == "true"
+        assert len(client.get("/api/v1/usuarios/90/reservas").json()) == 1
+
+    def test_without_key_creates_each_time(self, client, sample_clase_data):
+        """Sin clave cada POST crea una clase nueva"""
+        primera = crear_clase(client, sample_clase_data, capacidad=4)
+        segunda = crear_clase(client, sample_clase_data, capacidad=4)
+        assert primera != segunda
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_wait_for_first(self):
+        """Los duplicados concurrentes esperan al primero en vez de ejecutar"""
+        import asyncio
+        import httpx
+        from fastapi import FastAPI
+        from middleware.idempotency import IdempotencyMiddleware
+
+        calls = []
+        test_app = FastAPI()
+        test_app.add_middleware(IdempotencyMiddleware)
+
+        @test_app.post("/lento")
+        async def lento():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"llamadas": len(calls)}
+
+        transport = httpx.ASGITransport(app=test_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            headers = {"Idempotency-Key": "concurrente-1"}
+            responses = await asyncio.gather(*(http.post("/lento", headers=headers) for _ in range(3)))
+
+        assert len(calls) == 1
+        assert all(r.json() == {"llamadas": 1} for r in responses)
+
+    def test_key_reused_with_other_request_is_rejected(self, client, sample_clase_data):
+        """La misma clave con otra query no devuelve la respuesta guardada"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=3)
+        headers = {"Idempotency-Key": f"reserva-{clase_id}-91"}
+
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=91", headers=headers).status_code == 200
+        otra = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=92", headers=headers)
+
+        assert otra.status_code == 422
+        assert client.get("/api/v1/usuarios/92/reservas").json() == []
+
+    def test_client_errors_are_not_stored(self, client, sample_clase_data):
+        """Un 4xx no se guarda: el reintento con la misma clave se vuelve a ejecutar"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=1)
+        client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=93")
+        headers = {"Idempotency-Key": f"reserva-{clase_id}-94"}
+
+        llena = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=94", headers=headers)
+        assert llena.status_code == 400
+        reintento = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=94", headers=headers)
+        assert reintento.status_code == 400
+        assert "Idempotent-Replayed" not in reintento.headers
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_releases_duplicates(self):
+        """Si la primera petición se cancela, los duplicados no quedan esperando"""
+        import asyncio
+        from fastapi import FastAPI, Request
+        from middleware.idempotency import IdempotencyMiddleware
+
+        middleware = IdempotencyMiddleware(FastAPI())
+        started = asyncio.Event()
+
+        def make_request():
+            async def receive():
+                return {"type": "http.request", "body": b"", "more_body": False}
+            return Request({
+                "type": "http", "method": "POST", "path": "/lento", "query_string": b"",
+                "scheme": "http", "server": ("test", 80), "root_path": "",
+                "headers": [(b"idempotency-key", b"cancelada-1")]
+            }, receive)
+
+        async def call_next(request):
+            started.set()
+            await asyncio.sleep(10)
+
+        first = asyncio.create_task(middleware.dispatch(make_request(), call_next))
+        await started.wait()
+        duplicate = asyncio.create_task(middleware.dispatch(make_request(), call_next))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        response = await asyncio.wait_for(duplicate, 1)
+        assert response.status_code == 409
+        assert middleware.in_flight == {}
+
+class TestChangeFeed:
+    """Tests del feed de cambios entre workers"""
+
+    @pytest.mark.asyncio
+    async def test_poll_applies_only_foreign_changes(self, monkeypatch):
+        """Los cambios propios se saltean y los ajenos se aplican"""
+        from cache.redis_client import redis_client
+        from services.change_feed import Change, ChangeFeed
+
+        feed = ChangeFeed(stream="test:changes")
+        applied = []
+
+        async def handler(change):
+            applied.append(change.entity_id)
+
+        async def fake_xread(stream, last_id, count=100):
+            return [
+                ("1-0", Change("clase", 1, "upsert", ("nombre",), {}, feed.worker_id).to_fields()),
+                ("2-0", Change("clase", 2, "upsert", ("nombre",), {}, "otro-worker").to_fields())
+            ]
+
+        feed.subscribe("clase", handler)
+        monkeypatch.setattr(redis_client, "xread", fake_xread)
+
+        assert await feed.poll() == 1
+        assert applied == [2]
+        assert feed.last_id == "2-0"
+
+    @pytest.mark.asyncio
+    async def test_remote_changes_update_local_state(self, client, sample_clase_data):
+        """Una reserva de otro worker descuenta cupos y refresca el detalle cacheado"""
+        from routes.optimized_api import aplicar_cambio
+        from services.change_feed import Change
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=3)
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 3
+
+        reserva = {
+            "id": 5000 + clase_id, "usuario_id": 300, "clase_id": clase_id,
+            "fecha": "2024-01-01T00:00:00", "estado": "confirmada"
+        }
+        await aplicar_cambio(Change("reserva", reserva["id"], "upsert", (), reserva, "otro-worker"))
+
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 2
+        assert [r["id"] for r in client.get("/api/v1/usuarios/300/reservas").json()] == [reserva["id"]]
+
+        await aplicar_cambio(Change("reserva", reserva["id"], "delete", (), None, "otro-worker"))
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 3
+
+    @pytest.mark.asyncio
+    async def test_poll_drains_full_batches(self, monkeypatch):
+        """Mientras los lotes vengan llenos se sigue leyendo sin esperar al próximo intervalo"""
+        from cache.redis_client import redis_client
+        from services.change_feed import Change, ChangeFeed
+
+        feed = ChangeFeed(stream="test:changes", batch_size=2)
+        stream = [
+            (f"{i}-0", Change("clase", i, "upsert", (), {}, "otro-worker").to_fields())
+            for i in range(1, 6)
+        ]
+
+        async def fake_xread(stream_name, last_id, count=100):
+            after = [entry for entry in stream if int(entry[0].split("-")[0]) > int(last_id.split("-")[0])]
+            return after[:count]
+
+        async def handler(change):
+            pass
+
+        feed.subscribe("clase", handler)
+        monkeypatch.setattr(redis_client, "xread", fake_xread)
+
+        assert await feed.poll() == 5
+        assert feed.last_id == "5-0"
+
+    @pytest.mark.asyncio
+    async def test_conflicting_replica_is_not_applied(self, client, sample_clase_data):
+        """Una reserva replicada con un id ya usado por otra no pisa la local"""
+        from routes.optimized_api import aplicar_cambio, reservas_db
+        from services.change_feed import Change, ReplicationConflict
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=3)
+        reserva_id = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=40").json()["id"]
+        ajena = {
+            "id": reserva_id, "usuario_id": 41, "clase_id": clase_id,
+            "fecha": "2024-01-01T00:00:00", "estado": "confirmada"
+        }
+        with pytest.raises(ReplicationConflict):
+            await aplicar_cambio(Change("reserva", reserva_id, "upsert", (), ajena, "otro-worker"))
+        assert reservas_db[reserva_id].usuario_id == 40
+
+    @pytest.mark.asyncio
+    async def test_remote_cancellation_promotes_waitlist(self, client, sample_clase_data):
+        """Una cancelación hecha en otro worker libera el cupo para la lista de espera local"""
+        from routes.optimized_api import aplicar_cambio, reservas_db
+        from services.change_feed import Change
+        from services.waitlist import waitlist_manager
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=1)
+        reserva_id = client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=50").json()["id"]
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=51&lista_espera=true").status_code == 202
+
+        await aplicar_cambio(Change("reserva", reserva_id, "delete", (), None, "otro-worker"))
+        assert await waitlist_manager.process_pending() == 1
+        assert [r.usuario_id for r in reservas_db.values() if r.clase_id == clase_id] == [51]
+
+    def test_update_invalidates_old_filters(self, client, sample_clase_data):
+        """Desactivar la clase la saca del listado de activas ya cacheado"""
+        clase_id = crear_clase(client, sample_clase_data, capacidad=6)
+        ids = lambda activa: [c["id"] for c in client.get(f"/api/v1/clases?tipo=vinyasa&activa={activa}").json()]
+        assert clase_id in ids("true")
+        assert clase_id not in ids("false")
+
+        client.put(f"/api/v1/clases/{clase_id}", json={"activa": False})
+
+        assert clase_id not in ids("true")
+        assert clase_id in ids("false")
+
+class TestJournal:
+    """Tests del journal append-only y los snapshots"""
+
+    def make_journal(self, directory, state):
+        from services.journal import Journal
+
+        def apply_entry(entity, entity_id, op, data):
+            if op == "delete":
+                state.pop(entity_id, None)
+            else:
+                state[entity_id] = data
+
+        journal = Journal(directory=str(directory), snapshot_every=1000, sync_commit=True)
+        journal.bind(lambda: {"items": sorted(state.items())}, lambda s: state.update(s["items"]), apply_entry)
+        return journal
+
+    async def crash(self, journal):
+        """Cortar el journal sin el snapshot de un apagado ordenado"""
+        import asyncio
+
+        journal.is_running = False
+        journal.task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await journal.task
+        journal.file.close()
+        journal._release_slot()
+
+    @pytest.mark.asyncio
+    async def test_group_commit_and_replay(self, tmp_path):
+        """Las escrituras concurrentes comparten fsync y se recuperan al reiniciar"""
+        import asyncio
+
+        journal = self.make_journal(tmp_path, {})
+        journal.load()
+        await journal.start()
+        await asyncio.gather(*(journal.append("reserva", i, "upsert", {"n": i}) for i in range(20)))
+        await journal.append("reserva", 3, "delete")
+        assert journal.stats["entries"] == 21
+        assert journal.stats["batches"] < 21
+        await self.crash(journal)
+
+        restored = {}
+        self.make_journal(tmp_path, restored).load()
+        assert len(restored) == 19 and 3 not in restored
+
+    @pytest.mark.asyncio
+    async def test_snapshot_then_tail(self, tmp_path):
+        """Tras un snapshot solo se reaplica la cola y se ignora una línea cortada"""
+        state = {}
+        journal = self.make_journal(tmp_path, state)
+        journal.load()
+        await journal.start()
+        for i in range(5):
+            state[i] = {"n": i}
+            await journal.append("reserva", i, "upsert", {"n": i})
+        await journal.snapshot()
+        state[99] = {"n": 99}
+        await journal.append("reserva", 99, "upsert", {"n": 99})
+        await self.crash(journal)
+
+        journal_path = journal.journal_path
+        with open(journal_path, "ab") as f:
+            f.write(b'[7,1.0,"reserva",7,"ups')
+
+        restored = {}
+        replayed = self.make_journal(tmp_path, restored)
+        status = replayed.load()
+        assert status["snapshot_records"] == 5
+        assert status["replayed_entries"] == 1
+        assert sorted(restored) == [0, 1, 2, 3, 4, 99]
+        assert journal_path.read_bytes().endswith(b"\n")
+
+    @pytest.mark.asyncio
+    async def test_workers_write_separate_files(self, tmp_path):
+        """Dos workers vivos no comparten archivo y al reiniciar se recuperan ambos"""
+        first_state, second_state = {}, {}
+        first = self.make_journal(tmp_path, first_state)
+        second = self.make_journal(tmp_path, second_state)
+        first.load()
+        second.load()
+        await first.start()
+        await second.start()
+        assert first.journal_path != second.journal_path
+
+        second_state[1] = {"n": 1}
+        await second.append("reserva", 1, "upsert", {"n": 1})
+        await second.snapshot()
+        for i in range(2, 5):
+            await first.append("reserva", i, "upsert", {"n": i})
+        await second.append("reserva", 2, "delete")
+        await self.crash(first)
+        await self.crash(second)
+
+        restored = {}
+        self.make_journal(tmp_path, restored).load()
+        assert sorted(restored) == [1, 3, 4]
+
+    @pytest.mark.asyncio
+    async def test_snapshot_skips_entries_not_yet_applied(self, tmp_path):
+        """Un snapshot tomado entre el fsync y la aplicación no pierde esas entradas"""
+        import asyncio
+
+        state = {}
+        journal = self.make_journal(tmp_path, state)
+        journal.load()
+        await journal.start()
+        gate = asyncio.Event()
+
+        async def mutate(i):
+            async with journal.record("reserva", i, "upsert", {"n": i}):
+                await gate.wait()
+                state[i] = {"n": i}
+
+        tasks = [asyncio.create_task(mutate(i)) for i in range(1, 4)]
+        while journal.stats["entries"] < 3:
+            await asyncio.sleep(0.01)
+        await journal.snapshot()
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert journal.snapshot_seq == 0
+        await self.crash(journal)
+
+        restored = {}
+        self.make_journal(tmp_path, restored).load()
+        assert sorted(restored) == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_flusher_survives_errors(self, tmp_path):
+        """Un snapshot fallido no detiene el flusher y las escrituras siguientes terminan"""
+        import asyncio
+
+        state = {}
+        journal = self.make_journal(tmp_path, state)
+        journal.snapshot_every = 1
+        export_state = journal.export_state
+        calls = []
+
+        def failing_export():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("disco lleno")
+            return export_state()
+
+        journal.export_state = failing_export
+        journal.load()
+        await journal.start()
+        await journal.append("reserva", 1, "upsert", {"n": 1})
+        await asyncio.wait_for(journal.append("reserva", 2, "upsert", {"n": 2}), 1)
+        assert not journal.task.done()
+        await journal.stop()
+
+    def test_corrupt_line_keeps_later_entries(self, tmp_path):
+        """Una línea ilegible no descarta las siguientes y solo se corta la cola a medias"""
+        directory = tmp_path / "worker-0"
+        directory.mkdir()
+        journal_path = directory / "journal.log"
+        journal_path.write_bytes(
+            b'[1,1.0,"reserva",1,"upsert",{"n":1}]\n'
+            b'[2,1.1,"reserva",2,"ups\n'
+            b'[3,1.2,"reserva",3,"upsert",{"n":3}]\n'
+            b'[4,1.3,"reserva",4,"ups'
+        )
+
+        restored = {}
+        journal = self.make_journal(tmp_path, restored)
+        status = journal.load()
+        assert sorted(restored) == [1, 3]
+        assert status["corrupt_entries"] == 1
+        assert journal_path.read_bytes().endswith(b'{"n":3}]\n')
+
+    @pytest.mark.asyncio
+    async def test_cancelled_reservation_stays_cancelled(self, tmp_path):
+        """La alta de otro worker reaplicada tras el snapshot no revive una reserva cancelada"""
+        first_state, second_state = {}, {}
+        first = self.make_journal(tmp_path, first_state)
+        second = self.make_journal(tmp_path, second_state)
+        first.load()
+        second.load()
+        await first.start()
+        await second.start()
+
+        second_state[5] = {"n": 5}
+        version = await second.append("reserva", 5, "upsert", {"n": 5})
+        assert first.accept("reserva", 5, version)
+        first_state[5] = {"n": 5}
+        async with first.record("reserva", 5, "delete"):
+            first_state.pop(5)
+        await first.snapshot()
+        await self.crash(first)
+        await self.crash(second)
+
+        restored = {}
+        self.make_journal(tmp_path, restored).load()
+        assert 5 not in restored
+
+    @pytest.mark.asyncio
+    async def test_failed_append_changes_nothing(self, client, sample_clase_data, monkeypatch):
+        """Si el journal falla la reserva no queda aplicada y el reintento no duplica"""
+        from services.journal import journal
+
+        clase_id = crear_clase(client, sample_clase_data, capacidad=1)
+
+        async def failing_append(*args, **kwargs):
+            raise OSError("disco lleno")
+
+        monkeypatch.setattr(journal, "append", failing_append)
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=7").status_code == 500
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 1
+
+        monkeypatch.undo()
+        assert client.post(f"/api/v1/clases/{clase_id}/reservar?usuario_id=7").status_code == 200
+        assert client.get(f"/api/v1/clases/{clase_id}").json()["cupos_disponibles"] == 0
+
+    def test_worker_ids_do_not_overlap(self, tmp_path):
+        """Cada worker reparte ids de su propio residuo y nunca los de otro"""
+        first = self.make_journal(tmp_path, {})
+        second = self.make_journal(tmp_path, {})
+        first.max_workers = second.max_workers = 4
+        first._claim_slot()
+        second._claim_slot()
+
+        counter_first = counter_second = 1
+        ids_first, ids_second = [], []
+        for _ in range(5):
+            ids_first.append(first.next_id(counter_first))
+            counter_first = ids_first[-1] + 1
+            ids_second.append(second.next_id(counter_second))
+            counter_second = ids_second[-1] + 1
+        assert ids_first == [1, 5, 9, 13, 17]
+        assert ids_second == [2, 6, 10, 14, 18]
+        assert second.next_id(20) == 22
+        first._release_slot()
+        second._release_slot()
+
+    def test_route_state_round_trip(self):
+        """El estado de rutas se exporta y recarga con sus índices"""
+        from routes.optimized_api import cargar_estado, exportar_estado, aplicar_registro, clases_db
+        from indexes.reservations import reservation_index
+
+        reserva = {"id": 9001, "usuario_id": 5, "clase_id": 9001, "fecha": "2024-01-01T00:00:00", "estado": "confirmada"}
+        estado = exportar_estado()
+        aplicar_registro("clase", 9001, "upsert", {
+            "id": 9001, "nombre": "Yoga", "descripcion": None, "instructor_id": 1, "tipo": "hatha",
+            "nivel": "principiante", "duracion_minutos": 60, "capacidad_maxima": 10, "precio": 20.0,
+            "horario": "09:00:00", "dias_semana": [1], "activa": True,
+            "fecha_creacion": "2024-01-01T00:00:00", "fecha_actualizacion": "2024-01-01T00:00:00"
+        })
+        aplicar_registro("reserva", 9001, "upsert", reserva)
+        assert reservation_index.count(9001) == 1
+
+        copia = exportar_estado()
+        cargar_estado(estado)
+        cargar_estado(copia)
+        assert clases_db[9001].capacidad_maxima == 10
+        assert 9001 in reservation_index.of_user(5)
+        cargar_estado(estado)
\ No newline at end of file